@@ -0,0 +1,54 @@
+import os
+
+# Production server: gunicorn -c config/gunicorn.py
+#
+# The master imports and warms the Django application once, applies pending
+# migrations when the schema is behind, then forks WEB_CONCURRENCY workers
+# that inherit the loaded code. "asgi" serves the async views and /stream/
+# with uvicorn workers; "wsgi" uses threaded sync workers and serves no event
+# streams, so pages go without live updates.
+#
+# Dashboard fragments, ETags, access scopes and token versions are kept in
+# the cache, so more than one worker needs a shared CACHE_BACKEND (redis in
+# docker-compose.yaml) and refuses to start with the per-process LocMem one.
+# The event stream fan-out, request metrics and the hashing pool stay per
+# worker: each worker streams the events it wrote and /api/metrics/ reports
+# the worker that answered.
+SERVER_MODES = {
+    "asgi": ("config.asgi:application", "uvicorn_worker.UvicornWorker"),
+    "wsgi": ("config.wsgi:application", "gthread"),
+}
+SERVER_MODE = os.getenv("SERVER_MODE", "asgi")
+wsgi_app, worker_class = SERVER_MODES[SERVER_MODE]
+
+bind = os.getenv("SERVER_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+threads = int(os.getenv("SERVER_THREADS", 4))
+timeout = int(os.getenv("SERVER_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("SERVER_KEEPALIVE", 5))
+preload_app = True
+accesslog = "-"
+
+
+def on_starting(server):
+    from django.conf import settings
+
+    from home_security.startup import ensure_migrated, warm_up
+
+    if server.cfg.workers != settings.WEB_CONCURRENCY:
+        # Per-host pools are split between WEB_CONCURRENCY processes.
+        raise RuntimeError("Set the number of workers with WEB_CONCURRENCY.")
+    shared_cache = not settings.CACHES["default"]["BACKEND"].endswith("LocMemCache")
+    if server.cfg.workers > 1 and not shared_cache:
+        raise RuntimeError(
+            "WEB_CONCURRENCY > 1 needs a shared CACHE_BACKEND, the LocMem cache "
+            "is per process."
+        )
+    if os.getenv("SERVER_MIGRATE", "1") == "1":
+        pending = ensure_migrated()
+        if pending:
+            server.log.info("Applied %d pending migrations", len(pending))
+        else:
+            server.log.info("Schema is up to date")
+    warm_up()
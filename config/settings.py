@@ -48,20 +48,25 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "home_security.middleware.RequestMetricsMiddleware",
+    "home_security.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "home_security.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "home_security.middleware.EventFlushMiddleware",
+    "home_security.middleware.HashingBusyMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "home_security.metrics.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -92,6 +97,76 @@ DATABASES = {
     }
 }
 
+# "direct" opens a connection per request, "persistent" keeps one per worker
+# thread (CONN_MAX_AGE with health checks) and "pooled" shares a bounded,
+# health-checked pool per process (home_security.db).
+DB_CONNECTION_MODES = {
+    "direct": {},
+    "persistent": {
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
+    },
+    "pooled": {
+        "ENGINE": "home_security.db",
+        "CONN_MAX_AGE": 0,
+        "POOL": {
+            "MIN_SIZE": int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", 20)),
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 5)),
+            "MAX_IDLE": float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+            "MAX_LIFETIME": float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+            "CHECK_INTERVAL": float(os.getenv("DB_POOL_CHECK_INTERVAL", 30)),
+        },
+    },
+}
+DB_CONNECTION_MODE = os.getenv("DB_CONNECTION_MODE", "direct")
+DATABASES["default"].update(DB_CONNECTION_MODES[DB_CONNECTION_MODE])
+
+# Read replicas: DB_REPLICA_HOSTS lists hot standbys of "default" as
+# comma-separated "host" or "host:port". Safe requests read from one of
+# DATABASE_REPLICAS unless the client wrote in the last DB_REPLICA_PIN_SECONDS.
+# To try it with SQLite, define "default" and a copy of it as "replica" in
+# DATABASES and set DATABASE_REPLICAS = ["replica"].
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+for index, replica_host in enumerate(DB_REPLICA_HOSTS, 1):
+    host, _, port = replica_host.partition(":")
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["home_security.db.router.ReplicaRouter"]
+DB_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Dashboard fragments, conditional GET versions, access scopes and token
+# versions live here, so use a shared backend when running more than one
+# process, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://redis:6379/0 as in docker-compose.yaml.
+
+CACHE_BACKEND = os.getenv(
+    "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+)
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+if CACHE_BACKEND.endswith("LocMemCache"):
+    # The default of 300 entries evicts dashboard fragments on large estates.
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 100000))
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -145,3 +220,74 @@ MESSAGE_TAGS = {
     messages.WARNING: "warning",
     messages.ERROR: "danger",
 }
+
+# Session storage: "db" is Django's default; "cache" reads sessions from the
+# cache, writes them through only when they changed and keeps flash messages
+# in a cookie. Use a shared CACHE_BACKEND with "cache" when running several
+# worker processes.
+SESSION_MODES = {
+    "db": (
+        "django.contrib.sessions.backends.db",
+        "django.contrib.messages.storage.fallback.FallbackStorage",
+    ),
+    "cache": (
+        "home_security.sessions",
+        "django.contrib.messages.storage.cookie.CookieStorage",
+    ),
+}
+SESSION_MODE = os.getenv("SESSION_MODE", "db")
+SESSION_ENGINE, MESSAGE_STORAGE = SESSION_MODES[SESSION_MODE]
+
+# Event log writer: "sync", "commit" (per-request buffer written at request
+# end) or "background" (worker thread flushes on size/time thresholds)
+EVENT_LOG_MODE = os.getenv("EVENT_LOG_MODE", "commit")
+EVENT_LOG_BATCH_SIZE = int(os.getenv("EVENT_LOG_BATCH_SIZE", 100))
+EVENT_LOG_MAX_SIZE = int(os.getenv("EVENT_LOG_MAX_SIZE", 10000))
+EVENT_LOG_FLUSH_INTERVAL = float(os.getenv("EVENT_LOG_FLUSH_INTERVAL", 1.0))
+EVENT_LOG_PAGE_SIZE = int(os.getenv("EVENT_LOG_PAGE_SIZE", 50))
+EVENT_EXPORT_CHUNK_SIZE = int(os.getenv("EVENT_EXPORT_CHUNK_SIZE", 2000))
+EVENT_RETENTION_MONTHS = int(os.getenv("EVENT_RETENTION_MONTHS", 12))
+EVENT_PARTITION_MONTHS_AHEAD = int(os.getenv("EVENT_PARTITION_MONTHS_AHEAD", 3))
+EVENT_ARCHIVE_DIR = os.getenv("EVENT_ARCHIVE_DIR", BASE_DIR / "archive" / "events")
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 100))
+STREAM_HEARTBEAT_INTERVAL = int(os.getenv("STREAM_HEARTBEAT_INTERVAL", 15))
+DASHBOARD_FRAGMENT_TIMEOUT = int(os.getenv("DASHBOARD_FRAGMENT_TIMEOUT", 86400))
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", 100))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", 1000))
+LOCATOR_LIMIT = int(os.getenv("LOCATOR_LIMIT", 20))
+ACCESS_SCOPE_TIMEOUT = int(os.getenv("ACCESS_SCOPE_TIMEOUT", 3600))
+API_TOKEN_TTL = int(os.getenv("API_TOKEN_TTL", 900))
+API_TOKEN_REFRESH_WINDOW = int(os.getenv("API_TOKEN_REFRESH_WINDOW", 86400))
+API_TOKEN_VERSION_TIMEOUT = int(os.getenv("API_TOKEN_VERSION_TIMEOUT", 30))
+
+# Server processes on this host; config/gunicorn.py forks this many workers.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+
+# Password hashing runs in process pools of HASHING_WORKERS processes per host,
+# split between the WEB_CONCURRENCY server processes (at least one each; 0
+# hashes inline). Logins beyond HASHING_QUEUE_LIMIT waiting jobs per server
+# process get a 503.
+HASHING_WORKERS = int(os.getenv("HASHING_WORKERS", 2))
+HASHING_QUEUE_LIMIT = int(os.getenv("HASHING_QUEUE_LIMIT", 32))
+HASHING_TIMEOUT = float(os.getenv("HASHING_TIMEOUT", 30))
+HASHING_RETRY_AFTER = int(os.getenv("HASHING_RETRY_AFTER", 2))
+
+# Requests that run one statement this many times count as N+1 suspects.
+METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", 5))
+
+# Profiled requests (see home_security.profiling) keep statements slower than
+# PROFILING_SLOW_QUERY_MS with their plans; the newest PROFILING_KEEP are kept.
+PROFILING_DIR = os.getenv("PROFILING_DIR", BASE_DIR / "profiles")
+PROFILING_SLOW_QUERY_MS = float(os.getenv("PROFILING_SLOW_QUERY_MS", 100))
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", 200))
+# Seconds each process reuses its copy of the profiling targets before asking
+# the cache again, so new targets reach every worker within this time.
+PROFILING_TARGETS_TTL = float(os.getenv("PROFILING_TARGETS_TTL", 5))
+
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "home_security.authentication.SignedTokenAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
+}
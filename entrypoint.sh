@@ -3,7 +3,7 @@
 # Function to wait for the database
 wait_for_db() {
     echo "Waiting for database..."
-    while ! nc -z db 5432; do
+    while ! nc -z "${DB_HOST:-db}" "${DB_PORT:-5432}"; do
       sleep 0.1
     done
     echo "Database started"
@@ -12,10 +12,13 @@ wait_for_db() {
 # Wait for the database to be ready
 wait_for_db
 
-# Apply database migrations
-echo "Applying database migrations..."
-python manage.py migrate
+# Apply pending database migrations; the gunicorn master checks them itself
+# before forking workers (config/gunicorn.py)
+if [ "$1" != "gunicorn" ]; then
+    echo "Checking database migrations..."
+    python manage.py ensure_migrated
+fi
 
 # Start the application
 echo "Starting application..."
-exec "$@"
\ No newline at end of file
+exec "$@"
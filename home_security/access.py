@@ -0,0 +1,97 @@
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.dispatch import receiver
+
+from .hierarchy import hierarchy_changed
+from .models import HierarchyRow
+from .versions import bump_versions, get_version
+
+SCOPE_KEY = "access-scope:{user_id}:{version}"
+
+
+@dataclass(frozen=True)
+class AccessScope:
+    """
+    The buildings and entrances one user may touch, as id sets.
+
+    ``managed_building_ids`` are the buildings the user manages,
+    ``guarded_entrance_ids`` the entrances they guard; ``building_ids`` and
+    ``entrance_ids`` are everything visible through either assignment.
+    Administrators implicitly see everything.
+    """
+
+    is_admin: bool = False
+    is_manager: bool = False
+    managed_building_ids: frozenset = field(default_factory=frozenset)
+    guarded_entrance_ids: frozenset = field(default_factory=frozenset)
+    building_ids: frozenset = field(default_factory=frozenset)
+    entrance_ids: frozenset = field(default_factory=frozenset)
+
+    def can_manage_building(self, building_id):
+        return self.is_admin or building_id in self.managed_building_ids
+
+    def can_guard_entrance(self, entrance_id):
+        return self.is_admin or self.is_manager or entrance_id in self.guarded_entrance_ids
+
+    def can_view_building(self, building_id):
+        return self.is_admin or building_id in self.building_ids
+
+    def can_view_entrance(self, entrance_id):
+        return self.is_admin or entrance_id in self.entrance_ids
+
+    def filter_buildings(self, queryset, field="id"):
+        if self.is_admin:
+            return queryset
+        return queryset.filter(**{f"{field}__in": self.building_ids})
+
+    def filter_entrances(self, queryset, field="id"):
+        if self.is_admin:
+            return queryset
+        return queryset.filter(**{f"{field}__in": self.entrance_ids})
+
+
+def _load_sets(user_id):
+    rows = HierarchyRow.objects.filter(Q(manager_id=user_id) | Q(guard_id=user_id))
+    managed, guarded, buildings, entrances = set(), set(), set(), set()
+    for building_id, entrance_id, manager_id, guard_id in rows.values_list(
+        "building_id", "entrance_id", "manager_id", "guard_id"
+    ):
+        buildings.add(building_id)
+        if entrance_id is not None:
+            entrances.add(entrance_id)
+        if manager_id == user_id:
+            managed.add(building_id)
+        if guard_id == user_id:
+            guarded.add(entrance_id)
+    return tuple(map(frozenset, (managed, guarded, buildings, entrances)))
+
+
+def get_scope(user):
+    """
+    Return the user's AccessScope, computed at most once per request and
+    cached across requests until one of their assignments changes.
+    """
+    scope = getattr(user, "_access_scope", None)
+    if scope is not None:
+        return scope
+    if not user.is_authenticated:
+        scope = AccessScope()
+    elif user.is_admin():
+        scope = AccessScope(is_admin=True)
+    else:
+        key = SCOPE_KEY.format(user_id=user.id, version=get_version("scope", user.id))
+        sets = cache.get(key)
+        if sets is None:
+            sets = _load_sets(user.id)
+            cache.set(key, sets, settings.ACCESS_SCOPE_TIMEOUT)
+        scope = AccessScope(False, user.is_manager(), *sets)
+    user._access_scope = scope
+    return scope
+
+
+@receiver(hierarchy_changed)
+def _hierarchy_changed(sender, user_ids=(), **kwargs):
+    bump_versions("scope", user_ids)
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class HomeSecurityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'home_security'
+
+    def ready(self):
+        from . import (  # noqa: F401
+            access,
+            conditional,
+            fragments,
+            metrics,
+            streams,
+            tokens,
+        )
+        from .db import router  # noqa: F401
+        from .hierarchy import connect_signals
+
+        connect_signals()
@@ -0,0 +1,101 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate, alogin, alogout
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import ValidationError
+
+from .access import get_scope
+from .events import alog_event
+from .filters import filter_by_params
+from .pagination import anumber_page
+from .serializers import LoginSerializer
+from .views import ApartmentViewSet, BuildingViewSet, EntranceViewSet
+
+RESOURCES = {
+    "buildings": (BuildingViewSet, lambda scope, qs: scope.filter_buildings(qs)),
+    "entrances": (EntranceViewSet, lambda scope, qs: scope.filter_entrances(qs)),
+    "apartments": (
+        ApartmentViewSet,
+        lambda scope, qs: scope.filter_entrances(qs, field="entrance_id"),
+    ),
+}
+
+NOT_AUTHENTICATED = {"detail": "Authentication credentials were not provided."}
+
+
+async def _scoped_queryset(request, resource):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None, None
+    viewset, scope_filter = RESOURCES[resource]
+    scope = await sync_to_async(get_scope)(user)
+    return viewset, scope_filter(scope, viewset.queryset.all())
+
+
+@require_GET
+async def resource_list(request, resource):
+    viewset, queryset = await _scoped_queryset(request, resource)
+    if viewset is None:
+        return JsonResponse(NOT_AUTHENTICATED, status=403)
+    try:
+        queryset = filter_by_params(queryset, request.GET, viewset.filter_fields)
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+
+    rows, next_cursor = await anumber_page(queryset, request.GET.get("cursor"))
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query["cursor"] = next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+    results = viewset.serializer_class(rows, many=True).data
+    return JsonResponse({"next": next_url, "previous": None, "results": results})
+
+
+@require_GET
+async def resource_detail(request, resource, pk):
+    viewset, queryset = await _scoped_queryset(request, resource)
+    if viewset is None:
+        return JsonResponse(NOT_AUTHENTICATED, status=403)
+    try:
+        instance = await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        name = queryset.model._meta.object_name
+        return JsonResponse({"detail": f"No {name} matches the given query."}, status=404)
+    return JsonResponse(viewset.serializer_class(instance).data)
+
+
+def _payload(request):
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+    return request.POST
+
+
+@csrf_exempt
+@require_POST
+async def login_view(request):
+    serializer = LoginSerializer(data=_payload(request))
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    user = await aauthenticate(request, **serializer.validated_data)
+    if user is None:
+        return JsonResponse({"error": "Invalid username or password"}, status=401)
+    await alogin(request, user)
+    await alog_event(user, "Log IN", f"User {user} log in")
+    return JsonResponse({"message": "Login successful"})
+
+
+@require_POST
+async def logout_view(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse(NOT_AUTHENTICATED, status=403)
+    await alogout(request)
+    await alog_event(user, "Log OUT", f"User {user} log out")
+    return JsonResponse({"message": "Logout successfully"})
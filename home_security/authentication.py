@@ -0,0 +1,32 @@
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .tokens import read_token, token_user
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    ``Authorization: Bearer <token>`` with tokens from ``tokens.issue_token``.
+    Verifying a token is an HMAC check plus version lookups in the cache;
+    the token version is read from the database when the cache lost it.
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed("Invalid token header.")
+
+        payload = read_token(auth[1].decode(errors="replace"))
+        if payload is None:
+            raise AuthenticationFailed("Invalid or expired token.")
+        user = token_user(payload)
+        if user is None:
+            raise AuthenticationFailed("Token has been revoked.")
+        return user, payload
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,116 @@
+import asyncio
+import itertools
+import statistics
+import time
+
+from django.core.asgi import get_asgi_application
+from django.test import Client
+
+from .data import PASSWORD
+
+# (name, sync path, async path); "{building}" is replaced with a visible id.
+ENDPOINTS = [
+    ("buildings-list", "/api/buildings/", "/api/async/buildings/"),
+    ("buildings-detail", "/api/buildings/{building}/", "/api/async/buildings/{building}/"),
+    ("entrances-list", "/api/entrances/", "/api/async/entrances/"),
+]
+
+
+class _Request:
+    """Drives one GET through an ASGI application without a server."""
+
+    def __init__(self, path, cookie):
+        path, _, query = path.partition("?")
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        self.status = None
+        self._body_sent = False
+        self._done = asyncio.Event()
+
+    async def receive(self):
+        if not self._body_sent:
+            self._body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The handler keeps listening for a disconnect until the response is out.
+        await self._done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            self._done.set()
+
+    async def __call__(self, app):
+        await app(self.scope, self.receive, self.send)
+        self._done.set()
+        return self.status
+
+
+async def _load(app, path, cookie, concurrency, requests):
+    counter = itertools.count()
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        while next(counter) < requests:
+            start = time.perf_counter()
+            status = await _Request(path, cookie)(app)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(latencies[int(0.99 * (len(latencies) - 1))], 3),
+        "max_ms": round(latencies[-1], 3),
+        "errors": errors,
+    }
+
+
+def session_cookie(user):
+    client = Client()
+    client.login(username=user.username, password=PASSWORD)
+    return f"sessionid={client.cookies['sessionid'].value}"
+
+
+def run_concurrency(estate, building_id, levels=(100, 1000), requests=2000, only=None):
+    """
+    Sends ``requests`` GETs per endpoint, mode and concurrency level through
+    the ASGI application and reports throughput and latency percentiles.
+    """
+    app = get_asgi_application()
+    cookie = session_cookie(estate.admin)
+    results = []
+    for name, sync_path, async_path in ENDPOINTS:
+        if only and not any(part in name for part in only):
+            continue
+        for concurrency in levels:
+            for mode, path in (("sync", sync_path), ("async", async_path)):
+                path = path.format(building=building_id)
+                # One warm-up request per combination for caches and URL resolving.
+                asyncio.run(_load(app, path, cookie, 1, 1))
+                report = asyncio.run(
+                    _load(app, path, cookie, concurrency, max(requests, concurrency))
+                )
+                results.append(
+                    {"endpoint": name, "mode": mode, "concurrency": concurrency, **report}
+                )
+    return {"requests": requests, "results": results}
@@ -0,0 +1,113 @@
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+from django.utils import timezone
+
+from home_security.hierarchy import rebuild_all
+from home_security.models import Apartment, Building, Entrance, Event, User
+
+PASSWORD = "bench-password"
+
+SIZES = {
+    "small": {"buildings": 10, "entrances": 2, "apartments": 10, "events": 1000},
+    "medium": {"buildings": 1000, "entrances": 3, "apartments": 20, "events": 100000},
+    "large": {"buildings": 50000, "entrances": 4, "apartments": 20, "events": 5000000},
+}
+
+ACTIONS = ["Log IN", "Log OUT", "Added Building", "Edited Apartments", "Added Entrance"]
+
+
+@dataclass
+class Estate:
+    admin: User
+    manager: User
+    guard: User
+    buildings: int
+    entrances: int
+    apartments: int
+    events: int
+
+
+def _users(prefix, role, count, password):
+    users = [
+        User(username=f"{prefix}-{i}", password=password, role=role)
+        for i in range(count)
+    ]
+    return User.objects.bulk_create(users, batch_size=1000)
+
+
+def generate_estate(
+    buildings, entrances, apartments, events, managers=None, guards=None, batch_size=5000
+):
+    """
+    Fill the database with a synthetic estate of ``buildings`` buildings,
+    ``entrances`` entrances per building and ``apartments`` apartments per
+    entrance, plus ``events`` audit events spread over the last year.
+
+    Everything is written with bulk_create in batches and the hierarchy read
+    model is rebuilt once at the end.
+    """
+    password = make_password(PASSWORD)
+    suffix = User.objects.count()
+    admin = _users(f"bench-admin-{suffix}", User.ADMIN, 1, password)[0]
+    manager_users = _users(
+        f"bench-manager-{suffix}", User.MANAGER, managers or max(1, buildings // 10), password
+    )
+    guard_users = _users(
+        f"bench-guard-{suffix}", User.GUARD, guards or max(1, buildings * entrances // 4), password
+    )
+
+    first_number = (Building.objects.aggregate(Max("number"))["number__max"] or 0) + 1
+    chunk = max(1, batch_size // max(1, entrances * apartments))
+    for start in range(0, buildings, chunk):
+        created = Building.objects.bulk_create(
+            Building(
+                number=first_number + i,
+                manager=manager_users[i % len(manager_users)],
+            )
+            for i in range(start, min(start + chunk, buildings))
+        )
+        new_entrances = Entrance.objects.bulk_create(
+            Entrance(
+                building=building,
+                number=n,
+                guard=guard_users[(i * entrances + n) % len(guard_users)],
+            )
+            for i, building in enumerate(created, start=start)
+            for n in range(1, entrances + 1)
+        )
+        Apartment.objects.bulk_create(
+            (
+                Apartment(entrance=entrance, number=(entrance.number - 1) * apartments + n)
+                for entrance in new_entrances
+                for n in range(1, apartments + 1)
+            ),
+            batch_size=batch_size,
+        )
+
+    now = timezone.now()
+    users = [admin, *manager_users[:100], *guard_users[:100]]
+    for start in range(0, events, batch_size):
+        Event.objects.bulk_create(
+            Event(
+                user=random.choice(users),
+                action=random.choice(ACTIONS),
+                timestamp=now - timedelta(seconds=random.randrange(365 * 86400)),
+                details="Synthetic benchmark event",
+            )
+            for _ in range(start, min(start + batch_size, events))
+        )
+
+    rebuild_all()
+    return Estate(
+        admin=admin,
+        manager=manager_users[0],
+        guard=guard_users[0],
+        buildings=buildings,
+        entrances=buildings * entrances,
+        apartments=buildings * entrances * apartments,
+        events=events,
+    )
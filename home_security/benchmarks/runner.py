@@ -0,0 +1,775 @@
+import itertools
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from home_security.models import Apartment, Building, Entrance
+from home_security.profiling import list_profiles
+from home_security.tokens import issue_token
+
+from .data import PASSWORD
+
+BUDGETS_PATH = Path(__file__).with_name("budgets.json")
+
+# Streams that never finish a response, so there is no latency to measure.
+LONG_LIVED_URLS = {"event-stream"}
+
+_counter = itertools.count(1)
+
+
+def unique_number():
+    return 1_000_000 + next(_counter)
+
+
+@dataclass
+class Scenario:
+    """
+    One request to benchmark. ``url`` and ``data`` are callables receiving
+    the estate context and whatever ``setup`` returned for the iteration, so
+    every iteration can create the objects it mutates outside the measured
+    window.
+    """
+
+    name: str
+    url_name: str
+    role: str
+    url: object
+    method: str = "get"
+    data: object = None
+    setup: object = None
+    login: bool = True
+    fresh_client: bool = False
+    headers: object = None
+
+
+@dataclass
+class Context:
+    estate: object
+    building: Building
+    entrance: Entrance
+    apartment: Apartment
+
+    def user(self, role):
+        return {
+            "admin": self.estate.admin,
+            "manager": self.estate.manager,
+            "guard": self.estate.guard,
+        }.get(role)
+
+
+def _formset_data(rows, fields):
+    data = {
+        "form-TOTAL_FORMS": len(rows),
+        "form-INITIAL_FORMS": len(rows),
+        "form-MIN_NUM_FORMS": 0,
+        "form-MAX_NUM_FORMS": 1000,
+    }
+    for i, row in enumerate(rows):
+        data[f"form-{i}-id"] = row.id
+        for name in fields:
+            value = getattr(row, f"{name}_id", None) or getattr(row, name)
+            data[f"form-{i}-{name}"] = "" if value is None else value
+    return data
+
+
+def _new_building(ctx):
+    return {"building": Building.objects.create(number=unique_number())}
+
+
+def _new_entrance(ctx):
+    return {
+        "entrance": Entrance.objects.create(
+            building=ctx.building, number=unique_number()
+        )
+    }
+
+
+def _new_apartment(ctx):
+    return {
+        "apartment": Apartment.objects.create(
+            entrance=ctx.entrance, number=unique_number()
+        )
+    }
+
+
+def _new_profile(ctx):
+    client = Client()
+    client.force_login(ctx.estate.admin)
+    client.get("/?profile")
+    return {"profile": list_profiles()[0]["id"]}
+
+
+def _consume(response):
+    # Streaming responses only do their work once the content is iterated.
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def _bearer(role):
+    return lambda ctx, state: {"Authorization": f"Bearer {issue_token(ctx.user(role))}"}
+
+
+def _if_none_match(role, url):
+    # Fetches the current ETag outside the measured window, so the timed
+    # request is an unchanged poll.
+    def headers(ctx, state):
+        client = Client()
+        client.force_login(ctx.user(role))
+        return {"If-None-Match": client.get(url).headers["ETag"]}
+
+    return headers
+
+
+def _import_file(ctx, state):
+    number = unique_number()
+    rows = "\n".join(f"{number},,1,,{n}" for n in range(1, 101))
+    return {
+        "file": SimpleUploadedFile(
+            "bench.csv", f"building,manager,entrance,guard,apartment\n{rows}\n".encode()
+        )
+    }
+
+
+def scenarios():
+    b = lambda ctx, state: ctx.building.number  # noqa: E731
+    return [
+        Scenario("home", "home", "admin", lambda c, s: "/"),
+        Scenario(
+            "dashboard-admin",
+            "dashboard-admin",
+            "admin",
+            lambda c, s: "/admin-dashboard",
+        ),
+        Scenario(
+            "dashboard-manager",
+            "dashboard-admin",
+            "manager",
+            lambda c, s: "/admin-dashboard",
+        ),
+        Scenario(
+            "dashboard-guard",
+            "dashboard-admin",
+            "guard",
+            lambda c, s: "/admin-dashboard",
+        ),
+        Scenario(
+            "dashboard-admin-unchanged",
+            "dashboard-admin",
+            "admin",
+            lambda c, s: "/admin-dashboard",
+            headers=_if_none_match("admin", "/admin-dashboard"),
+        ),
+        Scenario(
+            "dashboard-manager-unchanged",
+            "dashboard-admin",
+            "manager",
+            lambda c, s: "/admin-dashboard",
+            headers=_if_none_match("manager", "/admin-dashboard"),
+        ),
+        Scenario(
+            "register-get", "register", None, lambda c, s: "/register/", login=False
+        ),
+        Scenario(
+            "register-post",
+            "register",
+            None,
+            lambda c, s: "/register/",
+            method="post",
+            login=False,
+            data=lambda c, s: {
+                "username": f"bench-user-{unique_number()}",
+                "password1": "Xy7-bench-pass",
+                "password2": "Xy7-bench-pass",
+                "role": 3,
+            },
+        ),
+        Scenario("login-get", "login", None, lambda c, s: "/login/", login=False),
+        Scenario(
+            "login-post",
+            "login",
+            None,
+            lambda c, s: "/login/",
+            method="post",
+            login=False,
+            fresh_client=True,
+            data=lambda c, s: {
+                "username": c.estate.guard.username,
+                "password": PASSWORD,
+            },
+        ),
+        Scenario(
+            "logout", "logout", "guard", lambda c, s: "/logout/", fresh_client=True
+        ),
+        Scenario(
+            "add-building-get", "add-building", "admin", lambda c, s: "/add-building"
+        ),
+        Scenario(
+            "add-building-post",
+            "add-building",
+            "admin",
+            lambda c, s: "/add-building",
+            method="post",
+            data=lambda c, s: {
+                "number": unique_number(),
+                "manager": c.estate.manager.id,
+            },
+        ),
+        Scenario(
+            "edit-building-get",
+            "edit-building",
+            "admin",
+            lambda c, s: f"/edit-building/{b(c, s)}",
+        ),
+        Scenario(
+            "edit-building-post",
+            "edit-building",
+            "admin",
+            lambda c, s: f"/edit-building/{s['building'].number}",
+            method="post",
+            setup=_new_building,
+            data=lambda c, s: {
+                "number": s["building"].number,
+                "manager": c.estate.manager.id,
+            },
+        ),
+        Scenario(
+            "delete-building",
+            "delete_building",
+            "admin",
+            lambda c, s: f"/delete-building/{s['building'].number}",
+            method="post",
+            setup=_new_building,
+        ),
+        Scenario(
+            "add-entrance-get", "add-entrance", "admin", lambda c, s: "/add-entrance"
+        ),
+        Scenario(
+            "add-entrance-post",
+            "add-entrance",
+            "admin",
+            lambda c, s: "/add-entrance",
+            method="post",
+            data=lambda c, s: {
+                "number": unique_number(),
+                "guard": c.estate.guard.id,
+                "building": c.building.id,
+            },
+        ),
+        Scenario(
+            "edit-entrance-get",
+            "edit-entrance",
+            "admin",
+            lambda c, s: f"/edit-entrance/{b(c, s)}",
+        ),
+        Scenario(
+            "edit-entrance-get-manager",
+            "edit-entrance",
+            "manager",
+            lambda c, s: f"/edit-entrance/{b(c, s)}",
+        ),
+        Scenario(
+            "edit-entrance-post",
+            "edit-entrance",
+            "admin",
+            lambda c, s: f"/edit-entrance/{b(c, s)}",
+            method="post",
+            data=lambda c, s: _formset_data(
+                list(c.building.entrances.order_by("number")), ["number", "guard"]
+            ),
+        ),
+        Scenario(
+            "delete-entrance",
+            "delete_entrance",
+            "admin",
+            lambda c, s: f"/delete-entrance/{s['entrance'].id}",
+            method="post",
+            setup=_new_entrance,
+        ),
+        Scenario(
+            "add-apartment-get", "add-apartment", "admin", lambda c, s: "/add-apartment"
+        ),
+        Scenario(
+            "add-apartment-post",
+            "add-apartment",
+            "admin",
+            lambda c, s: "/add-apartment",
+            method="post",
+            data=lambda c, s: {"number": unique_number(), "entrance": c.entrance.id},
+        ),
+        Scenario(
+            "edit-apartment-get",
+            "edit-apartment",
+            "admin",
+            lambda c, s: f"/edit-apartment/{b(c, s)}/",
+        ),
+        Scenario(
+            "edit-apartment-post",
+            "edit-apartment",
+            "admin",
+            lambda c, s: f"/edit-apartment/{b(c, s)}/",
+            method="post",
+            data=lambda c, s: _formset_data(
+                list(
+                    Apartment.objects.filter(entrance__building=c.building).order_by(
+                        "entrance__number", "number"
+                    )
+                ),
+                ["number", "entrance"],
+            ),
+        ),
+        Scenario(
+            "delete-apartment",
+            "delete-apartment",
+            "admin",
+            lambda c, s: f"/delete-apartment/{s['apartment'].id}",
+            method="post",
+            setup=_new_apartment,
+        ),
+        Scenario(
+            "locate-apartment",
+            "locate-apartment",
+            "guard",
+            lambda c, s: f"/locate-apartment/?q={c.apartment.number}",
+        ),
+        Scenario(
+            "locate-apartment-address",
+            "locate-apartment",
+            "guard",
+            lambda c, s: (
+                f"/locate-apartment/?q={b(c, s)}/{c.entrance.number}"
+                f"/{c.apartment.number}"
+            ),
+        ),
+        Scenario("event-log", "event-log", "admin", lambda c, s: "/event-log/"),
+        Scenario(
+            "event-log-filtered",
+            "event-log",
+            "admin",
+            lambda c, s: "/event-log/?action=Log+IN",
+        ),
+        Scenario(
+            "export-csv",
+            "export-event-log",
+            "admin",
+            lambda c, s: "/event-log/export?format=csv",
+        ),
+        Scenario(
+            "export-jsonl-gzip",
+            "export-event-log",
+            "admin",
+            lambda c, s: "/event-log/export?format=jsonl&gzip=on",
+        ),
+        Scenario("stats", "stats", "admin", lambda c, s: "/stats/"),
+        Scenario("profiles", "profiles", "admin", lambda c, s: "/profiles/"),
+        Scenario(
+            "profile-detail",
+            "profile-detail",
+            "admin",
+            lambda c, s: f"/profiles/{s['profile']}/",
+            setup=_new_profile,
+        ),
+        Scenario(
+            "profile-download",
+            "profile-download",
+            "admin",
+            lambda c, s: f"/profiles/{s['profile']}/download",
+            setup=_new_profile,
+        ),
+        Scenario(
+            "dashboard-admin-profiled",
+            "dashboard-admin",
+            "admin",
+            lambda c, s: "/admin-dashboard?profile",
+        ),
+        Scenario("api-root", "api-root", "admin", lambda c, s: "/api/"),
+        Scenario("api-metrics", "metrics-list", "admin", lambda c, s: "/api/metrics/"),
+        Scenario(
+            "api-buildings-list",
+            "building-list",
+            "admin",
+            lambda c, s: "/api/buildings/",
+        ),
+        Scenario(
+            "api-buildings-list-manager",
+            "building-list",
+            "manager",
+            lambda c, s: "/api/buildings/",
+        ),
+        Scenario(
+            "api-buildings-list-unchanged",
+            "building-list",
+            "admin",
+            lambda c, s: "/api/buildings/",
+            headers=_if_none_match("admin", "/api/buildings/"),
+        ),
+        Scenario(
+            "api-buildings-create",
+            "building-list",
+            "admin",
+            lambda c, s: "/api/buildings/",
+            method="post",
+            data=lambda c, s: {"number": unique_number()},
+        ),
+        Scenario(
+            "api-buildings-detail",
+            "building-detail",
+            "admin",
+            lambda c, s: f"/api/buildings/{c.building.id}/",
+        ),
+        Scenario(
+            "api-entrances-list",
+            "entrance-list",
+            "guard",
+            lambda c, s: "/api/entrances/",
+        ),
+        Scenario(
+            "api-entrances-detail",
+            "entrance-detail",
+            "admin",
+            lambda c, s: f"/api/entrances/{c.entrance.id}/",
+        ),
+        Scenario(
+            "api-apartments-list",
+            "apartment-list",
+            "admin",
+            lambda c, s: "/api/apartments/",
+        ),
+        Scenario(
+            "api-apartments-list-guard",
+            "apartment-list",
+            "guard",
+            lambda c, s: "/api/apartments/",
+        ),
+        Scenario(
+            "api-apartments-list-guard-unchanged",
+            "apartment-list",
+            "guard",
+            lambda c, s: "/api/apartments/",
+            headers=_if_none_match("guard", "/api/apartments/"),
+        ),
+        Scenario(
+            "api-apartments-detail",
+            "apartment-detail",
+            "admin",
+            lambda c, s: f"/api/apartments/{c.apartment.id}/",
+        ),
+        Scenario(
+            "api-locate-apartment",
+            "locate-apartment-list",
+            "guard",
+            lambda c, s: f"/api/locate-apartment/?q={c.apartment.number}",
+        ),
+        Scenario(
+            "api-locate-apartment-prefix",
+            "locate-apartment-list",
+            "guard",
+            lambda c, s: "/api/locate-apartment/?q=1",
+        ),
+        Scenario(
+            "api-import-estate",
+            "import-estate-list",
+            "admin",
+            lambda c, s: "/api/import-estate/",
+            method="post",
+            data=_import_file,
+        ),
+        Scenario(
+            "api-user-register",
+            "user-register-list",
+            None,
+            lambda c, s: "/api/user-register/",
+            method="post",
+            login=False,
+            data=lambda c, s: {
+                "username": f"bench-api-{unique_number()}",
+                "password": "pw",
+            },
+        ),
+        Scenario(
+            "api-login",
+            "login-list",
+            None,
+            lambda c, s: "/api/login/",
+            method="post",
+            login=False,
+            fresh_client=True,
+            data=lambda c, s: {
+                "username": c.estate.guard.username,
+                "password": PASSWORD,
+            },
+        ),
+        Scenario(
+            "api-logout",
+            "logout-list",
+            "guard",
+            lambda c, s: "/api/logout/",
+            method="post",
+            fresh_client=True,
+        ),
+        Scenario(
+            "api-token",
+            "token-list",
+            None,
+            lambda c, s: "/api/token/",
+            method="post",
+            login=False,
+            data=lambda c, s: {
+                "username": c.estate.guard.username,
+                "password": PASSWORD,
+            },
+        ),
+        Scenario(
+            "api-token-refresh",
+            "token-refresh",
+            None,
+            lambda c, s: "/api/token/refresh/",
+            method="post",
+            login=False,
+            data=lambda c, s: {"token": issue_token(c.estate.guard)},
+        ),
+        Scenario(
+            "api-token-revoke",
+            "token-revoke",
+            None,
+            lambda c, s: "/api/token/revoke/",
+            method="post",
+            login=False,
+            headers=_bearer("guard"),
+        ),
+        Scenario(
+            "api-buildings-list-token",
+            "building-list",
+            None,
+            lambda c, s: "/api/buildings/",
+            login=False,
+            headers=_bearer("manager"),
+        ),
+        Scenario(
+            "api-entrances-list-token",
+            "entrance-list",
+            None,
+            lambda c, s: "/api/entrances/",
+            login=False,
+            headers=_bearer("guard"),
+        ),
+        Scenario(
+            "async-buildings-list",
+            "async-building-list",
+            "admin",
+            lambda c, s: "/api/async/buildings/",
+        ),
+        Scenario(
+            "async-buildings-list-manager",
+            "async-building-list",
+            "manager",
+            lambda c, s: "/api/async/buildings/",
+        ),
+        Scenario(
+            "async-buildings-detail",
+            "async-building-detail",
+            "admin",
+            lambda c, s: f"/api/async/buildings/{c.building.id}/",
+        ),
+        Scenario(
+            "async-entrances-list",
+            "async-entrance-list",
+            "guard",
+            lambda c, s: "/api/async/entrances/",
+        ),
+        Scenario(
+            "async-entrances-detail",
+            "async-entrance-detail",
+            "admin",
+            lambda c, s: f"/api/async/entrances/{c.entrance.id}/",
+        ),
+        Scenario(
+            "async-apartments-list",
+            "async-apartment-list",
+            "admin",
+            lambda c, s: "/api/async/apartments/",
+        ),
+        Scenario(
+            "async-apartments-detail",
+            "async-apartment-detail",
+            "admin",
+            lambda c, s: f"/api/async/apartments/{c.apartment.id}/",
+        ),
+        Scenario(
+            "async-login",
+            "async-login",
+            None,
+            lambda c, s: "/api/async/login/",
+            method="post",
+            login=False,
+            fresh_client=True,
+            data=lambda c, s: {
+                "username": c.estate.guard.username,
+                "password": PASSWORD,
+            },
+        ),
+        Scenario(
+            "async-logout",
+            "async-logout",
+            "guard",
+            lambda c, s: "/api/async/logout/",
+            method="post",
+            fresh_client=True,
+        ),
+    ]
+
+
+def url_names(resolver=None):
+    """All named routes of the project, including the DRF router routes."""
+    names = set()
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.app_name != "admin":
+                names |= url_names(pattern)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def load_budgets(path=BUDGETS_PATH):
+    try:
+        return json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def save_budgets(budgets, path=BUDGETS_PATH):
+    Path(path).write_text(json.dumps(dict(sorted(budgets.items())), indent=2) + "\n")
+
+
+class Runner:
+    def __init__(self, context, iterations=5, budgets=None):
+        self.context = context
+        self.iterations = iterations
+        self.budgets = budgets or {}
+        self._clients = {}
+
+    def _client(self, scenario):
+        if scenario.fresh_client or scenario.role not in self._clients:
+            client = Client()
+            if scenario.login and scenario.role:
+                client.force_login(self.context.user(scenario.role))
+            if scenario.fresh_client:
+                return client
+            self._clients[scenario.role] = client
+        return self._clients[scenario.role]
+
+    def _request(self, scenario):
+        client = self._client(scenario)
+        state = scenario.setup(self.context) if scenario.setup else {}
+        url = scenario.url(self.context, state)
+        data = scenario.data(self.context, state) if scenario.data else None
+        headers = scenario.headers(self.context, state) if scenario.headers else None
+        return partial(getattr(client, scenario.method), headers=headers), url, data
+
+    def run(self, scenario):
+        # One untimed request warms caches and lazily-built state.
+        send, url, data = self._request(scenario)
+        _consume(send(url, data))
+
+        latencies, queries, status = [], [], None
+        for _ in range(self.iterations):
+            send, url, data = self._request(scenario)
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = _consume(send(url, data))
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+            status = response.status_code
+
+        send, url, data = self._request(scenario)
+        tracemalloc.start()
+        _consume(send(url, data))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        budget = self.budgets.get(scenario.name)
+        return {
+            "name": scenario.name,
+            "url_name": scenario.url_name,
+            "role": scenario.role,
+            "method": scenario.method.upper(),
+            "status": status,
+            "queries": max(queries),
+            "budget": budget,
+            "over_budget": budget is not None and max(queries) > budget,
+            "latency_ms": {
+                "median": round(statistics.median(latencies), 3),
+                "p95": round(sorted(latencies)[int(0.95 * (len(latencies) - 1))], 3),
+                "max": round(max(latencies), 3),
+            },
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+
+
+def run_benchmarks(estate, iterations=5, only=None, budgets=None):
+    building = (
+        Building.objects.filter(manager=estate.manager).order_by("number").first()
+    )
+    entrance = building.entrances.order_by("number").first()
+    context = Context(
+        estate=estate,
+        building=building,
+        entrance=entrance,
+        apartment=entrance.apartments.order_by("number").first(),
+    )
+    runner = Runner(context, iterations=iterations, budgets=budgets)
+    selected = [s for s in scenarios() if not only or any(o in s.name for o in only)]
+    with tempfile.TemporaryDirectory() as profiles, override_settings(
+        PROFILING_DIR=profiles
+    ):
+        results = [runner.run(scenario) for scenario in selected]
+    covered = {s.url_name for s in scenarios()}
+    return {
+        "estate": {
+            "buildings": estate.buildings,
+            "entrances": estate.entrances,
+            "apartments": estate.apartments,
+            "events": estate.events,
+        },
+        "iterations": iterations,
+        "scenarios": results,
+        "uncovered_urls": sorted(url_names() - covered - LONG_LIVED_URLS),
+    }
+
+
+def compare_session_modes(estate, iterations=5, only=None):
+    """
+    Run the scenarios once per ``SESSION_MODES`` entry and report the query
+    count of each scenario per mode, next to what the last mode saves over the
+    first.
+    """
+    reports = {}
+    for mode, (engine, storage) in settings.SESSION_MODES.items():
+        with override_settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=storage):
+            reports[mode] = run_benchmarks(estate, iterations=iterations, only=only)
+    modes = list(reports)
+    rows = []
+    for results in zip(*(reports[mode]["scenarios"] for mode in modes)):
+        queries = {mode: result["queries"] for mode, result in zip(modes, results)}
+        rows.append(
+            {
+                "name": results[0]["name"],
+                "queries": queries,
+                "saved": queries[modes[0]] - queries[modes[-1]],
+            }
+        )
+    return {"modes": modes, "iterations": iterations, "scenarios": rows}
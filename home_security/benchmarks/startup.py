@@ -0,0 +1,149 @@
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.urls import reverse
+
+from home_security.startup import unapplied_migrations
+
+PYTHON = sys.executable
+
+
+def _launches(address):
+    """The commands each mode runs, in order, from container start on."""
+    return {
+        # What entrypoint.sh and the compose file did before: a full migrate,
+        # then the autoreloading development server.
+        "runserver": [
+            [PYTHON, "manage.py", "migrate", "--verbosity", "0"],
+            [PYTHON, "manage.py", "runserver", address],
+        ],
+        # The production command: the gunicorn master checks migrations,
+        # preloads and warms the app, then forks its workers.
+        "gunicorn": [
+            [PYTHON, "-m", "gunicorn", "-c", "config/gunicorn.py", "--bind", address]
+        ],
+    }
+
+
+def _served(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+    except OSError:
+        return None
+
+
+def _stop(process):
+    # runserver's autoreloader and gunicorn's workers are children of the
+    # launched process; signal the whole group.
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    except ProcessLookupError:
+        pass
+
+
+def time_launch(commands, url, env, timeout):
+    """
+    Seconds from running the first command to the first HTTP response from
+    ``url`` of the server started by the last one.
+    """
+    start = time.perf_counter()
+    for command in commands[:-1]:
+        subprocess.run(command, cwd=settings.BASE_DIR, env=env, check=True)
+    process = subprocess.Popen(
+        commands[-1],
+        cwd=settings.BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        while _served(url) is None:
+            if process.poll() is not None:
+                command = " ".join(commands[-1][1:])
+                raise RuntimeError(f"{command} exited with {process.returncode}")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"No response from {url} within {timeout}s")
+            time.sleep(0.01)
+        return time.perf_counter() - start
+    finally:
+        _stop(process)
+
+
+def time_migration_checks(using=DEFAULT_DB_ALIAS, runs=5):
+    """
+    Milliseconds taken to find out whether migrations are pending: the
+    one-query check of ``ensure_migrated`` against the migration plan
+    ``migrate`` builds before it can tell there is nothing to do.
+    """
+    connection = connections[using]
+
+    def fast():
+        unapplied_migrations(using)
+
+    def plan():
+        executor = MigrationExecutor(connection)
+        executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+    report = {}
+    for name, check in (("ensure_migrated", fast), ("migrate_plan", plan)):
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            check()
+            samples.append((time.perf_counter() - start) * 1000)
+        report[name] = round(statistics.median(samples), 3)
+    return report
+
+
+def run_startup(modes=None, runs=3, port=8765, workers=1, timeout=60):
+    """
+    Starts each server mode ``runs`` times against the configured database
+    and reports the seconds from launch to the first served request. The
+    wait for the database in entrypoint.sh is not included.
+    """
+    address = f"127.0.0.1:{port}"
+    url = f"http://{address}{reverse('login')}"
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+        "WEB_CONCURRENCY": str(workers),
+        "PYTHONUNBUFFERED": "1",
+    }
+    launches = _launches(address)
+    report = {
+        "url": url,
+        "workers": workers,
+        "migration_check_ms": time_migration_checks(),
+        "modes": [],
+    }
+    for mode in modes or launches:
+        samples = [time_launch(launches[mode], url, env, timeout) for _ in range(runs)]
+        report["modes"].append(
+            {
+                "mode": mode,
+                "runs": runs,
+                "first_request_s": {
+                    "min": round(min(samples), 3),
+                    "median": round(statistics.median(samples), 3),
+                    "max": round(max(samples), 3),
+                },
+            }
+        )
+    return report
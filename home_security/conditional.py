@@ -0,0 +1,85 @@
+import hashlib
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .hierarchy import hierarchy_changed
+from .models import Apartment, Building, Entrance, User
+from .versions import bump_versions, get_versions, last_modified
+
+
+def table_label(model):
+    return model._meta.model_name
+
+
+def bump_tables(*models):
+    """
+    Invalidate the conditional GETs over ``models`` once the current
+    transaction commits. Bulk writes that bypass model signals call this.
+    """
+    labels = [table_label(model) for model in models]
+    transaction.on_commit(lambda: bump_versions("table", labels))
+
+
+def _model_changed(sender, **kwargs):
+    bump_tables(sender)
+
+
+for _model in (Building, Entrance, Apartment):
+    post_save.connect(_model_changed, sender=_model)
+    post_delete.connect(_model_changed, sender=_model)
+
+
+@receiver(post_save, sender=User)
+def _user_saved(sender, created=False, update_fields=None, **kwargs):
+    # Buildings and entrances render their manager and guard by username.
+    if created or (update_fields and set(update_fields) <= {"last_login"}):
+        return
+    bump_tables(Building, Entrance)
+
+
+@receiver(post_delete, sender=User)
+def _user_deleted(sender, **kwargs):
+    bump_tables(Building, Entrance)
+
+
+@receiver(hierarchy_changed)
+def _hierarchy_changed(sender, **kwargs):
+    # Sent after the read model is refreshed, so a poll that sees the new
+    # version also sees the new rows.
+    bump_versions("hierarchy", ["all"])
+
+
+def validators(parts, versions):
+    """
+    Return ``(etag, last_modified)`` for a response that depends on
+    ``parts`` and on the ``(namespace, pks)`` version counters in
+    ``versions``. ``last_modified`` is None unless every counter has a
+    recorded bump time.
+    """
+    values, modified = [], []
+    for namespace, pks in versions:
+        pks = sorted(pks)
+        found = get_versions(namespace, pks)
+        values.append((namespace, [(pk, found[pk]) for pk in pks]))
+        if pks:
+            modified.append(last_modified(namespace, pks))
+    digest = hashlib.md5(repr((parts, values)).encode()).hexdigest()
+    if not modified or None in modified:
+        return f'W/"{digest}"', None
+    return f'W/"{digest}"', int(max(modified))
+
+
+def not_modified(request, etag, modified):
+    """Return a 304 response if the request's validators still match, or None."""
+    return get_conditional_response(request, etag=etag, last_modified=modified)
+
+
+def set_validators(response, etag, modified):
+    response["ETag"] = etag
+    if modified is not None:
+        response["Last-Modified"] = http_date(modified)
+    return response
@@ -0,0 +1,84 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from .pool import ConnectionPool, PoolTimeout, get_pool
+
+Database = base.Database
+
+
+def _check(connection):
+    if connection.closed:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return True
+
+
+def _reset(connection):
+    # Hand out connections outside any transaction; one left in an error
+    # state that cannot be rolled back is discarded.
+    if connection.closed:
+        return False
+    idle = Database.extensions.TRANSACTION_STATUS_IDLE
+    if connection.info.transaction_status != idle:
+        connection.rollback()
+    return connection.info.transaction_status == idle
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that borrows connections from a per-process pool
+    instead of opening one per request. Django still "closes" the connection
+    at the end of every request (CONN_MAX_AGE must be 0); closing returns it
+    to the pool, so this works the same under WSGI worker threads and the
+    sync_to_async threads of ASGI.
+
+    Pool settings come from the ``POOL`` dict of the database settings:
+    MIN_SIZE, MAX_SIZE, TIMEOUT, MAX_IDLE, MAX_LIFETIME and CHECK_INTERVAL,
+    see ``ConnectionPool``.
+    """
+
+    def get_new_connection(self, conn_params):
+        if self.settings_dict["CONN_MAX_AGE"]:
+            raise ImproperlyConfigured("Pooled connections require CONN_MAX_AGE=0.")
+        # The parent sets this while connecting; pooled connections skip that.
+        try:
+            self.isolation_level = IsolationLevel(
+                self.settings_dict["OPTIONS"].get(
+                    "isolation_level", IsolationLevel.READ_COMMITTED
+                )
+            )
+        except ValueError:
+            raise ImproperlyConfigured("Invalid transaction isolation level.")
+        try:
+            return self.pool().getconn()
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+
+    def pool(self):
+        target = tuple(
+            self.settings_dict[key] for key in ("HOST", "PORT", "NAME", "USER")
+        )
+        return get_pool(self.alias, target, self._create_pool)
+
+    def _create_pool(self):
+        options = {
+            key.lower(): value
+            for key, value in self.settings_dict.get("POOL", {}).items()
+        }
+        return ConnectionPool(
+            self._open_connection,
+            _check,
+            _reset,
+            lambda connection: connection.close(),
+            **options,
+        )
+
+    def _open_connection(self):
+        return super().get_new_connection(self.get_connection_params())
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool().putconn(self.connection)
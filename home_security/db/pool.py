@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Entry:
+    __slots__ = ("connection", "created", "returned")
+
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created = now
+        self.returned = now
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    ``connect()`` opens a connection, ``check(connection)`` tells whether an
+    idle one still works, ``reset(connection)`` readies a returned one for
+    reuse (returning False discards it) and ``close(connection)`` closes it.
+
+    At most ``max_size`` connections are open; callers wait up to ``timeout``
+    seconds for one to be returned. Connections idle for ``check_interval``
+    seconds are checked before reuse, idle ones beyond ``min_size`` are
+    closed after ``max_idle`` seconds and every connection is replaced after
+    ``max_lifetime`` seconds.
+    """
+
+    def __init__(
+        self,
+        connect,
+        check,
+        reset,
+        close,
+        min_size=0,
+        max_size=10,
+        timeout=5,
+        max_idle=300,
+        max_lifetime=3600,
+        check_interval=30,
+    ):
+        self._connect = connect
+        self._check = check
+        self._reset = reset
+        self._close = close
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self._condition = threading.Condition()
+        # Most recently returned last: reusing from the right keeps a warm
+        # working set and lets the left end age out.
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self.pid = os.getpid()
+        self.target = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = 0
+        self.check_failures = 0
+        self.wait_seconds = 0.0
+        self.wait_max = 0.0
+
+    def stats(self):
+        with self._condition:
+            checkouts = self.checkouts or 1
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "opened": self.opened,
+                "closed": self.closed,
+                "check_failures": self.check_failures,
+                "wait_ms": {
+                    "avg": round(self.wait_seconds / checkouts * 1000, 3),
+                    "max": round(self.wait_max * 1000, 3),
+                },
+            }
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._condition:
+            expired = self._expire_idle(start)
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available within {self.timeout}s "
+                        f"({self.max_size} in use)"
+                    )
+                self._condition.wait(remaining)
+            waited = time.monotonic() - start
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.wait_max = max(self.wait_max, waited)
+        for old in expired:
+            self._close_quietly(old.connection)
+
+        now = time.monotonic()
+        if entry is not None and not self._reusable(entry, now):
+            self._close_quietly(entry.connection)
+            entry = None
+        if entry is None:
+            # The slot is already counted in _size; give it back on failure.
+            try:
+                entry = _Entry(self._connect(), now)
+            except BaseException:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self.opened += 1
+        with self._condition:
+            self._in_use[id(entry.connection)] = entry
+        return entry.connection
+
+    def putconn(self, connection):
+        with self._condition:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            self._close_quietly(connection)
+            return
+        now = time.monotonic()
+        if now - entry.created >= self.max_lifetime or not self._safe(
+            self._reset, connection
+        ):
+            self._close_quietly(connection)
+            with self._condition:
+                self._size -= 1
+                self.closed += 1
+                self._condition.notify()
+            return
+        entry.returned = now
+        with self._condition:
+            self._idle.append(entry)
+            self._condition.notify()
+
+    def close_all(self):
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self.closed += len(idle)
+        for entry in idle:
+            self._close_quietly(entry.connection)
+
+    def _reusable(self, entry, now):
+        if now - entry.created >= self.max_lifetime:
+            with self._condition:
+                self.closed += 1
+            return False
+        if now - entry.returned >= self.check_interval and not self._safe(
+            self._check, entry.connection
+        ):
+            with self._condition:
+                self.closed += 1
+                self.check_failures += 1
+            return False
+        return True
+
+    def _expire_idle(self, now):
+        # Called with the lock held; the caller closes what is returned.
+        expired = []
+        while (
+            self._idle
+            and self._size > self.min_size
+            and now - self._idle[0].returned >= self.max_idle
+        ):
+            expired.append(self._idle.popleft())
+            self._size -= 1
+            self.closed += 1
+        return expired
+
+    def _safe(self, function, connection):
+        try:
+            return function(connection)
+        except Exception:
+            return False
+
+    def _close_quietly(self, connection):
+        try:
+            self._close(connection)
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, target, factory):
+    """
+    Return the pool of ``alias`` in this process, creating it with
+    ``factory()`` on first use, after a fork or when ``target`` (what the
+    connections point at) changed, as when the test runner switches to the
+    test database. Connections inherited from the parent are left alone:
+    closing them would end the parent's sessions.
+    """
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is not None and pool.pid == os.getpid() and pool.target == target:
+            return pool
+        if pool is not None and pool.pid == os.getpid():
+            pool.close_all()
+        pool = _pools[alias] = factory()
+        pool.pid = os.getpid()
+        pool.target = target
+        return pool
+
+
+def pool_stats():
+    """Stats of every pool of this process, by database alias."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {
+        alias: pool.stats() for alias, pool in pools.items() if pool.pid == os.getpid()
+    }
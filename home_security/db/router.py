@@ -0,0 +1,141 @@
+import random
+import re
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PIN_COOKIE = "pin_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+WRITES = re.compile(
+    r"^\s*(INSERT|UPDATE|DELETE|MERGE|CREATE|ALTER|DROP|TRUNCATE)\b", re.IGNORECASE
+)
+
+_current = ContextVar("replica_routing", default=None)
+
+
+class RequestRouting:
+    """
+    Routing state of one request. Mutated rather than replaced, so writes
+    made in sync_to_async threads are seen by the middleware too.
+    """
+
+    __slots__ = ("replica", "alias", "wrote")
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.alias = None
+        self.wrote = False
+
+
+class RoutingStats:
+    def __init__(self):
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.pinned_requests = 0
+
+    def stats(self):
+        return {
+            "replicas": list(settings.DATABASE_REPLICAS),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "pinned_requests": self.pinned_requests,
+        }
+
+
+routing_stats = RoutingStats()
+
+
+def pinned(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+def start_request(request):
+    """
+    Let ``request`` read from a replica when it is safe, replicas are
+    configured and the client did not write within DB_REPLICA_PIN_SECONDS.
+    """
+    replica = request.method in SAFE_METHODS and bool(settings.DATABASE_REPLICAS)
+    if replica and pinned(request):
+        routing_stats.pinned_requests += 1
+        replica = False
+    routing = RequestRouting(replica)
+    return routing, _current.set(routing)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def _detect_write(execute, sql, params, many, context):
+    # Django asks db_for_write for validation reads too, so a request counts
+    # as writing only once it runs a statement that changes data.
+    routing = _current.get()
+    if (
+        routing is not None
+        and not routing.wrote
+        and context["connection"].alias == DEFAULT_DB_ALIAS
+        and WRITES.match(sql)
+    ):
+        routing.wrote = True
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    if _detect_write not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_detect_write)
+
+
+def pin(response):
+    """Pin the client's reads to the primary for DB_REPLICA_PIN_SECONDS."""
+    response.set_cookie(
+        PIN_COOKIE,
+        "1",
+        max_age=settings.DB_REPLICA_PIN_SECONDS,
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of safe requests to one of DATABASE_REPLICAS, picked once
+    per request so its queries see a single snapshot, and everything else to
+    the primary. Once a request writes, the rest of it reads from the primary
+    and ``pin`` keeps the client there for a while, so a redirect after a
+    write never shows stale data. Reads inside a transaction also stay on
+    the primary.
+
+    The pin is a cookie: API clients that do not keep cookies are not pinned
+    across requests.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        if (
+            routing is None
+            or not routing.replica
+            or routing.wrote
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            routing_stats.primary_reads += 1
+            return DEFAULT_DB_ALIAS
+        if routing.alias is None:
+            routing.alias = random.choice(settings.DATABASE_REPLICAS)
+        routing_stats.replica_reads += 1
+        return routing.alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -1,9 +1,10 @@
+from functools import wraps
+
 from django.contrib.auth import REDIRECT_FIELD_NAME
 from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import PermissionDenied
-from django.shortcuts import get_object_or_404
 
-from .models import Building, Entrance
+from .access import get_scope
 
 
 def admin_required(
@@ -46,11 +47,9 @@ def guard_required(
 
 
 def manager_of_building_required(view_func):
+    @wraps(view_func)
     def wrapper(request, building_id, *args, **kwargs):
-        building = get_object_or_404(Building, id=building_id)
-        if request.user.is_admin() or (
-            request.user.is_manager() and building.manager == request.user
-        ):
+        if get_scope(request.user).can_manage_building(building_id):
             return view_func(request, building_id, *args, **kwargs)
         raise PermissionDenied
 
@@ -58,13 +57,9 @@ def manager_of_building_required(view_func):
 
 
 def guard_of_entrance_required(view_func):
+    @wraps(view_func)
     def wrapper(request, entrance_id, *args, **kwargs):
-        entrance = get_object_or_404(Entrance, id=entrance_id)
-        if (
-            request.user.is_admin()
-            or request.user.is_manager()
-            or entrance.guard == request.user
-        ):
+        if get_scope(request.user).can_guard_entrance(entrance_id):
             return view_func(request, entrance_id, *args, **kwargs)
         raise PermissionDenied
 
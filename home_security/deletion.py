@@ -0,0 +1,48 @@
+from django.db import router, transaction
+
+from .conditional import bump_tables
+from .hierarchy import remove_rows
+from .models import Apartment, Building, Entrance
+
+
+def _delete_rows(queryset):
+    # The hierarchy and conditional GET receivers listen to post_delete, so
+    # QuerySet.delete() would load every row to send it. _raw_delete is the
+    # single DELETE ... WHERE its fast path issues when nothing listens; it
+    # is private and skips on_delete handling, so DeletionTests pins both its
+    # behaviour and the relations between these tables.
+    return queryset._raw_delete(router.db_for_write(queryset.model))
+
+
+def bulk_delete_building(building):
+    """
+    Delete ``building`` with its entrances and apartments in one DELETE per
+    table, without loading them, and return the number of rows removed per
+    table. Model signals are not sent; the hierarchy read model and the
+    conditional GET versions are updated here instead.
+    """
+    with transaction.atomic():
+        counts = {
+            "apartments": _delete_rows(
+                Apartment.objects.filter(entrance__building_id=building.id)
+            ),
+            "entrances": _delete_rows(Entrance.objects.filter(building_id=building.id)),
+            "buildings": _delete_rows(Building.objects.filter(id=building.id)),
+        }
+        remove_rows(building.id)
+        bump_tables(Building, Entrance, Apartment)
+    return counts
+
+
+def bulk_delete_entrance(entrance):
+    """Like ``bulk_delete_building``, for ``entrance`` and its apartments."""
+    with transaction.atomic():
+        counts = {
+            "apartments": _delete_rows(
+                Apartment.objects.filter(entrance_id=entrance.id)
+            ),
+            "entrances": _delete_rows(Entrance.objects.filter(id=entrance.id)),
+        }
+        remove_rows(entrance.building_id, entrance.id)
+        bump_tables(Entrance, Apartment)
+    return counts
@@ -0,0 +1,225 @@
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+SYNC = "sync"
+COMMIT = "commit"
+BACKGROUND = "background"
+MODES = (SYNC, COMMIT, BACKGROUND)
+
+# Sent with the saved ``Event`` instances in ``events`` after each write.
+events_written = Signal()
+
+# The events of the request being served in ``commit`` mode. Context
+# variables follow the request into sync_to_async threads.
+_request_events = ContextVar("request_events", default=None)
+
+
+class EventBuffer:
+    """
+    Collects audit events in memory and writes them with ``bulk_create``.
+
+    ``sync`` writes every event immediately, ``commit`` keeps each request's
+    events in a buffer of its own and writes them at the end of the request
+    (or every ``batch_size`` events), ``background`` hands them to a worker
+    thread that flushes on size/time thresholds. In the buffered modes an
+    event logged inside a transaction is only buffered once that transaction
+    commits, so a rollback discards it.
+    """
+
+    def __init__(self, mode=SYNC, batch_size=100, max_size=10000, interval=1.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown event log mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.interval = interval
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._worker = None
+        self._worker_pid = None
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "queue_depth": self.depth,
+                "dropped": self.dropped,
+                "written": self.written,
+                "flushes": self.flushes,
+            }
+
+    def start_request(self):
+        """Give the current request its own buffer; returns a token for end_request."""
+        return _request_events.set([])
+
+    def end_request(self, token):
+        """Drop the request's buffer and return the events still in it."""
+        events = _request_events.get()
+        _request_events.reset(token)
+        return events
+
+    def add(self, user, action, details=""):
+        event = self._event(user, action, details)
+        if self.mode == SYNC:
+            event.save()
+            self._written([event])
+        elif connection.in_atomic_block:
+            transaction.on_commit(partial(self._committed, event))
+        else:
+            self._committed(event)
+
+    async def aadd(self, user, action, details=""):
+        """
+        ``add`` for async views, which run outside transactions. Buffering
+        never touches the database, so only a write leaves the event loop.
+        """
+        event = self._event(user, action, details)
+        if self.mode == SYNC:
+            await event.asave()
+            self._written([event])
+            return
+        batch = self._buffer(event)
+        if batch:
+            await sync_to_async(self.write)(batch)
+
+    def _event(self, user, action, details):
+        event = Event(user=user, action=action, details=details)
+        event.timestamp = timezone.now()
+        return event
+
+    def _committed(self, event):
+        batch = self._buffer(event)
+        if batch:
+            self.write(batch)
+
+    def _buffer(self, event):
+        """Buffer ``event``; returns a batch to write now, if any."""
+        if self.mode == BACKGROUND:
+            self._enqueue(event)
+            return None
+        events = _request_events.get()
+        if events is None:
+            # Outside a request there is no end to wait for.
+            return [event]
+        events.append(event)
+        if len(events) < self.batch_size:
+            return None
+        batch = events[:]
+        events.clear()
+        return batch
+
+    def _enqueue(self, event):
+        with self._lock:
+            if len(self._queue) >= self.max_size:
+                self.dropped += 1
+                logger.warning("Event buffer full, dropping %r event", event.action)
+                return
+            self._queue.append(event)
+            depth = len(self._queue)
+        self._ensure_worker()
+        if depth >= self.batch_size:
+            self._wakeup.set()
+
+    def _written(self, events):
+        with self._lock:
+            self.written += len(events)
+        events_written.send(sender=Event, events=events)
+
+    def write(self, batch):
+        """
+        Write ``batch`` in its own savepoint, so a failure neither breaks a
+        surrounding transaction nor escapes: the events are counted as
+        dropped and logged.
+        """
+        if not batch:
+            return 0
+        try:
+            with transaction.atomic():
+                Event.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception:
+            with self._lock:
+                self.dropped += len(batch)
+            logger.exception("Failed to write %d buffered events", len(batch))
+            return 0
+        with self._lock:
+            self.flushes += 1
+        self._written(batch)
+        return len(batch)
+
+    def flush(self):
+        """Write the background queue."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._queue)
+                self._queue.clear()
+            return self.write(batch)
+
+    def shutdown(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._worker.join(timeout=self.interval + 5)
+        self.flush()
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so pre-forked workers start their own.
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(
+                target=self._run, name="event-buffer", daemon=True
+            )
+            self._worker.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+        connection.close()
+
+
+event_buffer = EventBuffer(
+    mode=getattr(settings, "EVENT_LOG_MODE", SYNC),
+    batch_size=getattr(settings, "EVENT_LOG_BATCH_SIZE", 100),
+    max_size=getattr(settings, "EVENT_LOG_MAX_SIZE", 10000),
+    interval=getattr(settings, "EVENT_LOG_FLUSH_INTERVAL", 1.0),
+)
+atexit.register(event_buffer.shutdown)
+
+
+def log_event(user, action, details=""):
+    event_buffer.add(user, action, details)
+
+
+async def alog_event(user, action, details=""):
+    await event_buffer.aadd(user, action, details)
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+
+COLUMNS = ("id", "timestamp", "user", "action", "details")
+FORMATS = ("csv", "jsonl")
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+# Rows are encoded into buffers of roughly this size before being yielded, so
+# the response is neither one huge string nor one write per row.
+BUFFER_SIZE = 64 * 1024
+
+
+def event_rows(queryset, chunk_size=2000):
+    """
+    Yields one tuple per event in ``COLUMNS`` order. ``iterator()`` uses a
+    server-side cursor on PostgreSQL, so only ``chunk_size`` rows are held in
+    memory at a time.
+    """
+    rows = queryset.order_by("timestamp", "id").values_list(
+        "id", "timestamp", "user__username", "action", "details"
+    )
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for pk, timestamp, username, action, details in rows:
+        writer.writerow((pk, timestamp.isoformat(), username or "", action, details))
+        if buffer.tell() >= BUFFER_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _jsonl_lines(rows):
+    lines, size = [], 0
+    for pk, timestamp, username, action, details in rows:
+        line = json.dumps(
+            {
+                "id": pk,
+                "timestamp": timestamp.isoformat(),
+                "user": username,
+                "action": action,
+                "details": details,
+            }
+        )
+        lines.append(line)
+        size += len(line) + 1
+        if size >= BUFFER_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines, size = [], 0
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def encode_rows(rows, fmt, compress=False):
+    """Yields ``rows`` as encoded CSV or JSONL chunks, optionally gzipped."""
+    chunks = _csv_lines(rows) if fmt == "csv" else _jsonl_lines(rows)
+    chunks = (chunk.encode() for chunk in chunks if chunk)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def gzip_chunks(chunks):
+    # wbits=31 writes a gzip header and trailer instead of a raw zlib stream.
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def aiterate(chunks):
+    """
+    Async iterator over the sync ``chunks``, advancing it one chunk per
+    ``sync_to_async`` call. Under ASGI a StreamingHttpResponse would otherwise
+    collect a sync iterator into a list before sending it. The steps run in
+    the one thread-sensitive thread, where the database cursor lives.
+    """
+    step = sync_to_async(next)
+    done = object()
+    try:
+        while (chunk := await step(chunks, done)) is not done:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def export_filename(fmt, compress=False):
+    return f"events.{fmt}" + (".gz" if compress else "")
@@ -0,0 +1,31 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def filter_by_params(queryset, params, filter_fields):
+    """
+    Apply ``filter_fields`` (query parameter name to ORM lookup) as exact
+    matches, raising a ValidationError for values the lookup cannot take.
+    """
+    for param, lookup in filter_fields.items():
+        value = params.get(param)
+        if value in (None, ""):
+            continue
+        try:
+            queryset = queryset.filter(**{lookup: value})
+        except (ValueError, DjangoValidationError):
+            raise ValidationError({param: f"Invalid value {value!r}."})
+    return queryset
+
+
+class QueryParamFilterBackend(BaseFilterBackend):
+    """
+    Exact-match filtering on the query parameters listed in the view's
+    ``filter_fields`` mapping of parameter name to ORM lookup.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_by_params(
+            queryset, request.query_params, getattr(view, "filter_fields", {})
+        )
@@ -1,7 +1,15 @@
+from collections import Counter
+
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
+from django.core.exceptions import ValidationError
 
-from .models import Apartment, Building, Entrance, User
+from .exporter import FORMATS as EXPORT_FORMATS
+from .exporter import event_rows
+from .locator import locate, parse_query
+from .models import Apartment, Building, Entrance, Event, User
+from .partitions import archived_rows
+from .writes import APARTMENT_EXISTS, ENTRANCE_EXISTS
 
 
 class CustomUserCreationForm(UserCreationForm):
@@ -16,7 +24,20 @@ class CustomUserCreationForm(UserCreationForm):
         return username
 
 
-class BuildingForm(forms.ModelForm):
+class DatabaseUniqueFormMixin:
+    """
+    Skip the per-form uniqueness lookups for fields covered by a unique
+    constraint; the views write through ``writes.unique_write`` instead.
+    """
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        for constraint in self._meta.model._meta.constraints:
+            exclude.update(getattr(constraint, "fields", ()))
+        return exclude
+
+
+class BuildingForm(DatabaseUniqueFormMixin, forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -28,7 +49,7 @@ class BuildingForm(forms.ModelForm):
         fields = ["number", "manager"]
 
 
-class EntranceForm(forms.ModelForm):
+class EntranceForm(DatabaseUniqueFormMixin, forms.ModelForm):
     class Meta:
         model = Entrance
         fields = ["number", "guard", "building"]
@@ -38,7 +59,7 @@ class EntranceForm(forms.ModelForm):
         self.fields["guard"].queryset = User.objects.filter(role=User.GUARD)
 
 
-class ApartmentForm(forms.ModelForm):
+class ApartmentForm(DatabaseUniqueFormMixin, forms.ModelForm):
     class Meta:
         model = Apartment
         fields = "__all__"
@@ -49,3 +70,303 @@ class LoginForm(AuthenticationForm):
     password = forms.CharField(
         widget=forms.PasswordInput(attrs={"class": "form-control"})
     )
+
+
+class EventFilterForm(forms.Form):
+    user = forms.CharField(
+        required=False, widget=forms.TextInput(attrs={"class": "form-control"})
+    )
+    action = forms.CharField(
+        required=False, widget=forms.TextInput(attrs={"class": "form-control"})
+    )
+    since = forms.DateTimeField(
+        required=False,
+        widget=forms.DateTimeInput(
+            attrs={"class": "form-control", "type": "datetime-local"}
+        ),
+    )
+    until = forms.DateTimeField(
+        required=False,
+        widget=forms.DateTimeInput(
+            attrs={"class": "form-control", "type": "datetime-local"}
+        ),
+    )
+
+    def filter_queryset(self, queryset):
+        # Unbound shows everything; an invalid filter matches nothing and
+        # leaves its errors on the form.
+        if not self.is_bound:
+            return queryset
+        if not self.is_valid():
+            return queryset.none()
+        data = self.cleaned_data
+        if data["user"]:
+            queryset = queryset.filter(user__username=data["user"])
+        if data["action"]:
+            queryset = queryset.filter(action=data["action"])
+        if data["since"]:
+            queryset = queryset.filter(timestamp__gte=data["since"])
+        if data["until"]:
+            queryset = queryset.filter(timestamp__lt=data["until"])
+        return queryset
+
+
+class EventExportForm(EventFilterForm):
+    format = forms.ChoiceField(
+        choices=[(fmt, fmt.upper()) for fmt in EXPORT_FORMATS],
+        required=False,
+        widget=forms.Select(attrs={"class": "form-control"}),
+    )
+    gzip = forms.BooleanField(required=False)
+    archived = forms.BooleanField(required=False)
+
+    def clean_format(self):
+        return self.cleaned_data["format"] or EXPORT_FORMATS[0]
+
+    def rows(self, chunk_size):
+        data = self.cleaned_data
+        if data["archived"]:
+            return archived_rows(
+                data["user"], data["action"], data["since"], data["until"]
+            )
+        return event_rows(self.filter_queryset(Event.objects.all()), chunk_size)
+
+
+class ApartmentLocatorForm(forms.Form):
+    q = forms.CharField(
+        label="Apartment",
+        max_length=40,
+        widget=forms.TextInput(
+            attrs={"class": "form-control", "placeholder": "145 or 3/2/145"}
+        ),
+    )
+
+    def clean_q(self):
+        query = self.cleaned_data["q"]
+        try:
+            parse_query(query)
+        except ValueError as exc:
+            raise ValidationError(str(exc))
+        return query
+
+    def results(self, limit):
+        return locate(self.cleaned_data["q"], limit)
+
+
+class ProfileTargetForm(forms.Form):
+    user = forms.ModelChoiceField(
+        queryset=User.objects.filter(is_active=True).order_by("username"),
+        widget=forms.Select(attrs={"class": "form-control"}),
+    )
+    rate = forms.FloatField(
+        min_value=0.001,
+        max_value=1,
+        initial=0.1,
+        help_text="Fraction of the user's requests to profile",
+        widget=forms.NumberInput(attrs={"class": "form-control", "step": "any"}),
+    )
+    minutes = forms.IntegerField(
+        min_value=1,
+        max_value=24 * 60,
+        initial=30,
+        widget=forms.NumberInput(attrs={"class": "form-control"}),
+    )
+
+
+class PrefetchedModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField that loads its choices once and validates against them
+    in memory, so one instance can be shared by every form of a formset.
+    """
+
+    def __init__(self, queryset, *args, objects=None, **kwargs):
+        self._objects = None if objects is None else {str(o.pk): o for o in objects}
+        super().__init__(queryset, *args, **kwargs)
+
+    def prefetched(self):
+        if self._objects is None:
+            self._objects = {str(o.pk): o for o in self.queryset}
+        return self._objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            return self.prefetched()[str(value)]
+        except KeyError:
+            raise ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+
+    def _get_choices(self):
+        choices = [] if self.empty_label is None else [("", self.empty_label)]
+        return choices + [
+            (obj.pk, self.label_from_instance(obj))
+            for obj in self.prefetched().values()
+        ]
+
+    choices = property(_get_choices, forms.ChoiceField.choices.fset)
+
+
+class BulkEditFormSet(forms.BaseModelFormSet):
+    """
+    Edits every row of a prefetched queryset in one submission.
+
+    Relation fields are replaced by shared ``PrefetchedModelChoiceField``
+    instances and uniqueness of ``(parent_field, number)`` is checked in
+    memory against the whole set, so validating N rows costs no queries
+    beyond loading the rows and the choices once.
+    """
+
+    parent_field = None
+    duplicate_message = ""
+
+    def __init__(self, *args, choices=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shared_fields = {
+            name: PrefetchedModelChoiceField(
+                queryset, required=self.form.base_fields[name].required
+            )
+            for name, queryset in (choices or {}).items()
+            if name in self.form.base_fields
+        }
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        pk_name = self._pk_field.name
+        if "pk" not in self.shared_fields:
+            objects = list(self.get_queryset())
+            self.shared_fields["pk"] = PrefetchedModelChoiceField(
+                self.model._default_manager.none(),
+                objects=objects,
+                required=False,
+                widget=forms.HiddenInput,
+            )
+        form.fields[pk_name] = self.shared_fields["pk"]
+        if form.instance.pk is not None:
+            form.initial.setdefault(pk_name, form.instance.pk)
+        for name, field in self.shared_fields.items():
+            if name in form.fields:
+                form.fields[name] = field
+        form.prefetched_fields = set(self.shared_fields) - {"pk"}
+
+    def clean(self):
+        super().clean()
+        if self.total_form_count() > self.initial_form_count():
+            raise ValidationError("Rows cannot be added here.")
+        if any(self.errors):
+            return
+        keys = Counter()
+        for form in self.forms:
+            instance = form.instance
+            keys[getattr(instance, f"{self.parent_field}_id"), instance.number] += 1
+        for (_, number), count in keys.items():
+            if count > 1:
+                raise ValidationError(self.duplicate_message.format(number=number))
+
+    def changed_instances(self):
+        return [form.instance for form in self.initial_forms if form.has_changed()]
+
+    def _new_key(self, form):
+        return getattr(form.instance, f"{self.parent_field}_id"), form.instance.number
+
+    def _old_key(self, form):
+        # form.initial holds the values the row was loaded with.
+        parent, number = self._new_key(form)
+        return form.initial.get(self.parent_field, parent), form.initial.get(
+            "number", number
+        )
+
+    def save_changed(self):
+        """
+        ``bulk_update`` the changed rows and return them. The unique
+        constraints are checked row by row, so every row that changes its
+        number or parent is first parked on a number above every number of
+        the set, which holds all rows of their parents. Swaps and shifts
+        along a chain then never meet a row that has not moved yet.
+        """
+        if self.total_form_count() > self.initial_form_count():
+            raise ValueError("Bulk edits cannot add rows.")
+        changed = [form for form in self.initial_forms if form.has_changed()]
+        fields = self.form._meta.fields
+        if "number" in fields:
+            moving = [
+                form.instance
+                for form in changed
+                if self._new_key(form) != self._old_key(form)
+            ]
+            if moving:
+                top = max(
+                    max(self._old_key(form)[1], form.instance.number)
+                    for form in self.initial_forms
+                )
+                numbers = [instance.number for instance in moving]
+                for offset, instance in enumerate(moving, 1):
+                    instance.number = top + offset
+                self.model._default_manager.bulk_update(moving, ["number"])
+                for instance, number in zip(moving, numbers):
+                    instance.number = number
+        instances = [form.instance for form in changed]
+        self.model._default_manager.bulk_update(instances, fields)
+        return instances
+
+
+class BulkEditFormMixin:
+    prefetched_fields = ()
+
+    def _get_validation_exclusions(self):
+        # Relations were validated against the prefetched choices already;
+        # model validation would re-check every foreign key with a query.
+        exclude = super()._get_validation_exclusions()
+        exclude.update(self.prefetched_fields)
+        return exclude
+
+
+class BulkEntranceForm(BulkEditFormMixin, forms.ModelForm):
+    class Meta:
+        model = Entrance
+        fields = ["number", "guard"]
+
+
+class BulkApartmentForm(BulkEditFormMixin, forms.ModelForm):
+    class Meta:
+        model = Apartment
+        fields = ["number", "entrance"]
+
+
+class EntranceBulkFormSet(BulkEditFormSet):
+    parent_field = "building"
+    duplicate_message = ENTRANCE_EXISTS
+
+
+class ApartmentBulkFormSet(BulkEditFormSet):
+    parent_field = "entrance"
+    duplicate_message = APARTMENT_EXISTS
+
+
+EntranceFormSet = forms.modelformset_factory(
+    Entrance,
+    form=BulkEntranceForm,
+    formset=EntranceBulkFormSet,
+    extra=0,
+    edit_only=True,
+)
+EntranceGuardFormSet = forms.modelformset_factory(
+    Entrance,
+    form=BulkEntranceForm,
+    formset=EntranceBulkFormSet,
+    fields=["guard"],
+    extra=0,
+    edit_only=True,
+)
+ApartmentFormSet = forms.modelformset_factory(
+    Apartment,
+    form=BulkApartmentForm,
+    formset=ApartmentBulkFormSet,
+    extra=0,
+    edit_only=True,
+)
@@ -0,0 +1,68 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .hierarchy import hierarchy_changed
+from .versions import bump_versions, get_versions
+
+FRAGMENT_KEY = "dashboard:{scope}:{kind}:{pk}:{version}"
+
+
+class FragmentStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+fragment_stats = FragmentStats()
+
+
+@receiver(hierarchy_changed)
+def _hierarchy_changed(sender, building_ids, **kwargs):
+    bump_versions("building", building_ids)
+
+
+def render_fragments(scope, kind, groups, load, template, context):
+    """
+    Render one fragment per ``(pk, building_id)`` in ``groups`` through the
+    cache and return them in order.
+
+    ``load(pks)`` is only called for the fragments that missed and must return
+    a mapping of pk to the rows that fragment renders.
+    """
+    versions = get_versions("building", {building_id for _, building_id in groups})
+    keys = {
+        pk: FRAGMENT_KEY.format(
+            scope=scope, kind=kind, pk=pk, version=versions[building_id]
+        )
+        for pk, building_id in groups
+    }
+    cached = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in cached]
+    fragment_stats.record(len(keys) - len(missing), len(missing))
+
+    rendered = {}
+    if missing:
+        for pk, rows in load(missing).items():
+            rendered[keys[pk]] = render_to_string(template, {**context, "rows": rows})
+        cache.set_many(rendered, settings.DASHBOARD_FRAGMENT_TIMEOUT)
+    cached.update(rendered)
+    return [mark_safe(cached.get(keys[pk], "")) for pk, _ in groups]
@@ -0,0 +1,180 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    """Raised instead of queueing when the hashing pool is saturated."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins in progress, retry shortly."
+    default_code = "hashing_busy"
+
+    def __init__(self, wait):
+        super().__init__()
+        # DRF's exception handler turns ``wait`` into a Retry-After header.
+        self.wait = wait
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+
+
+def _timed(function, *args):
+    started = time.time()
+    start = time.perf_counter()
+    result = function(*args)
+    return result, started, time.perf_counter() - start
+
+
+def _check(password, encoded):
+    updates = []
+    valid = check_password(password, encoded, setter=updates.append)
+    return valid, bool(updates)
+
+
+def _make(password, algorithm):
+    return make_password(password, hasher=algorithm)
+
+
+class HashingPool:
+    """
+    Runs password hashing in a small process pool so CPU-bound PBKDF2 does
+    not occupy the request workers. At most ``workers + queue_limit`` jobs
+    are in flight; beyond that callers get ``HashingBusy`` immediately.
+    ``workers=0`` hashes inline. Every server process has its own pool, so
+    ``hashing_pool`` gets its share of HASHING_WORKERS.
+    """
+
+    def __init__(self, workers=2, queue_limit=32, timeout=30, retry_after=2):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.hash_seconds = 0.0
+        self.hash_max = 0.0
+        self.wait_seconds = 0.0
+        self.wait_max = 0.0
+
+    def stats(self):
+        completed = self.completed or 1
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_ms": {
+                "avg": round(self.hash_seconds / completed * 1000, 3),
+                "max": round(self.hash_max * 1000, 3),
+            },
+            "wait_ms": {
+                "avg": round(self.wait_seconds / completed * 1000, 3),
+                "max": round(self.wait_max * 1000, 3),
+            },
+        }
+
+    def check(self, password, encoded):
+        """Return ``(valid, must_update)`` for ``password`` against ``encoded``."""
+        return self._run(_check, password, encoded)
+
+    def make(self, password):
+        return self._run(_make, password, get_hasher().algorithm)
+
+    def _pool(self):
+        # Pools do not survive fork(), so pre-forked workers start their own.
+        if self._executor is None or self._pid != os.getpid():
+            # forkserver children start from a clean process instead of
+            # inheriting the request threads and open connections.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else None
+            )
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE),),
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, function, *args):
+        if not self.workers:
+            result, started, elapsed = _timed(function, *args)
+            self._record(0.0, elapsed)
+            return result
+
+        with self._lock:
+            if self.in_flight >= self.workers + self.queue_limit:
+                self.rejected += 1
+                raise HashingBusy(self.retry_after)
+            self.in_flight += 1
+            pool = self._pool()
+        submitted = time.time()
+        try:
+            future = pool.submit(_timed, function, *args)
+        except BrokenProcessPool:
+            self._release()
+            raise self._broken()
+        # A job keeps its slot until a process is done with it: one that timed
+        # out is still hashing and cannot be cancelled once started.
+        future.add_done_callback(self._release)
+        try:
+            result, started, elapsed = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashingBusy(self.retry_after)
+        except BrokenProcessPool:
+            raise self._broken()
+        self._record(max(0.0, started - submitted), elapsed)
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _broken(self):
+        with self._lock:
+            self._executor = None
+        return HashingBusy(self.retry_after)
+
+    def _record(self, wait, elapsed):
+        with self._lock:
+            self.completed += 1
+            self.hash_seconds += elapsed
+            self.hash_max = max(self.hash_max, elapsed)
+            self.wait_seconds += wait
+            self.wait_max = max(self.wait_max, wait)
+
+
+def process_share(total, processes):
+    """This process's part of ``total`` pool processes split across the host."""
+    if not total:
+        return 0
+    return max(1, total // max(1, processes))
+
+
+hashing_pool = HashingPool(
+    workers=process_share(
+        getattr(settings, "HASHING_WORKERS", 2), getattr(settings, "WEB_CONCURRENCY", 1)
+    ),
+    queue_limit=getattr(settings, "HASHING_QUEUE_LIMIT", 32),
+    timeout=getattr(settings, "HASHING_TIMEOUT", 30),
+    retry_after=getattr(settings, "HASHING_RETRY_AFTER", 2),
+)
@@ -0,0 +1,245 @@
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal
+
+from .models import Apartment, Building, Entrance, HierarchyRow, User
+
+_local = threading.local()
+
+# Sent after the read model of one or more buildings was refreshed, with the
+# ids of the managers/guards whose assignments changed in ``user_ids``.
+hierarchy_changed = Signal()
+
+
+def _assignments(rows):
+    return {
+        (row.building_id, row.entrance_id, row.manager_id, row.guard_id)
+        for row in rows
+    }
+
+
+def _assigned_users(assignments):
+    return {
+        user_id
+        for _, _, manager_id, guard_id in assignments
+        for user_id in (manager_id, guard_id)
+        if user_id is not None
+    }
+
+
+def _row(building, entrance=None, apartment_numbers=()):
+    manager = building.manager
+    guard = entrance.guard if entrance else None
+    return HierarchyRow(
+        building_id=building.id,
+        building_number=building.number,
+        manager_id=manager.id if manager else None,
+        manager_username=manager.username if manager else "",
+        entrance_id=entrance.id if entrance else None,
+        entrance_number=entrance.number if entrance else None,
+        guard_id=guard.id if guard else None,
+        guard_username=guard.username if guard else "",
+        apartment_numbers=list(apartment_numbers),
+    )
+
+
+def refresh_building(building_id):
+    """
+    Rebuild the rows of one building and return the ids of the users whose
+    manager/guard assignments changed.
+    """
+    building = Building.objects.select_related("manager").filter(id=building_id).first()
+    with transaction.atomic():
+        entrances = []
+        if building is not None:
+            entrances = list(building.entrances.select_related("guard"))
+        old_rows = HierarchyRow.objects.filter(
+            Q(building_id=building_id) | Q(entrance_id__in=[e.id for e in entrances])
+        )
+        before = _assignments(
+            old_rows.only("building_id", "entrance_id", "manager_id", "guard_id")
+        )
+        old_rows.delete()
+        if building is None:
+            return _assigned_users(before)
+        numbers = defaultdict(list)
+        apartments = Apartment.objects.filter(entrance__building_id=building_id)
+        for entrance_id, number in apartments.order_by("number").values_list(
+            "entrance_id", "number"
+        ):
+            numbers[entrance_id].append(number)
+        rows = [_row(building, e, numbers[e.id]) for e in entrances] or [
+            _row(building)
+        ]
+        HierarchyRow.objects.bulk_create(rows)
+    return _assigned_users(before ^ _assignments(rows))
+
+
+def refresh_entrance(entrance_id):
+    numbers = Apartment.objects.filter(entrance_id=entrance_id).order_by("number")
+    HierarchyRow.objects.filter(entrance_id=entrance_id).update(
+        apartment_numbers=list(numbers.values_list("number", flat=True))
+    )
+
+
+def rebuild_all(batch_size=1000):
+    """Recreate every row from scratch, streaming the source tables."""
+    with transaction.atomic():
+        HierarchyRow.objects.all().delete()
+        numbers = defaultdict(list)
+        apartments = Apartment.objects.order_by("entrance_id", "number")
+        for entrance_id, number in apartments.values_list(
+            "entrance_id", "number"
+        ).iterator(chunk_size=batch_size):
+            numbers[entrance_id].append(number)
+
+        rows = []
+        entrances = Entrance.objects.select_related("building__manager", "guard")
+        for entrance in entrances.iterator(chunk_size=batch_size):
+            rows.append(_row(entrance.building, entrance, numbers.pop(entrance.id, ())))
+        empty = Building.objects.filter(entrances__isnull=True).select_related("manager")
+        for building in empty.iterator(chunk_size=batch_size):
+            rows.append(_row(building))
+        HierarchyRow.objects.bulk_create(rows, batch_size=batch_size)
+    hierarchy_changed.send(
+        sender=HierarchyRow,
+        building_ids={row.building_id for row in rows},
+        user_ids=_assigned_users(_assignments(rows)),
+    )
+    return len(rows)
+
+
+def remove_rows(building_id, entrance_id=None):
+    """
+    Drop the rows of a building deleted in bulk, or of one of its entrances,
+    keeping an empty row for a building left without entrances, and send
+    hierarchy_changed after commit. Unlike refresh_building this reads no
+    apartments, so it costs the same for any building size.
+    """
+    rows = HierarchyRow.objects.filter(building_id=building_id)
+    if entrance_id is not None:
+        rows = rows.filter(entrance_id=entrance_id)
+    before = _assignments(
+        rows.only("building_id", "entrance_id", "manager_id", "guard_id")
+    )
+    rows.delete()
+    remaining = HierarchyRow.objects.filter(building_id=building_id)
+    if entrance_id is not None and not remaining.exists():
+        building = (
+            Building.objects.select_related("manager").filter(id=building_id).first()
+        )
+        if building is not None:
+            _row(building).save()
+    transaction.on_commit(
+        lambda: hierarchy_changed.send(
+            sender=HierarchyRow,
+            building_ids={building_id},
+            user_ids=_assigned_users(before),
+        )
+    )
+
+
+def _flush_pending():
+    pending = getattr(_local, "pending", set())
+    _local.pending = set()
+    building_ids = {pk for kind, pk in pending if kind == "building"}
+    entrance_ids = {pk for kind, pk in pending if kind == "entrance"}
+    user_ids = set()
+    for building_id in building_ids:
+        user_ids |= refresh_building(building_id)
+    for entrance_id in entrance_ids:
+        refresh_entrance(entrance_id)
+    if entrance_ids:
+        building_ids.update(
+            HierarchyRow.objects.filter(entrance_id__in=entrance_ids).values_list(
+                "building_id", flat=True
+            )
+        )
+    if building_ids:
+        hierarchy_changed.send(
+            sender=HierarchyRow, building_ids=building_ids, user_ids=user_ids
+        )
+
+
+def _schedule(kind, pk):
+    # Refreshes run once per object after the transaction commits, so cascades
+    # and bulk edits do not rebuild the same building over and over.
+    if pk is None:
+        return
+    if not hasattr(_local, "pending"):
+        _local.pending = set()
+    _local.pending.add((kind, pk))
+    transaction.on_commit(_flush_pending)
+
+
+def schedule_building_refresh(building_ids):
+    """Refresh buildings written through paths that bypass model signals."""
+    for building_id in building_ids:
+        _schedule("building", building_id)
+
+
+def _remember_parent(sender, instance, raw=False, **kwargs):
+    instance._hierarchy_parent_id = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    parent = "building_id" if sender is Entrance else "entrance_id"
+    instance._hierarchy_parent_id = (
+        sender.objects.filter(pk=instance.pk).values_list(parent, flat=True).first()
+    )
+
+
+def _building_changed(sender, instance, **kwargs):
+    _schedule("building", instance.id)
+
+
+def _entrance_changed(sender, instance, **kwargs):
+    _schedule("building", instance.building_id)
+    _schedule("building", getattr(instance, "_hierarchy_parent_id", None))
+
+
+def _apartment_changed(sender, instance, **kwargs):
+    _schedule("entrance", instance.entrance_id)
+    _schedule("entrance", getattr(instance, "_hierarchy_parent_id", None))
+
+
+def _user_rows_changed(user_id, **changes):
+    rows = HierarchyRow.objects.filter(Q(manager_id=user_id) | Q(guard_id=user_id))
+    building_ids = set(rows.values_list("building_id", flat=True))
+    if not building_ids:
+        return
+    HierarchyRow.objects.filter(manager_id=user_id).update(
+        **{f"manager_{field}": value for field, value in changes.items()}
+    )
+    HierarchyRow.objects.filter(guard_id=user_id).update(
+        **{f"guard_{field}": value for field, value in changes.items()}
+    )
+    hierarchy_changed.send(
+        sender=HierarchyRow, building_ids=building_ids, user_ids={user_id}
+    )
+
+
+def _user_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and "username" not in update_fields):
+        return
+    _user_rows_changed(instance.id, username=instance.username)
+
+
+def _user_deleted(sender, instance, **kwargs):
+    _user_rows_changed(instance.id, id=None, username="")
+
+
+def connect_signals():
+    pre_save.connect(_remember_parent, sender=Entrance)
+    pre_save.connect(_remember_parent, sender=Apartment)
+    post_save.connect(_building_changed, sender=Building)
+    post_delete.connect(_building_changed, sender=Building)
+    post_save.connect(_entrance_changed, sender=Entrance)
+    post_delete.connect(_entrance_changed, sender=Entrance)
+    post_save.connect(_apartment_changed, sender=Apartment)
+    post_delete.connect(_apartment_changed, sender=Apartment)
+    post_save.connect(_user_saved, sender=User)
+    post_delete.connect(_user_deleted, sender=User)
@@ -0,0 +1,296 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+
+from .conditional import bump_tables
+from .hierarchy import schedule_building_refresh
+from .models import Apartment, Building, Entrance, User
+from .writes import is_unique_violation, upsert
+
+COLUMNS = ("building", "manager", "entrance", "guard", "apartment")
+FORMATS = ("csv", "jsonl")
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    buildings: int = 0
+    entrances: int = 0
+    apartments: int = 0
+    updated_buildings: int = 0
+    updated_entrances: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+
+    def summary(self):
+        return (
+            f"Imported {self.rows} rows: {self.buildings} buildings, "
+            f"{self.entrances} entrances, {self.apartments} apartments created, "
+            f"{self.updated_buildings} buildings, {self.updated_entrances} entrances "
+            f"updated, {self.error_count} errors"
+        )
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": {
+                "buildings": self.buildings,
+                "entrances": self.entrances,
+                "apartments": self.apartments,
+            },
+            "updated": {
+                "buildings": self.updated_buildings,
+                "entrances": self.updated_entrances,
+            },
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def detect_format(name, default="csv"):
+    name = (name or "").lower()
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+class Lines:
+    """
+    Iterates the text lines of a binary or text stream and counts them in
+    ``line``. Binary lines are decoded one at a time, so a decoding error
+    is raised on the line it is on.
+    """
+
+    def __init__(self, stream):
+        self.stream = iter(stream)
+        self.line = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        text = next(self.stream)
+        self.line += 1
+        if isinstance(text, bytes):
+            text = text.decode("utf-8-sig" if self.line == 1 else "utf-8")
+        return text
+
+
+def read_rows(stream, fmt):
+    """
+    Yield ``(line, row)`` pairs from a binary or text stream. A line that
+    cannot be decoded or parsed as CSV ends the file: it is yielded with a
+    ``ValueError`` as its row and nothing after it is read.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown import format {fmt!r}, expected one of {FORMATS}")
+    lines = Lines(stream)
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(lines)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for text in lines:
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as exc:
+                row = exc
+            yield lines.line, row
+        return
+    except UnicodeDecodeError as exc:
+        error = f"not valid UTF-8 ({exc.reason} at byte {exc.start})"
+    except csv.Error as exc:
+        error = f"malformed CSV ({exc})"
+    yield lines.line, ValueError(f"{error}, the rest of the file was skipped")
+
+
+class EstateImporter:
+    """
+    Loads buildings, entrances and apartments from ``building, manager,
+    entrance, guard, apartment`` rows. Missing buildings and entrances are
+    created on first use, apartments are created for every row that names
+    one. Invalid rows are reported and skipped; the rest of the batch is
+    still written.
+    """
+
+    def __init__(self, chunk_size=5000, max_errors=1000):
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.result = ImportResult()
+        self._buildings = dict(Building.objects.values_list("number", "id"))
+        self._entrances = {}
+        self._loaded_entrances = set()
+        self._users = {
+            (role, username): pk
+            for username, role, pk in User.objects.filter(
+                role__in=[User.MANAGER, User.GUARD]
+            ).values_list("username", "role", "id")
+        }
+        self._touched = set()
+
+    def run(self, rows):
+        with transaction.atomic():
+            rows = iter(rows)
+            while chunk := list(islice(rows, self.chunk_size)):
+                self._import_chunk(chunk)
+            schedule_building_refresh(self._touched)
+            bump_tables(Building, Entrance, Apartment)
+        return self.result
+
+    def _error(self, line, message):
+        self.result.error_count += 1
+        if len(self.result.errors) < self.max_errors:
+            self.result.errors.append({"line": line, "error": message})
+
+    def _number(self, row, column, required=True):
+        value = row.get(column)
+        if value in (None, ""):
+            if required:
+                raise ValueError(f"{column} is required")
+            return None
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{column} must be a number, got {value!r}")
+        if number < 1:
+            raise ValueError(f"{column} must be greater than 0")
+        return number
+
+    def _user(self, row, column, role):
+        username = row.get(column)
+        if username in (None, ""):
+            return None
+        if not isinstance(username, str):
+            raise ValueError(f"{column} must be a username, got {username!r}")
+        try:
+            return self._users[role, username]
+        except KeyError:
+            raise ValueError(f"{column} {username!r} does not exist")
+
+    def _parse(self, line, row):
+        if not isinstance(row, dict):
+            raise ValueError(f"invalid row: {row}")
+        return (
+            self._number(row, "building"),
+            self._user(row, "manager", User.MANAGER),
+            self._number(row, "entrance", required=False),
+            self._user(row, "guard", User.GUARD),
+            self._number(row, "apartment", required=False),
+        )
+
+    def _import_chunk(self, chunk):
+        parsed = []
+        for line, row in chunk:
+            self.result.rows += 1
+            try:
+                building, manager, entrance, guard, apartment = self._parse(line, row)
+                if apartment is not None and entrance is None:
+                    raise ValueError("apartment requires an entrance")
+            except ValueError as exc:
+                self._error(line, str(exc))
+                continue
+            parsed.append((line, building, manager, entrance, guard, apartment))
+
+        new_buildings = {}
+        for line, building, manager, *_ in parsed:
+            if building not in self._buildings and building not in new_buildings:
+                new_buildings[building] = Building(number=building, manager_id=manager)
+        # Rows added by someone else since the import started are updated by
+        # the upsert rather than created, so they are counted apart.
+        updated = Building.objects.filter(number__in=new_buildings).count()
+        created = upsert(Building, new_buildings.values(), ["number"], ["manager"])
+        self._buildings.update((b.number, b.id) for b in created)
+        self.result.buildings += len(created) - updated
+        self.result.updated_buildings += updated
+
+        building_ids = {self._buildings[p[1]] for p in parsed}
+        self._touched |= building_ids
+        self._load_entrances(building_ids - self._loaded_entrances)
+
+        new_entrances = {}
+        for line, building, manager, entrance, guard, apartment in parsed:
+            key = (self._buildings[building], entrance)
+            if entrance is None or key in self._entrances or key in new_entrances:
+                continue
+            new_entrances[key] = Entrance(
+                building_id=key[0], number=entrance, guard_id=guard
+            )
+        updated = len(
+            new_entrances.keys()
+            & set(
+                Entrance.objects.filter(
+                    building_id__in={building_id for building_id, _ in new_entrances}
+                ).values_list("building_id", "number")
+            )
+        )
+        created = upsert(
+            Entrance, new_entrances.values(), ["building", "number"], ["guard"]
+        )
+        self._entrances.update(((e.building_id, e.number), e.id) for e in created)
+        self.result.entrances += len(created) - updated
+        self.result.updated_entrances += updated
+
+        wanted = []
+        for line, building, manager, entrance, guard, apartment in parsed:
+            if apartment is not None:
+                entrance_id = self._entrances[self._buildings[building], entrance]
+                wanted.append((line, entrance_id, apartment))
+        in_entrances = Apartment.objects.filter(
+            entrance_id__in={entrance_id for _, entrance_id, _ in wanted}
+        )
+        existing = set(in_entrances.values_list("entrance_id", "number"))
+        new_apartments = []
+        for line, entrance_id, apartment in wanted:
+            if (entrance_id, apartment) in existing:
+                self._error(line, f"apartment {apartment} already exists")
+                continue
+            existing.add((entrance_id, apartment))
+            new_apartments.append(
+                (line, Apartment(entrance_id=entrance_id, number=apartment))
+            )
+        while new_apartments:
+            try:
+                with transaction.atomic():
+                    Apartment.objects.bulk_create(
+                        [apartment for _, apartment in new_apartments],
+                        batch_size=self.chunk_size,
+                    )
+            except IntegrityError as exc:
+                if not is_unique_violation(exc):
+                    raise
+                # Someone else added some of these meanwhile: report those and
+                # insert the rest, so the count matches the rows written.
+                existing = set(in_entrances.values_list("entrance_id", "number"))
+                remaining = []
+                for line, apartment in new_apartments:
+                    number = apartment.number
+                    if (apartment.entrance_id, number) in existing:
+                        self._error(line, f"apartment {number} already exists")
+                    else:
+                        remaining.append((line, apartment))
+                if len(remaining) == len(new_apartments):
+                    raise
+                new_apartments = remaining
+            else:
+                self.result.apartments += len(new_apartments)
+                break
+
+    def _load_entrances(self, building_ids):
+        if not building_ids:
+            return
+        entrances = Entrance.objects.filter(building_id__in=building_ids)
+        self._entrances.update(
+            ((building_id, number), pk)
+            for building_id, number, pk in entrances.values_list(
+                "building_id", "number", "id"
+            )
+        )
+        self._loaded_entrances |= building_ids
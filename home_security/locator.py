@@ -0,0 +1,82 @@
+from django.db.models import Q
+
+from .models import Apartment
+
+# Largest value a PositiveIntegerField holds on every supported backend.
+MAX_NUMBER = 2147483647
+
+# Result key to the lookup it is read from; one query joins them all.
+FIELDS = {
+    "id": "id",
+    "number": "number",
+    "entrance_id": "entrance_id",
+    "entrance": "entrance__number",
+    "building_id": "entrance__building_id",
+    "building": "entrance__building__number",
+    "guard": "entrance__guard__username",
+    "manager": "entrance__building__manager__username",
+}
+
+
+def parse_query(query):
+    """
+    Return ``(building, entrance, number)`` for ``"145"`` (any apartment whose
+    number starts with 145) or ``"3/2/145"`` (apartment 145 of entrance 2 of
+    building 3, an exact match). Raises ValueError for anything else.
+    """
+    parts = [part.strip() for part in query.strip().strip("/").split("/")]
+    if len(parts) not in (1, 3) or not all(
+        part.isascii() and part.isdigit() and part[0] != "0" for part in parts
+    ):
+        raise ValueError(
+            "Enter an apartment number or a building/entrance/apartment address."
+        )
+    numbers = [int(part) for part in parts]
+    if len(numbers) == 1:
+        return None, None, numbers[0]
+    return tuple(numbers)
+
+
+def prefix_ranges(prefix, maximum=MAX_NUMBER):
+    """
+    Return the inclusive ranges of integers whose decimal form starts with
+    ``prefix``: 14 gives (14, 14), (140, 149), (1400, 1499), ...
+
+    Each range is an index range scan on ``number``, unlike a LIKE on the
+    number cast to text. The ranges are ascending, so ordering by number
+    puts the exact match first.
+    """
+    ranges = []
+    low = high = prefix
+    while low <= maximum:
+        ranges.append((low, min(high, maximum)))
+        low, high = low * 10, high * 10 + 9
+    return ranges
+
+
+def locate(query, limit):
+    """
+    Return up to ``limit`` apartments matching ``query`` (see ``parse_query``)
+    as dicts with the keys of ``FIELDS``, in number order, using one query.
+    """
+    building, entrance, number = parse_query(query)
+    if building is not None:
+        apartments = Apartment.objects.filter(
+            entrance__building__number=building,
+            entrance__number=entrance,
+            number=number,
+        )
+    else:
+        ranges = prefix_ranges(number)
+        if not ranges:
+            return []
+        match = Q()
+        for low, high in ranges:
+            match |= Q(number__range=(low, high))
+        # The outer bounds let the planner use them as the index condition and
+        # the individual ranges as a filter while it walks the index in order.
+        apartments = Apartment.objects.filter(
+            match, number__gte=ranges[0][0], number__lte=ranges[-1][1]
+        )
+    rows = apartments.order_by("number", "id").values_list(*FIELDS.values())
+    return [dict(zip(FIELDS, row)) for row in rows[:limit]]
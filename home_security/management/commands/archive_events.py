@@ -0,0 +1,43 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from home_security.events import log_event
+from home_security.partitions import archive_month, ensure_partitions, expired_months
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates upcoming monthly event partitions and moves months older than "
+        "the retention period to gzipped JSONL archive files"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention",
+            type=int,
+            default=settings.EVENT_RETENTION_MONTHS,
+            help="Number of months, besides the current one, kept in the database",
+        )
+        parser.add_argument(
+            "--ahead", type=int, default=settings.EVENT_PARTITION_MONTHS_AHEAD
+        )
+        parser.add_argument("--directory", default=settings.EVENT_ARCHIVE_DIR)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        now = timezone.now()
+        months = expired_months(now, options["retention"])
+        if options["dry_run"]:
+            for month in months:
+                self.stdout.write(f"Would archive {month:%Y-%m}")
+            return
+
+        for month in ensure_partitions(now, options["ahead"]):
+            self.stdout.write(f"Created partition for {month:%Y-%m}")
+        for month in months:
+            path = archive_month(month, options["directory"])
+            log_event(None, "Archived Events", f"Events of {month:%Y-%m} moved to {path}")
+            self.stdout.write(self.style.SUCCESS(f"Archived {month:%Y-%m} to {path}"))
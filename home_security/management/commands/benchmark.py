@@ -0,0 +1,94 @@
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from home_security.benchmarks.data import generate_estate
+from home_security.benchmarks.runner import (
+    compare_session_modes,
+    load_budgets,
+    run_benchmarks,
+    save_budgets,
+)
+
+from .generate_estate import add_estate_arguments, estate_options
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every view and API route against a synthetic estate in a "
+        "throwaway test database and fails when a view exceeds its query budget"
+    )
+
+    def add_arguments(self, parser):
+        add_estate_arguments(parser)
+        parser.add_argument("--iterations", type=int, default=5)
+        parser.add_argument("--only", nargs="*", help="Run scenarios whose name contains any of these")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+        parser.add_argument(
+            "--update-budgets",
+            action="store_true",
+            help="Record the measured query counts as the new budgets",
+        )
+        parser.add_argument(
+            "--compare-sessions",
+            action="store_true",
+            help="Report the query count of each scenario per session mode instead",
+        )
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        setup_test_environment()
+        databases = setup_databases(
+            verbosity=0, interactive=False, keepdb=options["keepdb"]
+        )
+        try:
+            estate = generate_estate(**estate_options(options))
+            budgets = load_budgets()
+            if options["compare_sessions"]:
+                report = compare_session_modes(
+                    estate, iterations=options["iterations"], only=options["only"]
+                )
+            else:
+                report = run_benchmarks(
+                    estate,
+                    iterations=options["iterations"],
+                    only=options["only"],
+                    budgets=budgets,
+                )
+        finally:
+            teardown_databases(databases, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+        if options["compare_sessions"]:
+            return
+
+        if options["update_budgets"]:
+            budgets.update({r["name"]: r["queries"] for r in report["scenarios"]})
+            save_budgets(budgets)
+            self.stderr.write(self.style.SUCCESS("Query budgets updated"))
+            return
+
+        over = [r for r in report["scenarios"] if r["over_budget"]]
+        if over:
+            raise CommandError(
+                "Query budget exceeded: "
+                + ", ".join(f"{r['name']} ({r['queries']} > {r['budget']})" for r in over)
+            )
+        if report["uncovered_urls"]:
+            raise CommandError(
+                "No benchmark scenario for: " + ", ".join(report["uncovered_urls"])
+            )
@@ -0,0 +1,60 @@
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from home_security.benchmarks.concurrency import run_concurrency
+from home_security.benchmarks.data import generate_estate
+from home_security.models import Building
+
+from .generate_estate import add_estate_arguments, estate_options
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares throughput and p99 latency of the sync and async REST read "
+        "endpoints under concurrent clients through the ASGI application"
+    )
+
+    def add_arguments(self, parser):
+        add_estate_arguments(parser)
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[100, 1000]
+        )
+        parser.add_argument(
+            "--requests", type=int, default=2000, help="Requests per endpoint and mode"
+        )
+        parser.add_argument("--only", nargs="*", help="Run endpoints whose name contains any of these")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        setup_test_environment()
+        databases = setup_databases(
+            verbosity=0, interactive=False, keepdb=options["keepdb"]
+        )
+        try:
+            estate = generate_estate(**estate_options(options))
+            report = run_concurrency(
+                estate,
+                Building.objects.order_by("number").values_list("id", flat=True).first(),
+                levels=options["concurrency"],
+                requests=options["requests"],
+                only=options["only"],
+            )
+        finally:
+            teardown_databases(databases, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output + "\n")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,40 @@
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home_security.benchmarks.startup import run_startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the time from launching the development server or the "
+        "production gunicorn server to its first served request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", nargs="*", choices=["runserver", "gunicorn"])
+        parser.add_argument("--runs", type=int, default=3)
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument("--timeout", type=int, default=60)
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        try:
+            report = run_startup(
+                modes=options["modes"],
+                runs=options["runs"],
+                port=options["port"],
+                workers=options["workers"],
+                timeout=options["timeout"],
+            )
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output + "\n")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,30 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from home_security.startup import ensure_migrated
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs migrate only when migration files are missing from the "
+        "django_migrations table, checked with one query"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        start = time.perf_counter()
+        pending = ensure_migrated(options["database"], options["verbosity"])
+        elapsed = (time.perf_counter() - start) * 1000
+        if pending:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Applied {len(pending)} pending migrations in {elapsed:.0f} ms"
+                )
+            )
+        else:
+            self.stdout.write(f"Schema is up to date (checked in {elapsed:.0f} ms)")
@@ -0,0 +1,52 @@
+import sys
+from contextlib import nullcontext
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home_security.exporter import FORMATS, encode_rows
+from home_security.forms import EventExportForm
+
+
+class Command(BaseCommand):
+    help = "Streams the event log to CSV or JSONL, optionally gzip-compressed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file, or - to write to stdout")
+        parser.add_argument("--format", choices=FORMATS, default=FORMATS[0])
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--user", help="Only events by this username")
+        parser.add_argument("--action", help="Only events with this action")
+        parser.add_argument("--since", help="Only events at or after this time")
+        parser.add_argument("--until", help="Only events before this time")
+        parser.add_argument(
+            "--archived", action="store_true", help="Read from the archive files"
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        form = EventExportForm(
+            {
+                name: options[name]
+                for name in ("user", "action", "since", "until", "format", "archived")
+                if options[name]
+            }
+        )
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        rows = form.rows(options["chunk_size"])
+        path = options["path"]
+        try:
+            # stdout is not ours to close, only files opened here are.
+            output = nullcontext(sys.stdout.buffer) if path == "-" else open(path, "wb")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        written = 0
+        with output as stream:
+            for chunk in encode_rows(rows, options["format"], options["gzip"]):
+                stream.write(chunk)
+                written += len(chunk)
+        if path != "-":
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {path}"))
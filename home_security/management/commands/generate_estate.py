@@ -0,0 +1,37 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from home_security.benchmarks.data import SIZES, generate_estate
+
+
+def add_estate_arguments(parser):
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--buildings", type=int)
+    parser.add_argument("--entrances", type=int, help="Entrances per building")
+    parser.add_argument("--apartments", type=int, help="Apartments per entrance")
+    parser.add_argument("--events", type=int)
+
+
+def estate_options(options):
+    return {
+        key: options[key] if options[key] is not None else default
+        for key, default in SIZES[options["size"]].items()
+    }
+
+
+class Command(BaseCommand):
+    help = "Fills the database with a synthetic estate and event history"
+
+    def add_arguments(self, parser):
+        add_estate_arguments(parser)
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        estate = generate_estate(**estate_options(options))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {estate.buildings} buildings, {estate.entrances} entrances, "
+                f"{estate.apartments} apartments and {estate.events} events "
+                f"(admin {estate.admin}, manager {estate.manager}, guard {estate.guard})"
+            )
+        )
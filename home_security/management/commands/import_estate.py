@@ -0,0 +1,37 @@
+import sys
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home_security.events import log_event
+from home_security.importer import FORMATS, EstateImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports buildings, entrances and apartments from CSV or JSONL rows with "
+        "building, manager, entrance, guard and apartment columns"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - to read from stdin")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        path = options["path"]
+        fmt = options["format"] or detect_format(path)
+        try:
+            stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        with stream:
+            importer = EstateImporter(chunk_size=options["chunk_size"])
+            result = importer.run(read_rows(stream, fmt))
+
+        log_event(None, "Imported Estate", result.summary())
+        for error in result.errors:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(result.summary()))
+
@@ -0,0 +1,13 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from home_security.hierarchy import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the denormalized building/entrance hierarchy used by the dashboard"
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        rows = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} hierarchy rows"))
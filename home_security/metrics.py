@@ -0,0 +1,313 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+# The recorder of the request being served. Context variables follow the
+# request into sync_to_async threads, where async views run their queries.
+_current = ContextVar("request_recorder", default=None)
+
+
+class Recorder:
+    """Query and template timings of one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.duplicates = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self._statements = {}
+
+    def query(self, sql, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        # Same SQL with different parameters is the N+1 signature.
+        seen = self._statements.get(sql, 0)
+        self._statements[sql] = seen + 1
+        if seen:
+            self.duplicates += 1
+
+    def max_repeats(self):
+        return max(self._statements.values(), default=0)
+
+
+def start_request():
+    recorder = Recorder()
+    return recorder, _current.set(recorder)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _current.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.query(sql, time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    # Fires on every (re)connect of the same wrapper; install once.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        recorder = _current.get()
+        if recorder is None:
+            return self._template.render(context, request)
+        # Templates rendered from inside another render are already timed.
+        recorder.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            recorder.template_depth -= 1
+            if not recorder.template_depth:
+                recorder.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend that adds render time to the request metrics."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield _number(bound), cumulative
+        yield "+Inf", cumulative + self.counts[-1]
+
+
+HISTOGRAMS = {
+    "request_duration_seconds": ("Request latency.", SECONDS_BUCKETS),
+    "request_db_queries": ("Database queries per request.", COUNT_BUCKETS),
+    "request_db_seconds": ("Time spent in database queries.", SECONDS_BUCKETS),
+    "request_duplicate_queries": (
+        "Queries per request that repeat an earlier statement.",
+        COUNT_BUCKETS,
+    ),
+    "request_template_seconds": ("Time spent rendering templates.", SECONDS_BUCKETS),
+}
+
+
+# Type and help of the component stats ``render`` exports, by group and stat
+# (nested keys joined with "_", database aliases left out). Monotonic totals
+# are counters and get a "_total" suffix; anything unlisted is a gauge.
+COMPONENT_STATS = {
+    "event_buffer": {
+        "queue_depth": ("gauge", "Events waiting in the background queue."),
+        "dropped": ("counter", "Events dropped on a full queue or a failed write."),
+        "written": ("counter", "Events written to the database."),
+        "flushes": ("counter", "Buffered event batches written."),
+    },
+    "dashboard_fragments": {
+        "hits": ("counter", "Dashboard fragments served from the cache."),
+        "misses": ("counter", "Dashboard fragments rendered on a cache miss."),
+        "hit_ratio": ("gauge", "Share of dashboard fragments served from the cache."),
+    },
+    "streams": {
+        "subscribers": ("gauge", "Open event stream connections."),
+        "published": ("counter", "Events published to the event streams."),
+        "dropped": ("counter", "Stream messages dropped for slow subscribers."),
+    },
+    "password_hashing": {
+        "workers": ("gauge", "Processes of the password hashing pool."),
+        "queue_limit": ("gauge", "Hashing jobs allowed to wait for a process."),
+        "in_flight": ("gauge", "Hashing jobs running or waiting."),
+        "completed": ("counter", "Hashing jobs completed."),
+        "rejected": ("counter", "Hashing jobs rejected because the pool was full."),
+        "hash_ms_avg": ("gauge", "Average milliseconds spent hashing."),
+        "hash_ms_max": ("gauge", "Longest hash in milliseconds."),
+        "wait_ms_avg": ("gauge", "Average milliseconds hashing jobs waited."),
+        "wait_ms_max": ("gauge", "Longest wait of a hashing job in milliseconds."),
+    },
+    "db_pool": {
+        "min_size": ("gauge", "Connections the pool keeps open."),
+        "max_size": ("gauge", "Connections the pool may open."),
+        "size": ("gauge", "Open connections."),
+        "in_use": ("gauge", "Connections checked out."),
+        "idle": ("gauge", "Idle connections."),
+        "checkouts": ("counter", "Connections handed out."),
+        "timeouts": ("counter", "Checkouts that timed out waiting for a connection."),
+        "opened": ("counter", "Connections opened."),
+        "closed": ("counter", "Connections closed."),
+        "check_failures": ("counter", "Idle connections that failed their check."),
+        "wait_ms_avg": ("gauge", "Average milliseconds waited for a connection."),
+        "wait_ms_max": ("gauge", "Longest wait for a connection in milliseconds."),
+    },
+    "db_routing": {
+        "replica_reads": ("counter", "Reads sent to a replica."),
+        "primary_reads": ("counter", "Reads sent to the primary."),
+        "pinned_requests": ("counter", "Safe requests pinned to the primary."),
+    },
+}
+
+
+class RequestMetrics:
+    """
+    Per-view histograms of latency, query count, database time, duplicate
+    queries and template time, rendered in the Prometheus text format.
+    Views are labelled by URL name, so the label set stays bounded.
+    """
+
+    def __init__(self, prefix="home_security", n_plus_one_threshold=5):
+        self.prefix = prefix
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in HISTOGRAMS}
+        self._requests = {}
+        self._n_plus_one = {}
+
+    def observe(self, view, method, status, seconds, recorder):
+        labels = (view, method)
+        values = {
+            "request_duration_seconds": seconds,
+            "request_db_queries": recorder.queries,
+            "request_db_seconds": recorder.db_seconds,
+            "request_duplicate_queries": recorder.duplicates,
+            "request_template_seconds": recorder.template_seconds,
+        }
+        suspect = recorder.max_repeats() >= self.n_plus_one_threshold
+        with self._lock:
+            for name, value in values.items():
+                series = self._histograms[name]
+                if labels not in series:
+                    series[labels] = Histogram(HISTOGRAMS[name][1])
+                series[labels].observe(value)
+            key = (view, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if suspect:
+                self._n_plus_one[labels] = self._n_plus_one.get(labels, 0) + 1
+
+    def render(self, stats=None):
+        """
+        Return every metric in the Prometheus text exposition format, followed
+        by ``stats``, a mapping of group name to a (nested) stats dict typed
+        by ``COMPONENT_STATS``.
+        """
+        lines = []
+        with self._lock:
+            self._counter(
+                lines,
+                "requests_total",
+                "Requests served.",
+                ("view", "method", "status"),
+                self._requests,
+            )
+            self._counter(
+                lines,
+                "n_plus_one_requests_total",
+                "Requests that ran one statement at least "
+                f"{self.n_plus_one_threshold} times.",
+                ("view", "method"),
+                self._n_plus_one,
+            )
+            for name, (help_text, _) in HISTOGRAMS.items():
+                self._histogram(lines, name, help_text, self._histograms[name])
+        for group, group_stats in (stats or {}).items():
+            known = COMPONENT_STATS.get(group, {})
+            for name, value in _flatten(group_stats):
+                kind, help_text = _component_stat(known, name, group)
+                metric = f"{self.prefix}_{group}_{name}"
+                if kind == "counter":
+                    metric += "_total"
+                lines += [
+                    f"# HELP {metric} {help_text}",
+                    f"# TYPE {metric} {kind}",
+                    f"{metric} {_number(value)}",
+                ]
+        return "\n".join(lines) + "\n"
+
+    def _histogram(self, lines, name, help_text, series):
+        metric = f"{self.prefix}_{name}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+        for label_values, histogram in sorted(series.items()):
+            labels = _labels(("view", "method"), label_values)
+            for bound, count in histogram.samples():
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum{{{labels}}} {_number(histogram.sum)}")
+            lines.append(f"{metric}_count{{{labels}}} {sum(histogram.counts)}")
+
+    def _counter(self, lines, name, help_text, label_names, values):
+        metric = f"{self.prefix}_{name}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for label_values, count in sorted(values.items()):
+            lines.append(f"{metric}{{{_labels(label_names, label_values)}}} {count}")
+
+
+def _labels(names, values):
+    return ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _component_stat(known, name, group):
+    # db_pool names start with the database alias: "default_wait_ms_avg".
+    matches = [key for key in known if name == key or name.endswith(f"_{key}")]
+    if not matches:
+        return "gauge", f"{group} {name}."
+    return known[max(matches, key=len)]
+
+
+def _flatten(stats, prefix=""):
+    # Nested stats dicts become underscore-joined metric names; only numbers
+    # are exported.
+    for key, value in stats.items():
+        name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}{key}")
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}_")
+        elif isinstance(value, (bool, int, float)):
+            yield name, int(value) if isinstance(value, bool) else value
+
+
+request_metrics = RequestMetrics(
+    n_plus_one_threshold=getattr(settings, "METRICS_N_PLUS_ONE_THRESHOLD", 5)
+)
@@ -0,0 +1,223 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .db.router import end_request as end_routing
+from .db.router import pin
+from .db.router import start_request as start_routing
+from .events import COMMIT, event_buffer
+from .hashing import HashingBusy
+from .metrics import end_request, request_metrics, start_request
+from .profiling import (
+    end_capture,
+    may_profile,
+    save_profile,
+    start_capture,
+    wants_profile,
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, query count and time, duplicate queries and template
+    time of every request under its URL name. Should be first in MIDDLEWARE
+    so the other middleware's queries are counted too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder, token = start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        self._observe(request, response, recorder, start)
+        return response
+
+    async def __acall__(self, request):
+        recorder, token = start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        self._observe(request, response, recorder, start)
+        return response
+
+    def _observe(self, request, response, recorder, start):
+        match = request.resolver_match
+        request_metrics.observe(
+            match.view_name if match else "unmatched",
+            request.method,
+            response.status_code,
+            time.perf_counter() - start,
+            recorder,
+        )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets ``db.router.ReplicaRouter`` send the reads of safe requests to a
+    replica and pins clients that wrote to the primary. Must come before
+    SessionMiddleware and AuthenticationMiddleware, which read the session
+    and the user.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        routing, token = start_routing(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            end_routing(token)
+        if routing.wrote:
+            pin(response)
+        return response
+
+    async def __acall__(self, request):
+        routing, token = start_routing(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_routing(token)
+        if routing.wrote:
+            pin(response)
+        return response
+
+
+class EventFlushMiddleware:
+    """
+    Gives every request its own ``commit`` mode event buffer and writes what
+    is left in it once the response is ready.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if event_buffer.mode != COMMIT:
+            return self.get_response(request)
+        token = event_buffer.start_request()
+        try:
+            return self.get_response(request)
+        finally:
+            event_buffer.write(event_buffer.end_request(token))
+
+    async def __acall__(self, request):
+        if event_buffer.mode != COMMIT:
+            return await self.get_response(request)
+        token = event_buffer.start_request()
+        try:
+            return await self.get_response(request)
+        finally:
+            events = event_buffer.end_request(token)
+            if events:
+                await sync_to_async(event_buffer.write)(events)
+
+
+class HashingBusyMiddleware(MiddlewareMixin):
+    """
+    Turns ``HashingBusy`` from plain Django views into a 503 with Retry-After;
+    DRF views already get the same response from DRF's exception handler.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingBusy):
+            return None
+        if request.path.startswith("/api/"):
+            response = JsonResponse({"detail": exception.detail}, status=503)
+        else:
+            response = HttpResponse(
+                exception.detail, status=503, content_type="text/plain"
+            )
+        response["Retry-After"] = str(exception.wait)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Runs the requests ``profiling.wants_profile`` picks under cProfile and
+    stores the call graph with the slow statements and their plans. Must
+    come after AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # cProfile hooks a whole thread: an async profile also contains the
+        # other requests the event loop ran meanwhile, and only one can be
+        # active on the loop at a time.
+        self._loop_busy = False
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not (may_profile(request) and wants_profile(request, request.user)):
+            return self.get_response(request)
+        capture, token = start_capture()
+        start = time.perf_counter()
+        try:
+            response = capture.profiler.runcall(self.get_response, request)
+        finally:
+            end_capture(token)
+        save_profile(
+            request, request.user, response, capture, time.perf_counter() - start
+        )
+        return response
+
+    async def __acall__(self, request):
+        if self._loop_busy or not may_profile(request):
+            return await self.get_response(request)
+        user = await request.auser()
+        if not wants_profile(request, user):
+            return await self.get_response(request)
+        self._loop_busy = True
+        capture, token = start_capture()
+        start = time.perf_counter()
+        capture.profiler.enable()
+        try:
+            response = await self.get_response(request)
+        finally:
+            capture.profiler.disable()
+            end_capture(token)
+            self._loop_busy = False
+        await sync_to_async(save_profile)(
+            request, user, response, capture, time.perf_counter() - start
+        )
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_security', '0003_alter_event_details_alter_event_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_security', '0004_event_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['-timestamp', '-id'], name='event_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='event_user_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['action', '-timestamp', '-id'], name='event_action_timestamp_idx'),
+        ),
+    ]
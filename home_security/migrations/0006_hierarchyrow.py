@@ -0,0 +1,74 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:28
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def populate_hierarchy(apps, schema_editor):
+    Building = apps.get_model("home_security", "Building")
+    Entrance = apps.get_model("home_security", "Entrance")
+    Apartment = apps.get_model("home_security", "Apartment")
+    HierarchyRow = apps.get_model("home_security", "HierarchyRow")
+
+    numbers = defaultdict(list)
+    for entrance_id, number in Apartment.objects.order_by("number").values_list(
+        "entrance_id", "number"
+    ):
+        numbers[entrance_id].append(number)
+
+    def row(building, entrance=None):
+        manager = building.manager
+        guard = entrance.guard if entrance else None
+        return HierarchyRow(
+            building_id=building.id,
+            building_number=building.number,
+            manager_id=manager.id if manager else None,
+            manager_username=manager.username if manager else "",
+            entrance_id=entrance.id if entrance else None,
+            entrance_number=entrance.number if entrance else None,
+            guard_id=guard.id if guard else None,
+            guard_username=guard.username if guard else "",
+            apartment_numbers=numbers[entrance.id] if entrance else [],
+        )
+
+    rows = [
+        row(entrance.building, entrance)
+        for entrance in Entrance.objects.select_related("building__manager", "guard")
+    ]
+    rows += [
+        row(building)
+        for building in Building.objects.filter(entrances__isnull=True).select_related(
+            "manager"
+        )
+    ]
+    HierarchyRow.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_security', '0005_event_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HierarchyRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('building_id', models.PositiveBigIntegerField()),
+                ('building_number', models.PositiveIntegerField()),
+                ('manager_id', models.PositiveBigIntegerField(null=True)),
+                ('manager_username', models.CharField(blank=True, max_length=150)),
+                ('entrance_id', models.PositiveBigIntegerField(null=True, unique=True)),
+                ('entrance_number', models.PositiveIntegerField(null=True)),
+                ('guard_id', models.PositiveBigIntegerField(null=True)),
+                ('guard_username', models.CharField(blank=True, max_length=150)),
+                ('apartment_numbers', models.JSONField(default=list)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['building_number', 'building_id', 'entrance_number'], name='hierarchy_number_idx'), models.Index(fields=['manager_id', 'building_number', 'building_id', 'entrance_number'], name='hierarchy_manager_idx'), models.Index(fields=['guard_id', 'building_number', 'building_id', 'entrance_number'], name='hierarchy_guard_idx')],
+            },
+        ),
+        migrations.RunPython(populate_hierarchy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_security', '0006_hierarchyrow'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['number', 'id'], name='apartment_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apartment',
+            index=models.Index(fields=['entrance', 'number', 'id'], name='apartment_entrance_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='building',
+            index=models.Index(fields=['number', 'id'], name='building_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrance',
+            index=models.Index(fields=['number', 'id'], name='entrance_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrance',
+            index=models.Index(fields=['building', 'number', 'id'], name='entrance_building_number_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:37
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+logger = logging.getLogger(__name__)
+
+# (model, fields that must be unique together), parents first so children
+# are renumbered within parents that are already unique.
+NUMBERED = [
+    ("Building", []),
+    ("Entrance", ["building"]),
+    ("Apartment", ["entrance"]),
+]
+
+
+def renumber_duplicates(apps, schema_editor):
+    """
+    The constraints below cannot be added while duplicate numbers exist. In
+    every group of rows sharing a number, the oldest row keeps it and the
+    others move past the highest number of their parent; each move is
+    logged so the new numbers can be reviewed.
+    """
+    for model_name, scope in NUMBERED:
+        model = apps.get_model("home_security", model_name)
+        manager = model._default_manager.using(schema_editor.connection.alias)
+        groups = (
+            manager.values(*scope, "number")
+            .annotate(rows=Count("id"), keep=Min("id"))
+            .filter(rows__gt=1)
+            .order_by(*scope, "number")
+        )
+        for group in groups:
+            parent = {field: group[field] for field in scope}
+            where = "".join(f" of {field} {value}" for field, value in parent.items())
+            top = manager.filter(**parent).aggregate(top=Max("number"))["top"]
+            duplicates = manager.filter(**parent, number=group["number"]).exclude(
+                id=group["keep"]
+            )
+            for offset, row in enumerate(duplicates.order_by("id"), 1):
+                row.number = top + offset
+                row.save(update_fields=["number"])
+                logger.warning(
+                    "Renumbered duplicate %s %d%s from %d to %d",
+                    model_name,
+                    row.id,
+                    where,
+                    group["number"],
+                    row.number,
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_security', '0007_api_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='apartment',
+            constraint=models.UniqueConstraint(fields=('entrance', 'number'), name='unique_apartment_number'),
+        ),
+        migrations.AddConstraint(
+            model_name='building',
+            constraint=models.UniqueConstraint(fields=('number',), name='unique_building_number'),
+        ),
+        migrations.AddConstraint(
+            model_name='entrance',
+            constraint=models.UniqueConstraint(fields=('building', 'number'), name='unique_entrance_number'),
+        ),
+    ]
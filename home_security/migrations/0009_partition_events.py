@@ -0,0 +1,99 @@
+import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+# Months created ahead of time; partitions for later months are added by the
+# archive_events command.
+MONTHS_AHEAD = 3
+
+
+def _months(first, last):
+    month = datetime.datetime(first.year, first.month, 1, tzinfo=datetime.timezone.utc)
+    while month <= last:
+        following = (month + datetime.timedelta(days=32)).replace(day=1)
+        yield month, following
+        month = following
+
+
+def _rebuild(apps, schema_editor, partitioned):
+    """
+    Recreates the event table as a range-partitioned table (or back as a plain
+    one) and copies the rows over. The primary key of a partitioned table has
+    to include the partition key, so it becomes (id, timestamp).
+    """
+    Event = apps.get_model("home_security", "Event")
+    User = apps.get_model("home_security", "User")
+    quote = schema_editor.quote_name
+    table, old = Event._meta.db_table, f"{Event._meta.db_table}_old"
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        (sequence,) = cursor.fetchone()
+        cursor.execute('SELECT min("timestamp"), max(id) FROM ' + quote(table))
+        first, last_id = cursor.fetchone()
+
+    schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+    schema_editor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {quote(old + '_id_seq')}")
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table)} ("
+        '"id" bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY, '
+        '"action" varchar(100) NOT NULL, '
+        '"timestamp" timestamp with time zone NOT NULL, '
+        '"details" text NOT NULL, '
+        '"user_id" bigint NULL)'
+        + (' PARTITION BY RANGE ("timestamp")' if partitioned else "")
+    )
+    if partitioned:
+        now = timezone.now()
+        last = (now + datetime.timedelta(days=31 * MONTHS_AHEAD)).replace(day=1)
+        for month, following in _months(min(first or now, now), last):
+            schema_editor.execute(
+                f"CREATE TABLE {quote(f'{table}_p{month:%Y%m}')} "
+                f"PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+                [month, following],
+            )
+        schema_editor.execute(
+            f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT"
+        )
+
+    schema_editor.execute(
+        f'INSERT INTO {quote(table)} ("id", "action", "timestamp", "details", "user_id") '
+        f'SELECT "id", "action", "timestamp", "details", "user_id" FROM {quote(old)}'
+    )
+    schema_editor.execute(f"DROP TABLE {quote(old)}")
+    if last_id is not None:
+        schema_editor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", [table, last_id]
+        )
+
+    primary_key = '"id", "timestamp"' if partitioned else '"id"'
+    schema_editor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY ({primary_key})")
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_user_id_fk')} "
+        f'FOREIGN KEY ("user_id") REFERENCES {quote(User._meta.db_table)} ("id") '
+        "DEFERRABLE INITIALLY DEFERRED"
+    )
+    for index in Event._meta.indexes:
+        schema_editor.add_index(Event, index)
+
+
+def partition_events(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        _rebuild(apps, schema_editor, partitioned=True)
+
+
+def unpartition_events(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        _rebuild(apps, schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home_security", "0008_unique_numbers"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_events, unpartition_events),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+# The Notification model was removed from models.py without a migration, so
+# every makemigrations run wanted to delete it. This drops it from the
+# migration state only: the table and its rows stay in place until someone
+# decides to remove them on purpose.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_security', '0010_token_version'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.DeleteModel(
+                    name='Notification',
+                ),
+            ],
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
+
+from .hashing import hashing_pool
 
 
 class User(AbstractUser):
@@ -15,6 +18,20 @@ class User(AbstractUser):
     )
     role = models.PositiveSmallIntegerField(choices=ROLE_CHOICES, blank=True, null=True)
 
+    def set_password(self, raw_password):
+        self.password = hashing_pool.make(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        # Same contract as AbstractBaseUser.check_password, with the hashing
+        # done in the pool.
+        valid, must_update = hashing_pool.check(raw_password, self.password)
+        if valid and must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=["password"])
+        return valid
+
     def is_admin(self):
         return self.role == self.ADMIN
 
@@ -25,12 +42,34 @@ class User(AbstractUser):
         return self.role == self.GUARD
 
 
+class TokenVersion(models.Model):
+    """
+    Version of a user's API tokens; bumping it revokes every token issued
+    before. Kept out of User so a full save of a stale User instance cannot
+    roll a revocation back.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"Token version {self.version} of user {self.user_id}"
+
+
 class Building(models.Model):
     number = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     manager = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, related_name="managed_buildings"
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["number"], name="unique_building_number")
+        ]
+        indexes = [models.Index(fields=["number", "id"], name="building_number_idx")]
+
     def __str__(self) -> str:
         return f"Building with number  {self.number}"
 
@@ -44,6 +83,19 @@ class Entrance(models.Model):
         User, on_delete=models.SET_NULL, null=True, related_name="guarded_entrances"
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["building", "number"], name="unique_entrance_number"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["number", "id"], name="entrance_number_idx"),
+            models.Index(
+                fields=["building", "number", "id"], name="entrance_building_number_idx"
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"Entrance with number {self.number}"
 
@@ -54,6 +106,20 @@ class Apartment(models.Model):
     )
     number = models.PositiveIntegerField(validators=[MinValueValidator(1)])
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["entrance", "number"], name="unique_apartment_number"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["number", "id"], name="apartment_number_idx"),
+            models.Index(
+                fields=["entrance", "number", "id"],
+                name="apartment_entrance_number_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"Apartment with number {self.number}"
 
@@ -61,8 +127,67 @@ class Apartment(models.Model):
 class Event(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=100)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     details = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-timestamp", "-id"], name="event_timestamp_idx"),
+            models.Index(
+                fields=["user", "-timestamp", "-id"], name="event_user_timestamp_idx"
+            ),
+            models.Index(
+                fields=["action", "-timestamp", "-id"],
+                name="event_action_timestamp_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.action} - {self.timestamp}"
+
+
+class HierarchyRow(models.Model):
+    """
+    Denormalized dashboard row: one per entrance, or a single row with empty
+    entrance fields for a building that has no entrances yet. Maintained by
+    the signal handlers in ``home_security.hierarchy``.
+    """
+
+    building_id = models.PositiveBigIntegerField()
+    building_number = models.PositiveIntegerField()
+    manager_id = models.PositiveBigIntegerField(null=True)
+    manager_username = models.CharField(max_length=150, blank=True)
+    entrance_id = models.PositiveBigIntegerField(null=True, unique=True)
+    entrance_number = models.PositiveIntegerField(null=True)
+    guard_id = models.PositiveBigIntegerField(null=True)
+    guard_username = models.CharField(max_length=150, blank=True)
+    apartment_numbers = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["building_number", "building_id", "entrance_number"],
+                name="hierarchy_number_idx",
+            ),
+            models.Index(
+                fields=[
+                    "manager_id",
+                    "building_number",
+                    "building_id",
+                    "entrance_number",
+                ],
+                name="hierarchy_manager_idx",
+            ),
+            models.Index(
+                fields=[
+                    "guard_id",
+                    "building_number",
+                    "building_id",
+                    "entrance_number",
+                ],
+                name="hierarchy_guard_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Building {self.building_number} / entrance {self.entrance_number}"
@@ -0,0 +1,89 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, page_size=50, field="timestamp"):
+    """
+    Return one page of ``queryset`` in ``(-field, -id)`` order and the cursor
+    of the next page (``None`` on the last page).
+
+    Unlike OFFSET pagination the cost of a page does not depend on how deep
+    into the table it is, as long as an index on ``(field, id)`` exists.
+    """
+    queryset = queryset.order_by(f"-{field}", "-id")
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(
+            Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk})
+        )
+    rows = list(queryset[: page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
+
+
+def encode_number_cursor(number, pk):
+    return base64.urlsafe_b64encode(f"{number}|{pk}".encode()).decode()
+
+
+def decode_number_cursor(cursor):
+    try:
+        number, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return int(number), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+
+async def anumber_page(queryset, cursor=None, page_size=None):
+    """
+    Async counterpart of ``NumberCursorPagination``: one page of ``queryset``
+    in ``(number, id)`` order and the cursor of the next page.
+    """
+    page_size = page_size or settings.API_PAGE_SIZE
+    queryset = queryset.order_by("number", "id")
+    position = decode_number_cursor(cursor) if cursor else None
+    if position is not None:
+        number, pk = position
+        queryset = queryset.filter(Q(number__gt=number) | Q(number=number, id__gt=pk))
+    rows = [row async for row in queryset[: page_size + 1]]
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_number_cursor(rows[-1].number, rows[-1].pk)
+    return rows, next_cursor
+
+
+class NumberCursorPagination(CursorPagination):
+    ordering = ("number", "id")
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        # ``?ordering=number`` alone leaves rows with equal numbers in any
+        # order, and the cursor skips or repeats them; the pk breaks ties.
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if not {"id", "-id", "pk", "-pk"} & set(ordering):
+            ordering += ("-id" if ordering[0].startswith("-") else "id",)
+        return ordering
@@ -0,0 +1,241 @@
+import datetime
+import gzip
+import json
+import os
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .exporter import encode_rows, event_rows
+from .models import Event
+
+TABLE = Event._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def month_start(value):
+    value = value.astimezone(datetime.timezone.utc)
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def archive_path(month, directory=None):
+    directory = Path(directory or settings.EVENT_ARCHIVE_DIR)
+    return directory / f"events-{month:%Y-%m}.jsonl.gz"
+
+
+class PostgresPartitions:
+    """Monthly range partitions of the event table, attached to it natively."""
+
+    native = True
+
+    def attached(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = %s",
+                [TABLE],
+            )
+            names = {name for (name,) in cursor.fetchall()}
+        prefix = f"{TABLE}_p"
+        return sorted(
+            datetime.datetime.strptime(name[len(prefix) :], "%Y%m").replace(
+                tzinfo=datetime.timezone.utc
+            )
+            for name in names
+            if name.startswith(prefix)
+        )
+
+    def months(self):
+        """
+        Months holding events: the attached partitions plus the months of rows
+        that landed in the default partition before theirs was created.
+        """
+        default = connection.ops.quote_name(DEFAULT_PARTITION)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC') "
+                f"FROM {default}"
+            )
+            stray = {
+                value.replace(tzinfo=datetime.timezone.utc)
+                for (value,) in cursor.fetchall()
+            }
+        return sorted(stray.union(self.attached()))
+
+    def create(self, month):
+        # Rows that landed in the default partition for this month are moved
+        # into the new table before it is attached, otherwise ATTACH fails.
+        name = connection.ops.quote_name(partition_name(month))
+        table = connection.ops.quote_name(TABLE)
+        default = connection.ops.quote_name(DEFAULT_PARTITION)
+        bounds = [month, add_months(month, 1)]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {default} "
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f"INSERT INTO {name} SELECT * FROM moved",
+                bounds,
+            )
+            cursor.execute(
+                f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                bounds,
+            )
+
+    def drop(self, month):
+        name = connection.ops.quote_name(partition_name(month))
+        table = connection.ops.quote_name(TABLE)
+        default = connection.ops.quote_name(DEFAULT_PARTITION)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {default} WHERE "timestamp" >= %s AND "timestamp" < %s',
+                [month, add_months(month, 1)],
+            )
+            if month in self.attached():
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                cursor.execute(f"DROP TABLE {name}")
+
+
+class TablePartitions:
+    """
+    Fallback for databases without native partitioning: months are ranges of
+    the single event table and dropping one deletes its rows.
+    """
+
+    native = False
+
+    def months(self):
+        return [
+            month_start(value)
+            for value in Event.objects.datetimes(
+                "timestamp", "month", tzinfo=datetime.timezone.utc
+            )
+        ]
+
+    def drop(self, month):
+        Event.objects.filter(
+            timestamp__gte=month, timestamp__lt=add_months(month, 1)
+        ).delete()
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table "
+            "JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid "
+            "WHERE pg_class.relname = %s",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def get_partitions():
+    return PostgresPartitions() if is_partitioned() else TablePartitions()
+
+
+def ensure_partitions(now, ahead=None):
+    """Creates the partitions from the current month up to ``ahead`` months out."""
+    partitions = get_partitions()
+    if not partitions.native:
+        return []
+    existing = set(partitions.attached())
+    ahead = settings.EVENT_PARTITION_MONTHS_AHEAD if ahead is None else ahead
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(month_start(now), offset)
+        if month not in existing:
+            partitions.create(month)
+            created.append(month)
+    return created
+
+
+def expired_months(now, retention=None):
+    retention = settings.EVENT_RETENTION_MONTHS if retention is None else retention
+    cutoff = add_months(month_start(now), -retention)
+    return [month for month in get_partitions().months() if month < cutoff]
+
+
+def archive_month(month, directory=None):
+    """
+    Writes every event of ``month`` to a gzipped JSONL file, then drops the
+    month from the database. Returns the archive path.
+
+    Archiving a month again, e.g. for events that arrived after the first run,
+    appends a gzip member to its archive instead of replacing it.
+    """
+    path = archive_path(month, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = event_rows(
+        Event.objects.filter(timestamp__gte=month, timestamp__lt=add_months(month, 1)),
+        settings.EVENT_EXPORT_CHUNK_SIZE,
+    )
+    partial = path.with_name(path.name + ".partial")
+    with open(partial, "wb") as stream:
+        if path.exists():
+            with open(path, "rb") as archived:
+                shutil.copyfileobj(archived, stream)
+        for chunk in encode_rows(rows, "jsonl", compress=True):
+            stream.write(chunk)
+        stream.flush()
+        os.fsync(stream.fileno())
+    os.replace(partial, path)
+    get_partitions().drop(month)
+    return path
+
+
+def archived_months(directory=None):
+    directory = Path(directory or settings.EVENT_ARCHIVE_DIR)
+    return sorted(
+        datetime.datetime.strptime(path.name, "events-%Y-%m.jsonl.gz").replace(
+            tzinfo=datetime.timezone.utc
+        )
+        for path in directory.glob("events-*.jsonl.gz")
+    )
+
+
+def _matches(event, timestamp, user, action, since, until):
+    if user and event["user"] != user:
+        return False
+    if action and event["action"] != action:
+        return False
+    if since and timestamp < since:
+        return False
+    return not (until and timestamp >= until)
+
+
+def archived_rows(user=None, action=None, since=None, until=None, directory=None):
+    """
+    Yields archived events in ``event_rows`` order and shape, reading only the
+    archive files whose month overlaps ``since``/``until``.
+    """
+    for month in archived_months(directory):
+        if (since and add_months(month, 1) <= since) or (until and month >= until):
+            continue
+        with gzip.open(archive_path(month, directory), "rt") as stream:
+            for line in stream:
+                event = json.loads(line)
+                timestamp = datetime.datetime.fromisoformat(event["timestamp"])
+                if _matches(event, timestamp, user, action, since, until):
+                    yield (
+                        event["id"],
+                        timestamp,
+                        event["user"],
+                        event["action"],
+                        event["details"],
+                    )
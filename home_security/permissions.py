@@ -0,0 +1,41 @@
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from .access import get_scope
+from .models import Apartment, Building, Entrance
+
+
+class IsAdministrator(BasePermission):
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and user.is_admin())
+
+
+class InAccessScope(BasePermission):
+    """
+    Reads are limited to the user's scope by the viewset queryset; changes
+    require managing the building the object belongs to, and only
+    administrators may create objects.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        if request.method in SAFE_METHODS or view.action != "create":
+            return True
+        return user.is_admin()
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in SAFE_METHODS:
+            return True
+        return get_scope(request.user).can_manage_building(_building_id(obj))
+
+
+def _building_id(obj):
+    if isinstance(obj, Building):
+        return obj.id
+    if isinstance(obj, Entrance):
+        return obj.building_id
+    if isinstance(obj, Apartment):
+        return obj.entrance.building_id
+    return None
@@ -0,0 +1,246 @@
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_PARAM = "profile"
+TARGETS_KEY = "profiling:targets"
+PROFILE_ID = re.compile(r"^\d{8}-\d{6}-[0-9a-f]{8}$")
+SORTS = ("cumulative", "tottime", "calls")
+EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+
+_current = ContextVar("profiling_capture", default=None)
+# (refresh after, targets) of this process's copy of the cached targets.
+_local_targets = (0.0, {})
+
+
+def _unexpired(targets):
+    now = time.time()
+    return {pk: target for pk, target in targets.items() if target["until"] > now}
+
+
+def _store_targets(targets):
+    global _local_targets
+    _local_targets = (time.monotonic() + settings.PROFILING_TARGETS_TTL, targets)
+    return _unexpired(targets)
+
+
+def get_targets():
+    """Return ``{user_id: {"rate": ..., "until": ...}}`` of unexpired targets."""
+    return _store_targets(cache.get(TARGETS_KEY) or {})
+
+
+def local_targets():
+    """
+    ``get_targets`` from this process's copy, refreshed every
+    PROFILING_TARGETS_TTL seconds, so requests do not each read the cache.
+    """
+    refresh_after, targets = _local_targets
+    if time.monotonic() >= refresh_after:
+        return get_targets()
+    return _unexpired(targets)
+
+
+def set_target(user_id, rate, minutes):
+    """Profile a ``rate`` fraction of ``user_id``'s requests for ``minutes``."""
+    targets = get_targets()
+    targets[user_id] = {"rate": rate, "until": time.time() + minutes * 60}
+    cache.set(TARGETS_KEY, targets, None)
+    _store_targets(targets)
+
+
+def remove_target(user_id):
+    targets = get_targets()
+    targets.pop(user_id, None)
+    cache.set(TARGETS_KEY, targets, None)
+    _store_targets(targets)
+
+
+def requested(request):
+    return PROFILE_HEADER in request.headers or PROFILE_PARAM in request.GET
+
+
+def may_profile(request):
+    """Cheap pre-check, so most requests never look up their user here."""
+    return requested(request) or bool(local_targets())
+
+
+def wants_profile(request, user):
+    """
+    Whether to profile ``request``: administrators ask for it with the
+    X-Profile header or the ``profile`` query parameter; targeted users are
+    sampled at their rate.
+
+    Only session-authenticated users are known to middleware, so requests
+    made with API tokens are not sampled.
+    """
+    if not user.is_authenticated:
+        return False
+    if requested(request):
+        return user.is_admin()
+    target = local_targets().get(user.id)
+    return target is not None and random.random() < target["rate"]
+
+
+class Capture:
+    """The profiler and the slow statements of one profiled request."""
+
+    def __init__(self, threshold_ms):
+        self.threshold = threshold_ms / 1000
+        self.profiler = cProfile.Profile()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slow = []
+
+    def query(self, alias, sql, params, many, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        if seconds >= self.threshold:
+            self.slow.append((alias, sql, params, many, seconds))
+
+
+def _capture_query(execute, sql, params, many, context):
+    capture = _current.get()
+    if capture is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    alias = context["connection"].alias
+    capture.query(alias, sql, params, many, time.perf_counter() - start)
+    return result
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    if _capture_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_capture_query)
+
+
+def start_capture():
+    capture = Capture(settings.PROFILING_SLOW_QUERY_MS)
+    return capture, _current.set(capture)
+
+
+def end_capture(token):
+    _current.reset(token)
+
+
+def explain(alias, sql, params):
+    """Return the plan of ``sql`` on ``alias``, or the error explaining failed with."""
+    if not EXPLAINABLE.match(sql):
+        return None
+    connection = connections[alias]
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        # A failed EXPLAIN only rolls back its savepoint.
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            return "\n".join(
+                " ".join(str(column) for column in row) for row in cursor.fetchall()
+            )
+    except DatabaseError as exc:
+        return f"EXPLAIN failed: {exc}"
+
+
+def profile_dir(directory=None):
+    return Path(directory or settings.PROFILING_DIR)
+
+
+def save_profile(request, user, response, capture, seconds, directory=None):
+    """
+    Store the call graph as ``<id>.prof`` (pstats format) and the request
+    summary with the slow statements and their plans as ``<id>.json``.
+    Runs after the response is built, so the EXPLAINs are not part of the
+    profile. Returns the profile id.
+    """
+    directory = profile_dir(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    profile_id = f"{now:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    capture.profiler.dump_stats(directory / f"{profile_id}.prof")
+
+    slow = []
+    for alias, sql, params, many, query_seconds in capture.slow:
+        slow.append(
+            {
+                "database": alias,
+                "sql": sql,
+                "params": repr(params),
+                "ms": round(query_seconds * 1000, 3),
+                # executemany has no single set of parameters to plan with.
+                "plan": None if many else explain(alias, sql, params),
+            }
+        )
+    match = request.resolver_match
+    summary = {
+        "id": profile_id,
+        "timestamp": now.isoformat(),
+        "user": user.get_username(),
+        "method": request.method,
+        "path": request.get_full_path(),
+        "view": match.view_name if match else None,
+        "status": response.status_code,
+        "ms": round(seconds * 1000, 3),
+        "queries": capture.queries,
+        "db_ms": round(capture.db_seconds * 1000, 3),
+        "slow_queries": slow,
+    }
+    partial = directory / f"{profile_id}.json.partial"
+    partial.write_text(json.dumps(summary, indent=2))
+    os.replace(partial, directory / f"{profile_id}.json")
+    prune_profiles(settings.PROFILING_KEEP, directory)
+    return profile_id
+
+
+def list_profiles(directory=None):
+    """Return the summaries of the stored profiles, newest first."""
+    paths = sorted(profile_dir(directory).glob("*.json"), reverse=True)
+    return [json.loads(path.read_text()) for path in paths]
+
+
+def profile_path(profile_id, suffix, directory=None):
+    """Return the path of a stored profile file, or None for unknown ids."""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = profile_dir(directory) / f"{profile_id}{suffix}"
+    return path if path.exists() else None
+
+
+def load_profile(profile_id, directory=None):
+    path = profile_path(profile_id, ".json", directory)
+    return None if path is None else json.loads(path.read_text())
+
+
+def profile_stats(profile_id, sort="cumulative", limit=40, directory=None):
+    """
+    Return the ``limit`` most expensive functions by ``sort`` as text, or
+    None when the profile has no ``.prof`` file.
+    """
+    path = profile_path(profile_id, ".prof", directory)
+    if path is None:
+        return None
+    stream = io.StringIO()
+    stats = pstats.Stats(str(path), stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def prune_profiles(keep, directory=None):
+    for path in sorted(profile_dir(directory).glob("*.json"), reverse=True)[keep:]:
+        path.with_suffix(".prof").unlink(missing_ok=True)
+        path.unlink(missing_ok=True)
@@ -1,9 +1,27 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 
 from .models import Apartment, Building, Entrance, User
 
 
-class BuildingSerializer(serializers.ModelSerializer):
+class DatabaseUniqueMixin:
+    """
+    Drop query-based UniqueValidators; the unique constraints are enforced by
+    the database and reported through ``writes.unique_write``.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            field.validators = [
+                validator
+                for validator in field.validators
+                if not isinstance(validator, UniqueValidator)
+            ]
+        return fields
+
+
+class BuildingSerializer(DatabaseUniqueMixin, serializers.ModelSerializer):
     manager = serializers.SlugRelatedField(
         read_only=True, slug_field="username", many=False
     )
@@ -17,7 +35,7 @@ class BuildingSerializer(serializers.ModelSerializer):
         )
 
 
-class EntranceSerializer(serializers.ModelSerializer):
+class EntranceSerializer(DatabaseUniqueMixin, serializers.ModelSerializer):
     guard = serializers.SlugRelatedField(
         read_only=True, slug_field="username", many=False
     )
@@ -30,7 +48,7 @@ class EntranceSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class ApartmentSerializer(serializers.ModelSerializer):
+class ApartmentSerializer(DatabaseUniqueMixin, serializers.ModelSerializer):
     entrance = serializers.SlugRelatedField(
         read_only=True, slug_field="number", many=False
     )
@@ -0,0 +1,33 @@
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+class SessionStore(CachedDBStore):
+    """
+    ``cached_db`` sessions that skip the write-through when the session data
+    is the same as what was loaded, even if the session was marked modified.
+
+    Reads come from ``SESSION_CACHE_ALIAS``. Multi-process deployments need
+    that cache to be shared (memcached/redis); with the process-local default
+    a logout in one worker is not seen by the others until the entry expires.
+    """
+
+    _loaded = None
+
+    def _fingerprint(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._loaded = self._fingerprint(data)
+        return data
+
+    def save(self, must_create=False):
+        if (
+            not must_create
+            and self.session_key is not None
+            and self._loaded is not None
+            and self._loaded == self._fingerprint(self._get_session(no_load=True))
+        ):
+            return
+        super().save(must_create)
+        self._loaded = self._fingerprint(self._session)
@@ -0,0 +1,83 @@
+import gc
+import pkgutil
+from importlib import import_module
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.template import engines
+from django.urls import get_resolver
+from django.utils import translation
+
+
+def migration_files():
+    """
+    Return the ``(app_label, name)`` of every migration on disk, listing the
+    migration packages the way MigrationLoader does but without importing the
+    migrations or building their graph.
+    """
+    found = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            module = import_module(module_name)
+        except ModuleNotFoundError:
+            continue
+        if not hasattr(module, "__path__"):
+            continue
+        found.update(
+            (app_config.label, name)
+            for _, name, is_package in pkgutil.iter_modules(module.__path__)
+            if not is_package and name[0] not in "_~"
+        )
+    return found
+
+
+def unapplied_migrations(using=DEFAULT_DB_ALIAS):
+    """
+    Migrations on disk that ``using`` has not recorded, in one query. Anything
+    unusual, like an unrecorded squashed migration, shows up here too and
+    just makes ``ensure_migrated`` fall back to a full migrate.
+    """
+    applied = MigrationRecorder(connections[using]).applied_migrations()
+    return sorted(migration_files() - set(applied))
+
+
+def ensure_migrated(using=DEFAULT_DB_ALIAS, verbosity=1):
+    """
+    Run migrate only when the schema is behind the migration files. Returns
+    the migrations that were pending.
+    """
+    pending = unapplied_migrations(using)
+    if pending:
+        call_command("migrate", database=using, interactive=False, verbosity=verbosity)
+    return pending
+
+
+def warm_up():
+    """
+    Do the per-process work of the first request ahead of time, so pre-forked
+    workers inherit it: build the URL resolver (importing every view),
+    compile the templates, load the translation catalog and freeze the
+    resulting objects out of the garbage collector's reach, keeping the
+    shared pages untouched after fork. Connections are closed; workers must
+    not share them.
+    """
+    get_resolver().reverse_dict
+    for engine in engines.all():
+        for directory in map(Path, engine.dirs):
+            for path in sorted(directory.rglob("*.html")):
+                engine.get_template(path.relative_to(directory).as_posix())
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext("")
+    connections.close_all()
+    caches.close_all()
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.dispatch import receiver
+
+from .access import get_scope
+from .events import events_written
+from .hierarchy import hierarchy_changed
+
+
+class Subscriber:
+    """One connected stream: a bounded queue plus the user's access scope."""
+
+    def __init__(self, user, scope, queue_size):
+        self.user = user
+        self.user_id = user.id
+        self.scope = scope
+        self.stale = False
+        self.queue = asyncio.Queue(queue_size)
+
+    def accepts(self, message):
+        if message["type"] == "event":
+            return self.scope.is_admin or message["data"]["user_id"] == self.user_id
+        if self.user_id in message["user_ids"]:
+            # Their own assignments changed, so the scope is re-read before the
+            # message is filtered in ``stream()``.
+            self.stale = True
+            return True
+        return any(map(self.scope.can_view_building, message["data"]["building_ids"]))
+
+    async def refresh_scope(self):
+        self.user._access_scope = None
+        self.scope = await sync_to_async(get_scope)(self.user)
+        self.stale = False
+
+
+class Broadcaster:
+    """
+    In-process fan-out of new events and hierarchy changes to every connected
+    stream. Publishing is thread-safe and costs one callback per event loop,
+    not per subscriber; idle subscribers are just a parked coroutine.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._loops = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscribers(self):
+        return sum(len(subscribers) for subscribers in self._loops.values())
+
+    def stats(self):
+        return {
+            "subscribers": self.subscribers,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+    def subscribe(self, user, scope):
+        subscriber = Subscriber(user, scope, self.queue_size)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._loops.setdefault(loop, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            subscribers = self._loops.get(loop, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                self._loops.pop(loop, None)
+
+    def publish(self, message):
+        with self._lock:
+            loops = [(loop, list(subs)) for loop, subs in self._loops.items()]
+        self.published += 1
+        for loop, subscribers in loops:
+            try:
+                loop.call_soon_threadsafe(self._deliver, subscribers, message)
+            except RuntimeError:
+                # The loop was closed without its streams unsubscribing.
+                with self._lock:
+                    self._loops.pop(loop, None)
+
+    def _deliver(self, subscribers, message):
+        for subscriber in subscribers:
+            if not subscriber.accepts(message):
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+
+broadcaster = Broadcaster(queue_size=getattr(settings, "STREAM_QUEUE_SIZE", 100))
+
+
+def available(request):
+    """
+    Streams are only served under ASGI: a WSGI worker thread would be held
+    by every open stream for as long as its page stays open.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def format_sse(kind, data, event_id=None):
+    lines = [f"event: {kind}", f"data: {json.dumps(data)}"]
+    if event_id is not None:
+        lines.insert(0, f"id: {event_id}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream(user, heartbeat=None):
+    """
+    Yields server-sent events for ``user`` until the client disconnects, with
+    a comment line every ``heartbeat`` seconds to keep proxies from closing
+    an idle connection.
+    """
+    heartbeat = heartbeat or settings.STREAM_HEARTBEAT_INTERVAL
+    scope = await sync_to_async(get_scope)(user)
+    subscriber = broadcaster.subscribe(user, scope)
+    try:
+        yield f"retry: {heartbeat * 1000}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            data = message["data"]
+            if message["type"] == "hierarchy":
+                if subscriber.stale:
+                    await subscriber.refresh_scope()
+                building_ids = [
+                    pk
+                    for pk in data["building_ids"]
+                    if subscriber.scope.can_view_building(pk)
+                ]
+                if not building_ids and user.id not in message["user_ids"]:
+                    continue
+                data = {**data, "building_ids": building_ids}
+            yield format_sse(message["type"], data, data.get("id"))
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+@receiver(events_written)
+def _events_written(sender, events, **kwargs):
+    if not broadcaster.subscribers:
+        return
+    for event in events:
+        broadcaster.publish(
+            {
+                "type": "event",
+                "data": {
+                    "id": event.id,
+                    "timestamp": event.timestamp.isoformat(),
+                    "user_id": event.user_id,
+                    "user": event.user.username if event.user_id else None,
+                    "action": event.action,
+                    "details": event.details,
+                },
+            }
+        )
+
+
+@receiver(hierarchy_changed)
+def _hierarchy_changed(sender, building_ids=(), user_ids=(), **kwargs):
+    if not broadcaster.subscribers:
+        return
+    broadcaster.publish(
+        {
+            "type": "hierarchy",
+            "user_ids": set(user_ids),
+            "data": {"building_ids": sorted(building_ids)},
+        }
+    )
@@ -1,3 +1,924 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import io
+import json
+import runpy
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+from contextvars import Context
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import (
+    AsyncClient,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from . import profiling
+from .access import get_scope
+from .db.pool import ConnectionPool, PoolTimeout
+from .db.router import (
+    PIN_COOKIE,
+    ReplicaRouter,
+    _detect_write,
+    end_request,
+    routing_stats,
+    start_request,
+)
+from .deletion import bulk_delete_building, bulk_delete_entrance
+from .events import COMMIT, EventBuffer, events_written
+from .hashing import HashingBusy, HashingPool, process_share
+from .hierarchy import rebuild_all
+from .importer import EstateImporter, read_rows
+from .locator import locate
+from .metrics import RequestMetrics
+from .models import Apartment, Building, Entrance, Event, HierarchyRow, User
+from .pagination import NumberCursorPagination
+from .partitions import add_months, archive_month, archived_rows, expired_months
+from .startup import ensure_migrated, migration_files
+from .streams import broadcaster
+from .tokens import issue_token, read_token, revoke_tokens, token_user
+from .views import EntranceViewSet
+
+
+class EstateTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username="admin", role=User.ADMIN)
+        self.manager = User.objects.create(username="manager", role=User.MANAGER)
+        self.guard = User.objects.create(username="guard", role=User.GUARD)
+
+    def make_building(self, number, entrances=1, apartments=0, manager=None):
+        # The hierarchy read model is refreshed on commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            building = Building.objects.create(number=number, manager=manager)
+            for entrance_number in range(1, entrances + 1):
+                entrance = Entrance.objects.create(
+                    building=building, number=entrance_number, guard=self.guard
+                )
+                for apartment_number in range(1, apartments + 1):
+                    Apartment.objects.create(entrance=entrance, number=apartment_number)
+        return building
+
+
+class DashboardTests(EstateTestCase):
+    def test_building_with_several_entrances_is_listed_once(self):
+        self.make_building(7, entrances=3, manager=self.manager)
+        self.make_building(8, entrances=2, manager=self.manager)
+        for user in (self.admin, self.manager):
+            self.client.force_login(user)
+            response = self.client.get(reverse("dashboard-admin"))
+            self.assertEqual(response.content.decode().count("Edit entrances"), 2)
+
+
+class SessionModeTests(EstateTestCase):
+    def add_building(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("add-building"), {"number": 5, "manager": self.manager.id}
+                )
+            page = self.client.get(response.url)
+        self.assertContains(page, "Successfully added building 5")
+        sessions = [query for query in queries if "django_session" in query["sql"]]
+        return response, sessions
+
+    @override_settings(
+        SESSION_ENGINE=settings.SESSION_MODES["db"][0],
+        MESSAGE_STORAGE=settings.SESSION_MODES["db"][1],
+    )
+    def test_db_mode_reads_sessions_from_the_database(self):
+        _, sessions = self.add_building()
+        self.assertTrue(sessions)
+
+    @override_settings(
+        SESSION_ENGINE=settings.SESSION_MODES["cache"][0],
+        MESSAGE_STORAGE=settings.SESSION_MODES["cache"][1],
+    )
+    def test_cache_mode_leaves_the_session_table_alone(self):
+        response, sessions = self.add_building()
+        self.assertIn("messages", response.cookies)
+        self.assertEqual(sessions, [])
+
+
+class HierarchyTests(EstateTestCase):
+    def rows(self):
+        rows = HierarchyRow.objects.order_by("building_number", "entrance_number")
+        return list(
+            rows.values_list(
+                "building_number",
+                "manager_username",
+                "entrance_number",
+                "guard_username",
+                "apartment_numbers",
+            )
+        )
+
+    def test_rows_follow_edits_of_the_source_tables(self):
+        building = self.make_building(1, entrances=2, apartments=2)
+        building.manager = self.manager
+        with self.captureOnCommitCallbacks(execute=True):
+            building.save()
+        self.make_building(2, entrances=0)
+        entrance = building.entrances.get(number=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Apartment.objects.create(entrance=entrance, number=9)
+            building.entrances.get(number=1).delete()
+            self.manager.username = "boss"
+            self.manager.save()
+        expected = [
+            (1, "boss", 2, "guard", [1, 2, 9]),
+            (2, "", None, "", []),
+        ]
+        self.assertEqual(self.rows(), expected)
+        self.assertEqual(rebuild_all(), 2)
+        self.assertEqual(self.rows(), expected)
+
+
+class AccessScopeTests(EstateTestCase):
+    def scope(self, user):
+        # A fresh user object, as in a new request, skips the per-request memo.
+        return get_scope(User.objects.get(pk=user.pk))
+
+    def test_scope_is_cached_across_requests(self):
+        entrance = self.make_building(1).entrances.get()
+        self.assertEqual(self.scope(self.guard).entrance_ids, {entrance.id})
+        guard = User.objects.get(pk=self.guard.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_scope(guard).entrance_ids, {entrance.id})
+
+    def test_guard_reassignment_invalidates_both_scopes(self):
+        entrance = self.make_building(1).entrances.get()
+        other = User.objects.create(username="other", role=User.GUARD)
+        self.assertEqual(self.scope(self.guard).entrance_ids, {entrance.id})
+        self.assertEqual(self.scope(other).entrance_ids, set())
+        with self.captureOnCommitCallbacks(execute=True):
+            entrance.guard = other
+            entrance.save()
+        self.assertEqual(self.scope(self.guard).entrance_ids, set())
+        self.assertEqual(self.scope(other).entrance_ids, {entrance.id})
+        self.assertFalse(self.scope(other).can_view_building(entrance.building_id + 1))
+
+
+class AsyncApiTests(EstateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_building(1, entrances=2, apartments=2)
+        building = self.make_building(2, entrances=1, apartments=1)
+        other = User.objects.create(username="other", role=User.GUARD)
+        with self.captureOnCommitCallbacks(execute=True):
+            building.entrances.update(guard=other)
+            building.save()
+
+    async def results(self, url, query=None):
+        response = await self.async_client.get(url, query or {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    async def test_async_list_matches_the_sync_list(self):
+        await self.async_client.aforce_login(self.guard)
+        for query in ({}, {"number": 2}):
+            results = await self.results(reverse("async-apartment-list"), query)
+            self.assertEqual(
+                results, await self.results(reverse("apartment-list"), query)
+            )
+        self.assertEqual(len(results), 2)
+
+    async def test_async_detail_is_scoped(self):
+        await self.async_client.aforce_login(self.guard)
+        visible = await self.results(reverse("async-entrance-list"))
+        hidden = await Entrance.objects.exclude(
+            id__in=[entrance["id"] for entrance in visible]
+        ).aget()
+        url = reverse("async-entrance-detail", args=[hidden.id])
+        self.assertEqual((await self.async_client.get(url)).status_code, 404)
+        url = reverse("async-entrance-detail", args=[visible[0]["id"]])
+        self.assertEqual((await self.async_client.get(url)).json(), visible[0])
+
+
+class ConditionalGetTests(EstateTestCase):
+    def test_unchanged_list_is_not_modified_until_an_edit(self):
+        building = self.make_building(1)
+        self.client.force_login(self.admin)
+        url = reverse("building-list")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        # Only the session is read: the 304 is answered before the queryset.
+        self.assertFalse([q for q in queries if "home_security_building" in q["sql"]])
+        with self.captureOnCommitCallbacks(execute=True):
+            building.number = 2
+            building.save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["results"][0]["number"], 2)
+
+
+class TokenTests(EstateTestCase):
+    def user_of(self, token):
+        return token_user(read_token(token))
+
+    def test_token_authenticates_its_user(self):
+        user = self.user_of(issue_token(self.guard))
+        self.assertEqual((user.id, user.role), (self.guard.id, User.GUARD))
+
+    def test_revoked_token_is_rejected(self):
+        token = issue_token(self.guard)
+        revoke_tokens([self.guard.id])
+        self.assertIsNone(self.user_of(token))
+        self.assertIsNotNone(self.user_of(issue_token(self.guard)))
+
+    def test_version_survives_a_lost_cache(self):
+        # Another worker process starts with an empty cache of its own.
+        token = issue_token(self.guard)
+        cache.clear()
+        self.assertIsNotNone(self.user_of(token))
+        revoke_tokens([self.guard.id])
+        cache.clear()
+        self.assertIsNone(self.user_of(token))
+
+    def test_role_change_revokes_tokens(self):
+        token = issue_token(self.guard)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guard.role = User.MANAGER
+            self.guard.save()
+        self.assertIsNone(self.user_of(token))
+
+
+class ExportTests(EstateTestCase):
+    def setUp(self):
+        super().setUp()
+        Event.objects.bulk_create(
+            Event(user=self.admin, action="Added Building", details=f"Building {n}")
+            for n in range(5)
+        )
+
+    def test_export_streams_csv(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("export-event-log"), {"format": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,timestamp,user,action,details")
+        self.assertEqual(sum("Added Building" in line for line in lines), 5)
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        client = AsyncClient()
+        await client.aforce_login(self.admin)
+        response = await client.get(reverse("export-event-log"), {"format": "jsonl"})
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        lines = body.decode().splitlines()
+        self.assertEqual(sum("Added Building" in line for line in lines), 5)
+
+    def test_export_to_stdout_leaves_it_open(self):
+        stdout = io.TextIOWrapper(io.BytesIO())
+        with redirect_stdout(stdout):
+            call_command("export_events", "-", "--format", "jsonl")
+        self.assertFalse(stdout.closed)
+        lines = stdout.buffer.getvalue().decode().splitlines()
+        self.assertEqual(sum("Added Building" in line for line in lines), 5)
+
+
+class ArchiveTests(EstateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.month = datetime.datetime(2024, 3, 1, tzinfo=datetime.timezone.utc)
+
+    def add_events(self, month, *details):
+        events = Event.objects.bulk_create(
+            Event(user=self.guard, action="Opened Door", details=text)
+            for text in details
+        )
+        Event.objects.filter(pk__in=[event.pk for event in events]).update(
+            timestamp=month + datetime.timedelta(days=2)
+        )
+
+    def archived(self):
+        return [row[4] for row in archived_rows(directory=self.directory)]
+
+    def test_archive_moves_the_month_out_of_the_database(self):
+        self.add_events(self.month, "first", "second")
+        self.add_events(add_months(self.month, 1), "kept")
+        self.assertEqual(
+            expired_months(add_months(self.month, 2), retention=1), [self.month]
+        )
+        path = archive_month(self.month, self.directory)
+        self.assertEqual(path.name, "events-2024-03.jsonl.gz")
+        self.assertEqual(self.archived(), ["first", "second"])
+        details = Event.objects.values_list("details", flat=True)
+        self.assertEqual(list(details), ["kept"])
+
+    def test_archiving_a_month_again_appends_to_its_archive(self):
+        self.add_events(self.month, "first")
+        archive_month(self.month, self.directory)
+        self.add_events(self.month, "late")
+        archive_month(self.month, self.directory)
+        self.assertEqual(self.archived(), ["first", "late"])
+        self.assertFalse(Event.objects.exists())
+
+
+class EventBufferTests(EstateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buffer = EventBuffer(mode=COMMIT, batch_size=3)
+
+    def actions(self):
+        return list(Event.objects.values_list("action", flat=True))
+
+    def test_events_wait_for_the_end_of_the_request(self):
+        token = self.buffer.start_request()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.add(self.admin, "Kept")
+        self.assertEqual(self.actions(), [])
+        self.buffer.write(self.buffer.end_request(token))
+        self.assertEqual(self.actions(), ["Kept"])
+
+    def test_events_are_buffered_only_on_commit(self):
+        token = self.buffer.start_request()
+        with self.captureOnCommitCallbacks() as callbacks:
+            for number in range(3):
+                self.buffer.add(self.admin, f"Event {number}")
+        # The batch is full, but its transaction has not committed yet.
+        self.assertEqual(self.actions(), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(self.actions()), 3)
+        self.assertEqual(self.buffer.end_request(token), [])
+
+    def test_rolled_back_events_are_discarded(self):
+        token = self.buffer.start_request()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.buffer.add(self.admin, "Rolled back")
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            self.buffer.add(self.admin, "Kept")
+        self.buffer.write(self.buffer.end_request(token))
+        self.assertEqual(self.actions(), ["Kept"])
+
+    def test_requests_keep_their_own_events(self):
+        def add(action):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.buffer.add(self.admin, action)
+
+        # Concurrent requests run in contexts of their own.
+        first, second = Context(), Context()
+        first_token = first.run(self.buffer.start_request)
+        second_token = second.run(self.buffer.start_request)
+        first.run(add, "First")
+        second.run(add, "Second")
+        for context, token, action in (
+            (first, first_token, "First"),
+            (second, second_token, "Second"),
+        ):
+            events = context.run(self.buffer.end_request, token)
+            self.assertEqual([event.action for event in events], [action])
+
+    def test_failed_write_keeps_the_transaction_usable(self):
+        existing = Event.objects.create(user=self.admin, action="Existing")
+        with transaction.atomic(), self.assertLogs("home_security.events", "ERROR"):
+            written = self.buffer.write([Event(pk=existing.pk, action="Duplicate")])
+            self.assertEqual(User.objects.filter(pk=self.admin.pk).count(), 1)
+        self.assertEqual(written, 0)
+        self.assertEqual(self.buffer.stats()["dropped"], 1)
+
+
+class BulkEditTests(EstateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building = self.make_building(1, entrances=2, apartments=2)
+        self.client.force_login(self.admin)
+
+    def post(self, name, rows, initial=None):
+        initial = len(rows) if initial is None else initial
+        data = {"form-TOTAL_FORMS": len(rows), "form-INITIAL_FORMS": initial}
+        for index, row in enumerate(rows):
+            data.update({f"form-{index}-{key}": value for key, value in row.items()})
+        url = reverse(name, args=[self.building.number])
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data, follow=True)
+
+    def test_entrance_numbers_can_be_swapped(self):
+        first, second = self.building.entrances.order_by("number")
+        response = self.post(
+            "edit-entrance",
+            [
+                {"id": first.id, "number": 2, "guard": self.guard.id},
+                {"id": second.id, "number": 1, "guard": self.guard.id},
+            ],
+        )
+        self.assertContains(response, "have been updated successfully")
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.number, second.number), (2, 1))
+
+    def test_apartments_can_trade_places_across_entrances(self):
+        first, second = self.building.entrances.order_by("number")
+        apartments = list(
+            Apartment.objects.filter(entrance__building=self.building).order_by(
+                "entrance__number", "number"
+            )
+        )
+        rows = [
+            {
+                "id": apartment.id,
+                "number": apartment.number,
+                "entrance": apartment.entrance_id,
+            }
+            for apartment in apartments
+        ]
+        # Apartment 1 of each entrance moves into the other entrance.
+        rows[0]["entrance"], rows[2]["entrance"] = second.id, first.id
+        response = self.post("edit-apartment", rows)
+        self.assertContains(response, "have been updated successfully")
+        moved = Apartment.objects.in_bulk([apartments[0].id, apartments[2].id])
+        self.assertEqual(moved[apartments[0].id].entrance_id, second.id)
+        self.assertEqual(moved[apartments[2].id].entrance_id, first.id)
+
+    def test_entrance_numbers_can_shift_along_a_chain(self):
+        first, second = self.building.entrances.order_by("number")
+        response = self.post(
+            "edit-entrance",
+            [
+                {"id": first.id, "number": 2, "guard": self.guard.id},
+                {"id": second.id, "number": 3, "guard": self.guard.id},
+            ],
+        )
+        self.assertContains(response, "have been updated successfully")
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.number, second.number), (2, 3))
+
+    def test_rows_cannot_be_added(self):
+        first, second = self.building.entrances.order_by("number")
+        rows = [
+            {"id": first.id, "number": 1, "guard": self.guard.id},
+            {"id": second.id, "number": 2, "guard": self.guard.id},
+            {"number": 3, "guard": self.guard.id},
+        ]
+        response = self.post("edit-entrance", rows, initial=2)
+        self.assertContains(response, "Rows cannot be added here.")
+        self.assertEqual(self.building.entrances.count(), 2)
+
+    def test_duplicate_numbers_are_rejected(self):
+        first, second = self.building.entrances.order_by("number")
+        response = self.post(
+            "edit-entrance",
+            [
+                {"id": first.id, "number": 2, "guard": self.guard.id},
+                {"id": second.id, "number": 2, "guard": self.guard.id},
+            ],
+        )
+        self.assertContains(
+            response, "An entrance with number 2 already exists for this building."
+        )
+        numbers = self.building.entrances.values_list("number", flat=True)
+        self.assertEqual(sorted(numbers), [1, 2])
+
+
+class ImporterTests(EstateTestCase):
+    def run_import(self, content, fmt="csv"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return EstateImporter().run(read_rows(io.BytesIO(content), fmt))
+
+    def test_rows_are_imported(self):
+        self.make_building(1, entrances=1, apartments=1)
+        result = self.run_import(
+            b"building,manager,entrance,guard,apartment\n"
+            b"1,manager,1,guard,1\n"
+            b"1,manager,1,guard,2\n"
+            b"2,manager,1,guard,1\n"
+        )
+        self.assertEqual(
+            (result.buildings, result.entrances, result.apartments), (1, 1, 2)
+        )
+        self.assertEqual(
+            result.errors, [{"line": 2, "error": "apartment 1 already exists"}]
+        )
+        self.assertEqual(Apartment.objects.count(), 3)
+
+    def test_undecodable_line_is_reported(self):
+        result = self.run_import(
+            b"building,manager,entrance,guard,apartment\n"
+            b"1,,1,,1\n"
+            b"2,,1,,\xff\n"
+            b"3,,1,,1\n"
+        )
+        self.assertEqual(result.apartments, 1)
+        self.assertEqual([error["line"] for error in result.errors], [3])
+        self.assertIn("not valid UTF-8", result.errors[0]["error"])
+        self.assertFalse(Building.objects.filter(number=3).exists())
+
+    def test_malformed_csv_is_reported(self):
+        huge = b"x" * (csv.field_size_limit() + 1)
+        result = self.run_import(
+            b"building,manager,entrance,guard,apartment\n"
+            b"1,,1,,1\n"
+            b'2,,1,,"' + huge + b'"\n'
+        )
+        self.assertEqual(result.apartments, 1)
+        self.assertEqual([error["line"] for error in result.errors], [3])
+        self.assertIn("malformed CSV", result.errors[0]["error"])
+
+    def test_undecodable_jsonl_line_is_reported(self):
+        result = self.run_import(
+            b'{"building": 1}\n\n{"building": "\xff"}\n', fmt="jsonl"
+        )
+        self.assertEqual(result.rows, 2)
+        self.assertEqual(result.buildings, 1)
+        self.assertEqual([error["line"] for error in result.errors], [3])
+
+    def test_rows_added_meanwhile_count_as_updated(self):
+        importer = EstateImporter()
+        self.make_building(2, entrances=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = importer.run(
+                read_rows(io.BytesIO(b"building,entrance\n2,1\n2,2\n3,1\n"), "csv")
+            )
+        self.assertEqual((result.buildings, result.updated_buildings), (1, 1))
+        # The entrance that exists already is looked up, not written.
+        self.assertEqual((result.entrances, result.updated_entrances), (2, 0))
+        self.assertEqual(result.as_dict()["updated"], {"buildings": 1, "entrances": 0})
+
+    def test_non_string_usernames_are_reported(self):
+        result = self.run_import(
+            b'{"building": 1, "manager": ["manager"]}\n'
+            b'{"building": 2, "entrance": 1, "guard": {"name": "guard"}}\n',
+            fmt="jsonl",
+        )
+        self.assertEqual(result.buildings, 0)
+        self.assertEqual([error["line"] for error in result.errors], [1, 2])
+        self.assertIn("manager must be a username", result.errors[0]["error"])
+
+
+class HashingPoolTests(SimpleTestCase):
+    def test_host_workers_are_split_between_processes(self):
+        self.assertEqual(process_share(8, 4), 2)
+        self.assertEqual(process_share(2, 4), 1)
+        self.assertEqual(process_share(0, 4), 0)
+
+    def test_timed_out_job_keeps_its_slot_until_it_finishes(self):
+        pool = HashingPool(workers=1, queue_limit=0, timeout=10)
+        self.addCleanup(lambda: pool._executor.shutdown(wait=True))
+        # Start the process first, so the job below is running, not queued.
+        pool._run(time.sleep, 0)
+        pool.timeout = 0.1
+        with self.assertRaises(HashingBusy):
+            pool._run(time.sleep, 1)
+        self.assertEqual(pool.in_flight, 1)
+        with self.assertRaises(HashingBusy):
+            pool._run(time.sleep, 0)
+        self.assertEqual(pool.stats()["rejected"], 1)
+        deadline = time.monotonic() + 10
+        while pool.in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(pool.in_flight, 0)
+        self.assertIsNone(pool._run(time.sleep, 0))
+
+
+class LocatorTests(EstateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_building(3, entrances=2, apartments=15)
+
+    def located(self, query):
+        return [(row["entrance"], row["number"]) for row in locate(query, 50)]
+
+    def test_number_matches_as_a_prefix(self):
+        tens = [(entrance, number) for number in range(10, 16) for entrance in (1, 2)]
+        self.assertEqual(self.located("1"), [(1, 1), (2, 1)] + tens)
+
+    def test_address_matches_the_apartment_exactly(self):
+        self.assertEqual(self.located("3/2/1"), [(2, 1)])
+        self.assertEqual(self.located("3/2/16"), [])
+        self.assertEqual(self.located("4/2/1"), [])
+
+
+class ProfilingTests(EstateTestCase):
+    def setUp(self):
+        super().setUp()
+        profiling._local_targets = (0.0, {})
+        self.addCleanup(setattr, profiling, "_local_targets", (0.0, {}))
+        self.request = RequestFactory().get("/")
+
+    def test_targets_are_read_from_the_process_copy(self):
+        profiling.set_target(self.guard.id, 1.0, 5)
+        cache.clear()
+        self.assertTrue(profiling.may_profile(self.request))
+        self.assertTrue(profiling.wants_profile(self.request, self.guard))
+        with override_settings(PROFILING_TARGETS_TTL=0):
+            profiling.remove_target(self.guard.id)
+            self.assertFalse(profiling.may_profile(self.request))
+
+    def test_profile_without_call_graph_is_not_found(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        profile_id = "20260101-000000-0123abcd"
+        summary = profiling.profile_dir(directory.name) / f"{profile_id}.json"
+        summary.write_text(json.dumps({"id": profile_id}))
+        self.client.force_login(self.admin)
+        with override_settings(PROFILING_DIR=directory.name):
+            self.assertIsNone(profiling.profile_stats(profile_id))
+            response = self.client.get(reverse("profile-detail", args=[profile_id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class MetricsTests(SimpleTestCase):
+    def test_totals_are_counters_and_every_family_has_help(self):
+        text = RequestMetrics(prefix="test").render(
+            {
+                "event_buffer": {"queue_depth": 2, "written": 5},
+                "db_pool": {"default": {"in_use": 1, "checkouts": 9}},
+            }
+        )
+        lines = text.splitlines()
+        types = [line.split()[2:] for line in lines if line.startswith("# TYPE")]
+        helps = {line.split()[2] for line in lines if line.startswith("# HELP")}
+        self.assertEqual({name for name, _ in types}, helps)
+        self.assertIn(["test_event_buffer_written_total", "counter"], types)
+        self.assertIn(["test_event_buffer_queue_depth", "gauge"], types)
+        self.assertIn(["test_db_pool_default_checkouts_total", "counter"], types)
+        self.assertIn(["test_db_pool_default_in_use", "gauge"], types)
+        self.assertIn("test_db_pool_default_checkouts_total 9", lines)
+
+
+class PaginationTests(EstateTestCase):
+    def test_pages_of_equal_numbers_neither_skip_nor_repeat(self):
+        for number in range(1, 4):
+            self.make_building(number, entrances=3)
+        self.client.force_login(self.admin)
+        url = reverse("entrance-list") + "?ordering=number&page_size=2"
+        seen = []
+        while url:
+            page = self.client.get(url).json()
+            seen += [entrance["id"] for entrance in page["results"]]
+            url = page["next"]
+        ids = Entrance.objects.values_list("id", flat=True)
+        self.assertEqual(sorted(seen), sorted(ids))
+
+    def test_ordering_ends_with_the_pk(self):
+        for requested, ordering in (
+            ("number", ("number", "id")),
+            ("-number", ("-number", "-id")),
+            ("-number,id", ("-number", "id")),
+        ):
+            request = Request(APIRequestFactory().get("/", {"ordering": requested}))
+            self.assertEqual(
+                NumberCursorPagination().get_ordering(
+                    request, Entrance.objects.all(), EntranceViewSet()
+                ),
+                ordering,
+            )
+
+
+class DeletionTests(EstateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.building = self.make_building(1, entrances=2, apartments=3)
+        self.other = self.make_building(2, entrances=1, apartments=1)
+
+    def deleted_tables(self, queries):
+        statements = [query["sql"] for query in queries]
+        # No row is loaded to be deleted: one DELETE ... WHERE per table.
+        loads = 'SELECT "home_security_apartment"'
+        self.assertFalse([sql for sql in statements if sql.startswith(loads)])
+        deletes = [sql.split()[2] for sql in statements if sql.startswith("DELETE")]
+        return [table.strip('"') for table in deletes]
+
+    def test_building_is_deleted_with_one_delete_per_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            counts = bulk_delete_building(self.building)
+        self.assertEqual(counts, {"apartments": 6, "entrances": 2, "buildings": 1})
+        self.assertEqual(
+            self.deleted_tables(queries),
+            [
+                "home_security_apartment",
+                "home_security_entrance",
+                "home_security_building",
+                "home_security_hierarchyrow",
+            ],
+        )
+        self.assertEqual(Apartment.objects.count(), 1)
+        self.assertFalse(HierarchyRow.objects.filter(building_id=self.building.id))
+
+    def test_entrance_is_deleted_with_its_apartments(self):
+        entrance = self.building.entrances.get(number=1)
+        counts = bulk_delete_entrance(entrance)
+        self.assertEqual(counts, {"apartments": 3, "entrances": 1})
+        left = Apartment.objects.filter(entrance__building=self.building)
+        self.assertEqual(left.count(), 3)
+        rows = HierarchyRow.objects.filter(building_id=self.building.id)
+        self.assertEqual(list(rows.values_list("entrance_number", flat=True)), [2])
+
+    def test_only_the_deleted_tables_reference_each_other(self):
+        # _raw_delete() neither cascades nor sets null: a new relation to one
+        # of these models must be handled in deletion.py before this passes.
+        referencing = {
+            model.__name__: sorted(
+                relation.related_model.__name__
+                for relation in model._meta.get_fields()
+                if relation.auto_created and not relation.concrete
+            )
+            for model in (Building, Entrance, Apartment)
+        }
+        self.assertEqual(
+            referencing,
+            {"Building": ["Entrance"], "Entrance": ["Apartment"], "Apartment": []},
+        )
+
+
+class EventLogTests(EstateTestCase):
+    def setUp(self):
+        super().setUp()
+        Event.objects.create(user=self.guard, action="Added Building")
+        self.client.force_login(self.admin)
+
+    def test_invalid_filter_shows_no_events_and_its_error(self):
+        response = self.client.get(reverse("event-log"), {"since": "yesterday"})
+        self.assertEqual(list(response.context["logs"]), [])
+        self.assertContains(response, "Since: Enter a valid date/time.")
+
+    def test_unfiltered_log_shows_every_event(self):
+        response = self.client.get(reverse("event-log"))
+        self.assertEqual(len(response.context["logs"]), 1)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class RouterTests(SimpleTestCase):
+    def route(self, method="get", cookies=None, write=None):
+        request = getattr(RequestFactory(), method)("/")
+        request.COOKIES.update(cookies or {})
+        _, token = start_request(request)
+        try:
+            if write:
+                context = {"connection": connections["default"]}
+                _detect_write(lambda *args: None, write, None, False, context)
+            return ReplicaRouter().db_for_read(Building)
+        finally:
+            end_request(token)
+
+    def test_safe_requests_read_from_a_replica(self):
+        self.assertEqual(self.route(), "replica")
+
+    def test_unsafe_requests_read_from_the_primary(self):
+        self.assertEqual(self.route("post"), "default")
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        self.assertEqual(self.route(write="SELECT 1"), "replica")
+        self.assertEqual(self.route(write='UPDATE "building" SET ...'), "default")
+
+    def test_pinned_clients_read_from_the_primary(self):
+        pinned = routing_stats.pinned_requests
+        self.assertEqual(self.route(cookies={PIN_COOKIE: "1"}), "default")
+        self.assertEqual(routing_stats.pinned_requests, pinned + 1)
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(ReplicaRouter().db_for_read(Building), "default")
+
+
+class RoutingMiddlewareTests(EstateTestCase):
+    def test_writing_request_pins_the_client(self):
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("add-building"), {"number": 5, "manager": self.manager.id}
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.client.get(reverse("home"))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class PooledConnection:
+    def __init__(self):
+        self.usable = True
+        self.closed = False
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def pool(self, **options):
+        return ConnectionPool(
+            connect=PooledConnection,
+            check=lambda connection: connection.usable,
+            reset=lambda connection: connection.usable,
+            close=lambda connection: setattr(connection, "closed", True),
+            **options,
+        )
+
+    def test_returned_connections_are_reused(self):
+        pool = self.pool()
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertIs(pool.getconn(), connection)
+        self.assertEqual(pool.stats()["opened"], 1)
+
+    def test_checkout_times_out_when_every_connection_is_in_use(self):
+        pool = self.pool(max_size=1, timeout=0.01)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_connections_that_fail_reset_are_closed(self):
+        pool = self.pool(max_size=1)
+        connection = pool.getconn()
+        connection.usable = False
+        pool.putconn(connection)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.getconn(), connection)
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_stale_idle_connections_are_checked(self):
+        pool = self.pool(check_interval=0)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        connection.usable = False
+        self.assertIsNot(pool.getconn(), connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()["check_failures"], 1)
+
+    def test_failed_connect_gives_its_slot_back(self):
+        pool = self.pool(max_size=1)
+        pool._connect = lambda: 1 / 0
+        with self.assertRaises(ZeroDivisionError):
+            pool.getconn()
+        pool._connect = PooledConnection
+        self.assertIsInstance(pool.getconn(), PooledConnection)
+
+
+class StartupTests(TestCase):
+    def on_starting(self, workers):
+        config = runpy.run_path(str(settings.BASE_DIR / "config" / "gunicorn.py"))
+        server = SimpleNamespace(cfg=SimpleNamespace(workers=workers))
+        config["on_starting"](server)
+
+    def test_migrated_schema_skips_migrate(self):
+        self.assertIn(("home_security", "0001_initial"), migration_files())
+        # The table check and one read of the migration records.
+        with self.assertNumQueries(2):
+            self.assertEqual(ensure_migrated(), [])
+
+    @override_settings(WEB_CONCURRENCY=1)
+    def test_workers_must_be_set_with_web_concurrency(self):
+        with self.assertRaisesMessage(RuntimeError, "WEB_CONCURRENCY"):
+            self.on_starting(workers=2)
+
+    @override_settings(
+        WEB_CONCURRENCY=2,
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+    )
+    def test_several_workers_need_a_shared_cache(self):
+        with self.assertRaisesMessage(RuntimeError, "shared CACHE_BACKEND"):
+            self.on_starting(workers=2)
+
+
+class EventStreamTests(EstateTestCase):
+    def test_streams_are_not_served_under_wsgi(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse("event-stream")).status_code, 503)
+        response = self.client.get(reverse("event-log"))
+        self.assertNotContains(response, "EventSource")
+
+    async def test_stream_delivers_an_event_and_closes(self):
+        client = AsyncClient()
+        await client.aforce_login(self.admin)
+        response = await client.get(reverse("event-stream"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b"retry:"))
+        event = Event(id=1, user=self.guard, action="Added Building", details="")
+        event.timestamp = timezone.now()
+        events_written.send(sender=Event, events=[event])
+        message = await asyncio.wait_for(anext(chunks), 5)
+        self.assertIn(b"event: event", message)
+        self.assertIn(b'"action": "Added Building"', message)
+        # A disconnect cancels the task that is waiting for the next message.
+        waiting = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(broadcaster.subscribers, 0)
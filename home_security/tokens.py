@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from .models import TokenVersion, User
+from .versions import get_version
+
+SALT = "home_security.tokens"
+
+
+def _version_key(user_id):
+    return f"token-version:{user_id}"
+
+
+def token_version(user_id):
+    """
+    Return the version of ``user_id``'s tokens. The database holds it; the
+    cache keeps a copy for API_TOKEN_VERSION_TIMEOUT seconds, which bounds
+    how long another process with its own cache still accepts a revoked
+    token.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = (
+            TokenVersion.objects.filter(user_id=user_id)
+            .values_list("version", flat=True)
+            .first()
+        ) or 0
+        cache.set(key, version, settings.API_TOKEN_VERSION_TIMEOUT)
+    return version
+
+
+def issue_token(user):
+    """
+    Return a signed token carrying the user's id, name, role and the current
+    ``scope`` and ``token`` versions. It is valid for ``API_TOKEN_TTL`` seconds.
+    """
+    payload = {
+        "id": user.id,
+        "name": user.username,
+        "role": user.role,
+        "scope": get_version("scope", user.id),
+        "token": token_version(user.id),
+    }
+    return signing.dumps(payload, salt=SALT, compress=True)
+
+
+def read_token(token, max_age=None):
+    """
+    Return the payload of a token signed by us that is younger than
+    ``max_age``, or None.
+    """
+    max_age = settings.API_TOKEN_TTL if max_age is None else max_age
+    try:
+        return signing.loads(token, salt=SALT, max_age=max_age)
+    except signing.BadSignature:
+        return None
+
+
+def token_user(payload):
+    """
+    Return the user a token payload belongs to, or None if the token was
+    revoked. While the scope version is unchanged the user is rebuilt from the
+    payload without touching the database; otherwise it is reloaded.
+    """
+    if token_version(payload["id"]) != payload["token"]:
+        return None
+    if get_version("scope", payload["id"]) != payload["scope"]:
+        return User.objects.filter(pk=payload["id"], is_active=True).first()
+    user = User(
+        id=payload["id"], username=payload["name"], role=payload["role"], is_active=True
+    )
+    user._state.adding = False
+    user._state.db = User.objects.db
+    return user
+
+
+def revoke_tokens(user_ids):
+    """Invalidate every token issued so far to ``user_ids``."""
+    user_ids = set(user_ids)
+    versions = TokenVersion.objects.filter(user_id__in=user_ids)
+    if versions.update(version=F("version") + 1) < len(user_ids):
+        # Users revoked for the first time; any row a concurrent revocation
+        # created meanwhile is already past version 0 as well.
+        missing = user_ids - set(versions.values_list("user_id", flat=True))
+        TokenVersion.objects.bulk_create(
+            [TokenVersion(user_id=pk, version=1) for pk in missing],
+            ignore_conflicts=True,
+        )
+    cache.delete_many([_version_key(pk) for pk in user_ids])
+
+
+@receiver(pre_save, sender=User)
+def _user_pre_save(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login; anything that could change what a token
+    # grants (role, password, deactivation) revokes the user's tokens.
+    if instance.pk is None or (update_fields and set(update_fields) <= {"last_login"}):
+        return
+    old = User.objects.filter(pk=instance.pk).values("role", "password", "is_active")
+    old = old.first()
+    if old is None:
+        return
+    if (old["role"], old["password"], old["is_active"]) != (
+        instance.role,
+        instance.password,
+        instance.is_active,
+    ):
+        transaction.on_commit(lambda: revoke_tokens([instance.pk]))
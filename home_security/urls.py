@@ -1,13 +1,17 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 from .views import (
+    ApartmentLocatorViewSet,
     ApartmentViewSet,
     BuildingViewSet,
     EntranceViewSet,
+    EstateImportViewSet,
     LoginViewSet,
     LogoutViewSet,
+    MetricsViewSet,
+    TokenViewSet,
     UserRegistrationViewSet,
 )
 
@@ -15,10 +19,16 @@ router = DefaultRouter()
 router.register(r"buildings", BuildingViewSet)
 router.register(r"entrances", EntranceViewSet)
 router.register(r"apartments", ApartmentViewSet)
+router.register(
+    r"locate-apartment", ApartmentLocatorViewSet, basename="locate-apartment"
+)
+router.register(r"import-estate", EstateImportViewSet, basename="import-estate")
 
 router.register(r"user-register", UserRegistrationViewSet, basename="user-register")
 router.register(r"login", LoginViewSet, basename="login")
 router.register(r"logout", LogoutViewSet, basename="logout")
+router.register(r"token", TokenViewSet, basename="token")
+router.register(r"metrics", MetricsViewSet, basename="metrics")
 
 
 urlpatterns = [
@@ -34,16 +44,63 @@ urlpatterns = [
     path(
         "edit-entrance/<int:building_number>", views.edit_entrance, name="edit-entrance"
     ),
-    path("delete-entrance/<int:number>", views.delete_entrance, name="delete_entrance"),
+    path("delete-entrance/<int:pk>", views.delete_entrance, name="delete_entrance"),
     path("add-apartment", views.add_apartment, name="add-apartment"),
     path(
         "edit-apartment/<int:building_number>/",
         views.edit_apartment,
         name="edit-apartment",
     ),
+    path("delete-apartment/<int:pk>", views.delete_apartment, name="delete-apartment"),
+    path("locate-apartment/", views.locate_apartment, name="locate-apartment"),
+    path("event-log/", views.view_event_log, name="event-log"),
+    path("event-log/export", views.export_event_log, name="export-event-log"),
+    path("stats/", views.view_stats, name="stats"),
+    path("profiles/", views.view_profiles, name="profiles"),
+    path("profiles/<str:profile_id>/", views.profile_detail, name="profile-detail"),
     path(
-        "delete-apartment/<int:number>", views.delete_apartment, name="delete-apartment"
+        "profiles/<str:profile_id>/download",
+        views.download_profile,
+        name="profile-download",
+    ),
+    path("stream/", views.event_stream, name="event-stream"),
+    path("api/async/login/", async_views.login_view, name="async-login"),
+    path("api/async/logout/", async_views.logout_view, name="async-logout"),
+    path(
+        "api/async/buildings/",
+        async_views.resource_list,
+        {"resource": "buildings"},
+        name="async-building-list",
+    ),
+    path(
+        "api/async/buildings/<int:pk>/",
+        async_views.resource_detail,
+        {"resource": "buildings"},
+        name="async-building-detail",
+    ),
+    path(
+        "api/async/entrances/",
+        async_views.resource_list,
+        {"resource": "entrances"},
+        name="async-entrance-list",
+    ),
+    path(
+        "api/async/entrances/<int:pk>/",
+        async_views.resource_detail,
+        {"resource": "entrances"},
+        name="async-entrance-detail",
+    ),
+    path(
+        "api/async/apartments/",
+        async_views.resource_list,
+        {"resource": "apartments"},
+        name="async-apartment-list",
+    ),
+    path(
+        "api/async/apartments/<int:pk>/",
+        async_views.resource_detail,
+        {"resource": "apartments"},
+        name="async-apartment-detail",
     ),
-    path("event-log/", views.view_event_log, name="event-log"),
     path("api/", include(router.urls)),
 ]
@@ -0,0 +1,52 @@
+import time
+
+from django.core.cache import cache
+
+
+def _key(namespace, pk):
+    return f"version:{namespace}:{pk}"
+
+
+def _modified_key(namespace, pk):
+    return f"modified:{namespace}:{pk}"
+
+
+def get_versions(namespace, pks):
+    """Return the current version counter of every pk in ``namespace``."""
+    keys = {_key(namespace, pk): pk for pk in pks}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, pk in keys.items():
+        if pk not in versions:
+            # A lost counter restarts from the clock, which is always ahead
+            # of any version a surviving cache entry could have been keyed with.
+            cache.add(key, time.time_ns(), None)
+            versions[pk] = cache.get(key)
+    return versions
+
+
+def get_version(namespace, pk):
+    return get_versions(namespace, [pk])[pk]
+
+
+def last_modified(namespace, pks):
+    """
+    Return when any of ``pks`` was last bumped as a timestamp, or None if one
+    of them has no recorded bump.
+    """
+    keys = [_modified_key(namespace, pk) for pk in pks]
+    found = cache.get_many(keys)
+    if not keys or len(found) < len(keys):
+        return None
+    return max(found.values())
+
+
+def bump_versions(namespace, pks):
+    pks = list(pks)
+    cache.set_many({_modified_key(namespace, pk): time.time() for pk in pks}, None)
+    for pk in pks:
+        key = _key(namespace, pk)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
@@ -1,21 +1,75 @@
+from datetime import datetime, timezone
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.db import IntegrityError
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from .access import get_scope
+from .conditional import (
+    bump_tables,
+    not_modified,
+    set_validators,
+    table_label,
+    validators,
+)
+from .db.pool import pool_stats
+from .db.router import routing_stats
 from .decorators import admin_required
+from .deletion import bulk_delete_building, bulk_delete_entrance
+from .events import event_buffer, log_event
+from .exporter import CONTENT_TYPES, aiterate, encode_rows, export_filename
+from .filters import QueryParamFilterBackend
 from .forms import (
     ApartmentForm,
+    ApartmentLocatorForm,
+    ApartmentFormSet,
     BuildingForm,
     CustomUserCreationForm,
     EntranceForm,
+    EntranceFormSet,
+    EntranceGuardFormSet,
+    EventExportForm,
+    EventFilterForm,
     LoginForm,
+    ProfileTargetForm,
 )
-from .models import Apartment, Building, Entrance, Event
+from .fragments import fragment_stats, render_fragments
+from .hashing import hashing_pool
+from .hierarchy import schedule_building_refresh
+from .importer import FORMATS as IMPORT_FORMATS
+from .importer import EstateImporter, detect_format, read_rows
+from .metrics import request_metrics
+from .models import Apartment, Building, Entrance, Event, HierarchyRow, User
+from .profiling import SORTS as PROFILE_SORTS
+from .profiling import (
+    get_targets,
+    list_profiles,
+    load_profile,
+    profile_path,
+    profile_stats,
+    remove_target,
+    set_target,
+)
+from .pagination import NumberCursorPagination, keyset_page
+from .permissions import InAccessScope, IsAdministrator
 from .serializers import (
     ApartmentSerializer,
     BuildingSerializer,
@@ -23,6 +77,16 @@ from .serializers import (
     LoginSerializer,
     UserRegistrationSerializer,
 )
+from .streams import available as streams_available
+from .streams import broadcaster, stream
+from .tokens import issue_token, read_token, revoke_tokens, token_user
+from .writes import (
+    APARTMENT_EXISTS,
+    BUILDING_EXISTS,
+    ENTRANCE_EXISTS,
+    DuplicateError,
+    unique_write,
+)
 
 
 def register(request):
@@ -43,15 +107,10 @@ def user_login(request):
     if request.method == "POST":
         form = LoginForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get("username")
-            password = form.cleaned_data.get("password")
-            user = authenticate(request, username=username, password=password)
-            if user is not None:
-                login(request, user)
-                log_event(request.user, "Log IN", f"User {request.user} log in")
-                return redirect("home")
-            else:
-                messages.error(request, "Invalid username or password.")
+            # AuthenticationForm already authenticated the user while cleaning.
+            login(request, form.get_user())
+            log_event(request.user, "Log IN", f"User {request.user} log in")
+            return redirect("home")
         else:
             messages.error(request, "Invalid username or password.")
     else:
@@ -66,36 +125,83 @@ def user_logout(request):
     return redirect("login")
 
 
+def _rows_by(field, pks):
+    rows = HierarchyRow.objects.filter(**{f"{field}__in": pks}).order_by(
+        "entrance_number"
+    )
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(getattr(row, field), []).append(row)
+    return grouped
+
+
+def _dashboard_validators(user):
+    if user.is_admin():
+        return validators((user.id, user.username, user.role), [("hierarchy", ["all"])])
+    scope = get_scope(user)
+    buildings = scope.managed_building_ids if user.is_manager() else scope.building_ids
+    return validators(
+        (user.id, user.username, user.role),
+        [("scope", [user.id]), ("building", buildings)],
+    )
+
+
 @login_required
 def dashboard_admin(request):
-    if request.user.is_admin():
-        buildings = Building.objects.all().prefetch_related("entrances__apartments")
-    elif request.user.is_manager():
-        buildings = Building.objects.filter(manager=request.user).prefetch_related(
-            "entrances__apartments"
+    # Pending flash messages make the page differ from any cached copy.
+    conditional = not len(messages.get_messages(request))
+    if conditional:
+        etag, modified = _dashboard_validators(request.user)
+        response = not_modified(request, etag, modified)
+        if response is not None:
+            return set_validators(response, etag, modified)
+
+    rows = HierarchyRow.objects.order_by(
+        "building_number", "building_id", "entrance_number"
+    )
+    is_guard = not (request.user.is_admin() or request.user.is_manager())
+    if is_guard:
+        groups = list(
+            rows.filter(guard_id=request.user.id).values_list(
+                "entrance_id", "building_id"
+            )
         )
-    else:
-        guarded_entrances = (
-            Entrance.objects.filter(guard=request.user)
-            .select_related("building")
-            .prefetch_related("apartments")
+        fragments = render_fragments(
+            "guard",
+            "entrance",
+            groups,
+            lambda pks: _rows_by("entrance_id", pks),
+            "_dashboard-entrance.html",
+            {"user": request.user},
         )
-        buildings = (
-            Building.objects.filter(entrances__in=guarded_entrances)
+    else:
+        scope = "admin" if request.user.is_admin() else "manager"
+        if request.user.is_manager():
+            rows = rows.filter(manager_id=request.user.id)
+        # DISTINCT covers the ORDER BY columns, so drop entrance_number.
+        building_ids = (
+            rows.order_by("building_number", "building_id")
+            .values_list("building_id", flat=True)
             .distinct()
-            .prefetch_related("entrances__apartments")
+        )
+        fragments = render_fragments(
+            scope,
+            "building",
+            [(pk, pk) for pk in building_ids],
+            lambda pks: _rows_by("building_id", pks),
+            "_dashboard-building.html",
+            {"user": request.user},
         )
 
     context = {
-        "buildings": buildings,
-        "is_guard": not (request.user.is_admin() or request.user.is_manager()),
-        "guarded_entrances": (
-            guarded_entrances
-            if not (request.user.is_admin() or request.user.is_manager())
-            else None
-        ),
+        "fragments": fragments,
+        "is_guard": is_guard,
+        "live_updates": streams_available(request),
     }
-    return render(request, "dashboard.html", context)
+    response = render(request, "dashboard.html", context)
+    if conditional:
+        set_validators(response, etag, modified)
+    return response
 
 
 @login_required
@@ -112,12 +218,12 @@ def add_building(request):
             number = form.cleaned_data.get("number")
             manager = form.cleaned_data.get("manager")
 
-            if Building.objects.filter(number=number).exists():
-                messages.error(
-                    request, f"Building with number {number} already exists."
-                )
+            try:
+                with unique_write(BUILDING_EXISTS.format(number=number)):
+                    building = form.save()
+            except DuplicateError as exc:
+                messages.error(request, str(exc))
             else:
-                building = form.save()
                 log_event(
                     request.user, "Added Building", f"Building {building.number} added"
                 )
@@ -141,9 +247,12 @@ def delete_building(request, number):
     building = get_object_or_404(Building, number=number)
     if request.method == "POST":
 
-        building.delete()
+        counts = bulk_delete_building(building)
         log_event(
-            request.user, "Deleted Building", f"Building {building.number} deleted"
+            request.user,
+            "Deleted Building",
+            f"Building {building.number} deleted with {counts['entrances']} "
+            f"entrances and {counts['apartments']} apartments",
         )
         messages.success(
             request,
@@ -165,15 +274,12 @@ def edit_building(request, number):
 
         if form.is_valid():
             new_number = form.cleaned_data["number"]
-            if (
-                new_number != number
-                and Building.objects.filter(number=new_number).exists()
-            ):
-                messages.error(
-                    request, f"Building with number {new_number} already exists."
-                )
+            try:
+                with unique_write(BUILDING_EXISTS.format(number=new_number)):
+                    updated_building = form.save()
+            except DuplicateError as exc:
+                messages.error(request, str(exc))
             else:
-                updated_building = form.save()
                 log_event(
                     request.user,
                     "Edited Building",
@@ -201,10 +307,12 @@ def add_entrance(request):
             number = form.cleaned_data.get("number")
             guard = form.cleaned_data.get("guard")
             building = form.cleaned_data.get("building")
-            if Entrance.objects.filter(number=number, building=building).exists():
-                messages.error(request, "Entrance already exists.")
+            try:
+                with unique_write("Entrance already exists."):
+                    form.save()
+            except DuplicateError as exc:
+                messages.error(request, str(exc))
             else:
-                entrance = form.save()
                 log_event(
                     request.user,
                     "Added Entrance",
@@ -225,86 +333,66 @@ def add_entrance(request):
 def edit_entrance(request, building_number):
     if request.user.is_admin():
         building = get_object_or_404(Building, number=building_number)
+        formset_class = EntranceFormSet
     elif request.user.is_manager():
         building = get_object_or_404(
             Building, number=building_number, manager=request.user
         )
-    entrances = building.entrances.all()
-    if request.method == "POST":
-        print("POST data:", request.POST)
-        entrance_number = request.POST.get("entrance_number")
-        entrance = get_object_or_404(
-            Entrance, number=entrance_number, building=building
-        )
-
-        form_data = {
-            "number": request.POST.get(f"{entrance_number}-number"),
-            "guard": request.POST.get(f"{entrance_number}-guard"),
-            "building": request.POST.get(f"{entrance_number}-building"),
-        }
+        formset_class = EntranceGuardFormSet
+    else:
+        raise PermissionDenied
+    entrances = building.entrances.order_by("number")
+    choices = {"guard": User.objects.filter(role=User.GUARD)}
 
-        form = EntranceForm(form_data, instance=entrance)
-        if form.is_valid():
+    if request.method == "POST":
+        formset = formset_class(request.POST, queryset=entrances, choices=choices)
+        if formset.is_valid():
+            changed = formset.changed_instances()
+            numbers = ", ".join(str(entrance.number) for entrance in changed)
             try:
-
-                existing_entrance = (
-                    Entrance.objects.filter(
-                        number=form.cleaned_data["number"], building=building
-                    )
-                    .exclude(id=entrance.id)
-                    .first()
-                )
-
-                if existing_entrance:
-                    messages.error(
-                        request,
-                        f"An entrance with number {form.cleaned_data['number']} already exists for this building.",
-                    )
-                else:
-                    form.save()
+                with unique_write(ENTRANCE_EXISTS.format(number=numbers)):
+                    formset.save_changed()
+                    bump_tables(Entrance)
+            except DuplicateError as exc:
+                messages.error(request, str(exc))
+            else:
+                if changed:
+                    schedule_building_refresh([building.id])
                     log_event(
                         request.user,
-                        "Edited Entrance",
-                        f"Entrance {entrance_number} has been updated successfully for {building}",
+                        "Edited Entrances",
+                        f"Entrances {numbers} have been updated successfully for {building}",
                     )
                     messages.success(
-                        request,
-                        f"Entrance {entrance_number} has been updated successfully.",
+                        request, f"Entrances {numbers} have been updated successfully."
                     )
-            except IntegrityError:
-                messages.error(
-                    request,
-                    f"An entrance with number {form.cleaned_data['number']} already exists for this building.",
-                )
+                return redirect("edit-entrance", building_number=building_number)
         else:
-            print("Form errors:", form.errors)
-            messages.error(
-                request,
-                "Error updating Entrance.",
-            )
-        return redirect("edit-entrance", building_number=building_number)
-    entrance_forms = [
-        EntranceForm(instance=entrance, prefix=str(entrance.number))
-        for entrance in entrances
-    ]
+            for error in formset.non_form_errors() or ["Error updating Entrance."]:
+                messages.error(request, error)
+    else:
+        formset = formset_class(queryset=entrances, choices=choices)
+
     context = {
         "building": building,
-        "entrance_forms": entrance_forms,
+        "formset": formset,
     }
     return render(request, "edit-entrance.html", context)
 
 
 @login_required
 @admin_required
-def delete_entrance(request, number):
-    entrance = get_object_or_404(Entrance, number=number)
+def delete_entrance(request, pk):
+    # Entrance numbers repeat across buildings, so the id picks the row.
+    entrance = get_object_or_404(Entrance.objects.select_related("building"), pk=pk)
     if request.method == "POST":
 
-        entrance.delete()
+        counts = bulk_delete_entrance(entrance)
         log_event(
             request.user,
             "Deleted Entrance",
-            f"Entrance {number} has been deleted",
+            f"Entrance {entrance.number} of building {entrance.building.number} "
+            f"has been deleted with {counts['apartments']} apartments",
         )
 
         return redirect("dashboard-admin")
@@ -320,10 +408,12 @@ def add_apartment(request):
         if form.is_valid():
             number = form.cleaned_data.get("number")
             entrance = form.cleaned_data.get("entrance")
-            if Apartment.objects.filter(number=number, entrance=entrance).exists():
-                messages.error(request, "Apartment already exists.")
+            try:
+                with unique_write("Apartment already exists."):
+                    apartment = form.save()
+            except DuplicateError as exc:
+                messages.error(request, str(exc))
             else:
-                apartment = form.save()
                 log_event(
                     request.user,
                     "Added Apartment",
@@ -344,85 +434,61 @@ def add_apartment(request):
 @admin_required
 def edit_apartment(request, building_number):
     building = get_object_or_404(Building, number=building_number)
-    apartments = Apartment.objects.filter(entrance__building=building).order_by(
-        "entrance__number", "number"
+    apartments = (
+        Apartment.objects.filter(entrance__building=building)
+        .select_related("entrance")
+        .order_by("entrance__number", "number")
     )
+    choices = {"entrance": building.entrances.order_by("number")}
 
     if request.method == "POST":
-        apartment_id = request.POST.get("apartment_id")
-        apartment = get_object_or_404(
-            Apartment, id=apartment_id, entrance__building=building
-        )
-
-        form_data = {
-            "number": request.POST.get(f"{apartment_id}-number"),
-            "owner": request.POST.get(f"{apartment_id}-owner"),
-            "entrance": request.POST.get(f"{apartment_id}-entrance"),
-        }
-
-        form = ApartmentForm(form_data, instance=apartment)
-        if form.is_valid():
+        formset = ApartmentFormSet(request.POST, queryset=apartments, choices=choices)
+        if formset.is_valid():
+            changed = formset.changed_instances()
+            numbers = ", ".join(str(apartment.number) for apartment in changed)
             try:
-
-                existing_apartment = (
-                    Apartment.objects.filter(
-                        number=form.cleaned_data["number"],
-                        entrance=form.cleaned_data["entrance"],
-                    )
-                    .exclude(id=apartment.id)
-                    .first()
-                )
-
-                if existing_apartment:
-                    messages.error(
-                        request,
-                        f"An apartment with number {form.cleaned_data['number']} already exists in this entrance.",
-                    )
-                else:
-                    form.save()
+                with unique_write(APARTMENT_EXISTS.format(number=numbers)):
+                    formset.save_changed()
+                    bump_tables(Apartment)
+            except DuplicateError as exc:
+                messages.error(request, str(exc))
+            else:
+                if changed:
+                    schedule_building_refresh([building.id])
                     log_event(
                         request.user,
-                        "Edited Apartment",
-                        f"Apartment {apartment.number} has been edited",
+                        "Edited Apartments",
+                        f"Apartments {numbers} have been edited in {building}",
                     )
                     messages.success(
-                        request,
-                        f"Apartment {apartment.number} has been updated successfully.",
+                        request, f"Apartments {numbers} have been updated successfully."
                     )
-            except IntegrityError:
-                messages.error(
-                    request,
-                    f"An apartment with number {form.cleaned_data['number']} already exists in this entrance.",
-                )
+                return redirect("edit-apartment", building_number=building_number)
         else:
-            print("Form errors:", form.errors)
-            messages.error(request, "Error updating Apartment.")
-
-        return redirect("edit-apartment", building_number=building_number)
-
-    apartment_forms = [
-        ApartmentForm(instance=apartment, prefix=str(apartment.id))
-        for apartment in apartments
-    ]
+            for error in formset.non_form_errors() or ["Error updating Apartment."]:
+                messages.error(request, error)
+    else:
+        formset = ApartmentFormSet(queryset=apartments, choices=choices)
 
     context = {
         "building": building,
-        "apartment_forms": apartment_forms,
+        "formset": formset,
     }
     return render(request, "edit-apartment.html", context)
 
 
 @login_required
 @admin_required
-def delete_apartment(request, number):
-    apartment = get_object_or_404(Apartment, number=number)
+def delete_apartment(request, pk):
+    # Apartment numbers repeat across entrances, so the id picks the row.
+    apartment = get_object_or_404(Apartment, pk=pk)
     if request.method == "POST":
 
         apartment.delete()
         log_event(
             request.user,
             "Deleted Apartment",
-            f"Apartment {number} has been deleted",
+            f"Apartment {apartment.number} has been deleted",
         )
 
         return redirect("dashboard-admin")
@@ -430,32 +496,318 @@ def delete_apartment(request, number):
     return redirect("dashboard-admin")
 
 
-def log_event(user, action, details=""):
-    Event.objects.create(user=user, action=action, details=details)
+@login_required
+def locate_apartment(request):
+    form = ApartmentLocatorForm(request.GET or None)
+    results = form.results(settings.LOCATOR_LIMIT) if form.is_valid() else []
+    return render(
+        request, "locate-apartment.html", {"form": form, "results": results}
+    )
 
 
 @login_required
 @admin_required
 def view_event_log(request):
-    logs = Event.objects.all().order_by("-timestamp")
-    return render(request, "event-log.html", {"logs": logs})
+    filter_form = EventFilterForm(request.GET or None)
+    logs = filter_form.filter_queryset(Event.objects.select_related("user"))
+    logs, next_cursor = keyset_page(
+        logs, request.GET.get("cursor"), settings.EVENT_LOG_PAGE_SIZE
+    )
+    query = request.GET.copy()
+    query.pop("cursor", None)
+    context = {
+        "logs": logs,
+        "filter_form": filter_form,
+        "next_cursor": next_cursor,
+        "query": query.urlencode(),
+        "live_updates": streams_available(request),
+    }
+    return render(request, "event-log.html", context)
 
 
-class BuildingViewSet(viewsets.ModelViewSet):
-    queryset = Building.objects.all()
+@login_required
+@admin_required
+def export_event_log(request):
+    form = EventExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse(form.errors, status=400)
+    fmt, compress = form.cleaned_data["format"], form.cleaned_data["gzip"]
+    chunks = encode_rows(form.rows(settings.EVENT_EXPORT_CHUNK_SIZE), fmt, compress)
+    if isinstance(request, ASGIRequest):
+        chunks = aiterate(chunks)
+    response = StreamingHttpResponse(
+        chunks,
+        content_type="application/gzip" if compress else CONTENT_TYPES[fmt],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{export_filename(fmt, compress)}"'
+    )
+    log_event(request.user, "Exported Event Log", request.GET.urlencode())
+    return response
+
+
+@login_required
+@admin_required
+def view_profiles(request):
+    form = ProfileTargetForm(request.POST or None)
+    if request.method == "POST":
+        remove = request.POST.get("remove", "")
+        if remove.isdigit():
+            remove_target(int(remove))
+            messages.success(request, "Profiling stopped.")
+            return redirect("profiles")
+        if form.is_valid():
+            user = form.cleaned_data["user"]
+            set_target(user.id, form.cleaned_data["rate"], form.cleaned_data["minutes"])
+            log_event(
+                request.user,
+                "Started Profiling",
+                f"Profiling {form.cleaned_data['rate']:.1%} of requests by {user} "
+                f"for {form.cleaned_data['minutes']} minutes",
+            )
+            messages.success(request, f"Profiling requests by {user}.")
+            return redirect("profiles")
+
+    targets = get_targets()
+    users = User.objects.in_bulk(targets)
+    context = {
+        "form": form,
+        "targets": [
+            {
+                "user": users.get(pk),
+                "user_id": pk,
+                "rate": target["rate"],
+                "until": datetime.fromtimestamp(target["until"], timezone.utc),
+            }
+            for pk, target in targets.items()
+        ],
+        "profiles": list_profiles(),
+    }
+    return render(request, "profiles.html", context)
+
+
+@login_required
+@admin_required
+def profile_detail(request, profile_id):
+    profile = load_profile(profile_id)
+    sort = request.GET.get("sort")
+    if sort not in PROFILE_SORTS:
+        sort = PROFILE_SORTS[0]
+    stats = profile_stats(profile_id, sort)
+    if profile is None or stats is None:
+        raise Http404
+    context = {
+        "profile": profile,
+        "sort": sort,
+        "sorts": PROFILE_SORTS,
+        "stats": stats,
+    }
+    return render(request, "profile-detail.html", context)
+
+
+@login_required
+@admin_required
+def download_profile(request, profile_id):
+    # ``.prof`` loads into pstats/snakeviz; ``.json`` has the slow statements.
+    suffix = ".json" if request.GET.get("file") == "json" else ".prof"
+    path = profile_path(profile_id, suffix)
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=path.name)
+
+
+async def event_stream(request):
+    if not streams_available(request):
+        return HttpResponse("Event streams need the ASGI server.", status=503)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    response = StreamingHttpResponse(stream(user), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@login_required
+@admin_required
+def view_stats(request):
+    return JsonResponse(_component_stats())
+
+
+def _component_stats():
+    return {
+        "event_buffer": event_buffer.stats(),
+        "dashboard_fragments": fragment_stats.stats(),
+        "streams": broadcaster.stats(),
+        "password_hashing": hashing_pool.stats(),
+        "db_pool": pool_stats(),
+        "db_routing": routing_stats.stats(),
+    }
+
+
+class UniqueWriteMixin:
+    duplicate_message = ""
+
+    def perform_create(self, serializer):
+        self.save_unique(serializer)
+
+    def perform_update(self, serializer):
+        self.save_unique(serializer)
+
+    def save_unique(self, serializer):
+        number = serializer.validated_data.get(
+            "number", getattr(serializer.instance, "number", None)
+        )
+        try:
+            with unique_write(self.duplicate_message.format(number=number)):
+                serializer.save()
+        except DuplicateError as exc:
+            raise ValidationError({"number": [str(exc)]})
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified for ``list`` and ``retrieve``, derived from the
+    table versions of ``version_models`` and the caller's scope version, so
+    an unchanged poll is answered with 304 before the queryset runs.
+    """
+
+    version_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, handler, request, *args, **kwargs):
+        user = request.user
+        versions = [("table", [table_label(model) for model in self.version_models])]
+        if not user.is_admin():
+            versions.append(("scope", [user.id]))
+        etag, modified = validators(
+            (request.get_full_path(), request.accepted_renderer.format, user.id),
+            versions,
+        )
+        response = not_modified(request, etag, modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        return set_validators(response, etag, modified)
+
+
+class BuildingViewSet(ConditionalGetMixin, UniqueWriteMixin, viewsets.ModelViewSet):
+    queryset = Building.objects.select_related("manager")
     serializer_class = BuildingSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [InAccessScope]
+    duplicate_message = BUILDING_EXISTS
+    version_models = (Building,)
+    pagination_class = NumberCursorPagination
+    filter_backends = [QueryParamFilterBackend, OrderingFilter]
+    filter_fields = {"number": "number", "manager": "manager__username"}
+    ordering_fields = ["number", "id"]
+
+    def get_queryset(self):
+        return get_scope(self.request.user).filter_buildings(super().get_queryset())
 
+    def perform_destroy(self, instance):
+        bulk_delete_building(instance)
 
-class EntranceViewSet(viewsets.ModelViewSet):
-    queryset = Entrance.objects.all()
+
+class EntranceViewSet(ConditionalGetMixin, UniqueWriteMixin, viewsets.ModelViewSet):
+    queryset = Entrance.objects.select_related("building", "guard")
     serializer_class = EntranceSerializer
+    permission_classes = [InAccessScope]
+    duplicate_message = ENTRANCE_EXISTS
+    version_models = (Entrance, Building)
+    pagination_class = NumberCursorPagination
+    filter_backends = [QueryParamFilterBackend, OrderingFilter]
+    filter_fields = {
+        "number": "number",
+        "building": "building__number",
+        "guard": "guard__username",
+    }
+    ordering_fields = ["number", "id"]
 
+    def get_queryset(self):
+        return get_scope(self.request.user).filter_entrances(super().get_queryset())
 
-class ApartmentViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
-    queryset = Apartment.objects.all()
+    def perform_destroy(self, instance):
+        bulk_delete_entrance(instance)
+
+
+class ApartmentViewSet(ConditionalGetMixin, UniqueWriteMixin, viewsets.ModelViewSet):
+    permission_classes = [InAccessScope]
+    queryset = Apartment.objects.select_related("entrance")
     serializer_class = ApartmentSerializer
+    duplicate_message = APARTMENT_EXISTS
+    version_models = (Apartment, Entrance)
+    pagination_class = NumberCursorPagination
+    filter_backends = [QueryParamFilterBackend, OrderingFilter]
+    filter_fields = {
+        "number": "number",
+        "entrance": "entrance_id",
+        "building": "entrance__building__number",
+    }
+    ordering_fields = ["number", "id"]
+
+    def get_queryset(self):
+        return get_scope(self.request.user).filter_entrances(
+            super().get_queryset(), field="entrance_id"
+        )
+
+
+class ApartmentLocatorViewSet(viewsets.ViewSet):
+    """
+    Estate-wide lookup of apartments by number, number prefix or
+    ``building/entrance/apartment`` address, with the guard and manager in
+    charge of each match.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        form = ApartmentLocatorForm(request.query_params)
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+        return Response(form.results(settings.LOCATOR_LIMIT))
+
+
+class MetricsViewSet(viewsets.ViewSet):
+    """
+    Request metrics and component stats in the Prometheus text format.
+    Scrapers can authenticate with HTTP Basic as an administrator.
+    """
+
+    permission_classes = [IsAdministrator]
+
+    def list(self, request):
+        return HttpResponse(
+            request_metrics.render(_component_stats()),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class EstateImportViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdministrator]
+    parser_classes = [MultiPartParser]
+
+    def create(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": "This field is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        fmt = request.data.get("input_format") or detect_format(upload.name)
+        if fmt not in IMPORT_FORMATS:
+            return Response(
+                {"input_format": f"Expected one of {', '.join(IMPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        result = EstateImporter().run(read_rows(upload, fmt))
+        log_event(request.user, "Imported Estate", result.summary())
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
 
 
 class UserRegistrationViewSet(viewsets.GenericViewSet):
@@ -503,3 +855,64 @@ class LogoutViewSet(viewsets.ViewSet):
         logout(request)
         log_event(user_to_logout, "Log OUT", f"User {user_to_logout} log out")
         return Response({"message": "Logout successfully"}, status=status.HTTP_200_OK)
+
+
+class TokenViewSet(viewsets.ViewSet):
+    """
+    Signed API tokens: ``create`` logs in without a session, ``refresh``
+    exchanges a token that expired less than API_TOKEN_REFRESH_WINDOW ago for
+    a new one, ``revoke`` invalidates every token of the caller (or, for
+    administrators, of the user given as ``user``).
+    """
+
+    permission_classes = [AllowAny]
+    serializer_class = LoginSerializer
+
+    def _issued(self, user):
+        return Response(
+            {"token": issue_token(user), "expires_in": settings.API_TOKEN_TTL},
+            status=status.HTTP_200_OK,
+        )
+
+    def create(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        user = authenticate(request, **serializer.validated_data)
+        if user is None:
+            return Response(
+                {"error": "Invalid username or password"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        log_event(user, "Log IN", f"User {user} token log in")
+        return self._issued(user)
+
+    @action(detail=False, methods=["post"])
+    def refresh(self, request):
+        payload = read_token(
+            request.data.get("token", ""),
+            max_age=settings.API_TOKEN_TTL + settings.API_TOKEN_REFRESH_WINDOW,
+        )
+        # Refreshing always re-reads the user, so role changes and
+        # deactivation are picked up even while the scope is unchanged.
+        user = None
+        if payload is not None and token_user(payload) is not None:
+            user = User.objects.filter(pk=payload["id"], is_active=True).first()
+        if user is None:
+            return Response(
+                {"error": "Invalid, expired or revoked token"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        return self._issued(user)
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
+    def revoke(self, request):
+        try:
+            user_id = int(request.data.get("user") or request.user.id)
+        except (TypeError, ValueError):
+            raise ValidationError({"user": "Expected a user id."})
+        if user_id != request.user.id and not request.user.is_admin():
+            raise PermissionDenied
+        revoke_tokens([user_id])
+        log_event(request.user, "Revoked Tokens", f"Tokens of user {user_id} revoked")
+        return Response({"message": "Tokens revoked"}, status=status.HTTP_200_OK)
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+
+BUILDING_EXISTS = "Building with number {number} already exists."
+ENTRANCE_EXISTS = "An entrance with number {number} already exists for this building."
+APARTMENT_EXISTS = "An apartment with number {number} already exists in this entrance."
+
+
+class DuplicateError(Exception):
+    pass
+
+
+def is_unique_violation(exc):
+    # PostgreSQL: "duplicate key value violates unique constraint ...",
+    # SQLite: "UNIQUE constraint failed: ..."
+    return "unique" in str(exc).lower()
+
+
+@contextmanager
+def unique_write(message):
+    """
+    Run a write inside a savepoint and turn a unique constraint violation
+    into ``DuplicateError(message)``.
+
+    The database constraint is the only duplicate check, so a write costs a
+    single INSERT/UPDATE and concurrent writers cannot both succeed.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as exc:
+        if not is_unique_violation(exc):
+            raise
+        raise DuplicateError(message) from exc
+
+
+def upsert(model, objs, unique_fields, update_fields, batch_size=None):
+    """Insert ``objs`` or update ``update_fields`` of the rows they collide with."""
+    return model._default_manager.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+    )